@@ -0,0 +1,8 @@
+"""
+Performance benchmarks for the API.
+
+They are plain Django test cases kept out of the default test discovery
+(files are named ``bench_*.py``). Run them against a test database with::
+
+    python manage.py test benchmarks --pattern="bench_*.py"
+"""
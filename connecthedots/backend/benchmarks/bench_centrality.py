@@ -0,0 +1,38 @@
+import time
+from rest_framework.test import APITestCase
+from connections.models import Connection
+from nodes.models import Node
+from graphs.centrality import refresh_centrality
+from graphs.models import GraphChange
+from graphs.utils import record_graph_change
+from .utils import make_user, make_topic_graph, report
+
+
+class CentralityBenchmark(APITestCase):
+    """Cold and warm-started centrality refreshes on 10k to 100k edge topics."""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def timed(self, func):
+        start = time.perf_counter()
+        result = func()
+        return result, (time.perf_counter() - start) * 1000
+
+    def test_warm_refresh_after_one_edge(self):
+        rows = [('nodes', 'edges', 'cold ms', 'cold iter', 'warm ms', 'warm iter')]
+        for node_count, edge_count in ((2000, 10000), (10000, 50000), (20000, 100000)):
+            topic = make_topic_graph(self.user, node_count, edge_count, name=f'Bench {edge_count}')
+            cold, cold_ms = self.timed(lambda: refresh_centrality(topic.id))
+
+            first, second = Node.objects.filter(topic=topic).order_by('id').values_list('id', flat=True)[:2]
+            connection = Connection.objects.create(
+                firstNodeID_id=first, secondNodeID_id=second, relationName='new',
+                createdBy=self.user, topic=topic
+            )
+            record_graph_change(topic.id, GraphChange.CONNECTION, GraphChange.INSERT, connection.id)
+            warm, warm_ms = self.timed(lambda: refresh_centrality(topic.id))
+
+            self.assertLess(warm.iterations, cold.iterations)
+            rows.append((node_count, edge_count, f'{cold_ms:.0f}', cold.iterations, f'{warm_ms:.0f}', warm.iterations))
+        report('Centrality refresh (pagerank, degree, sampled betweenness)', rows)
@@ -0,0 +1,23 @@
+import time
+from rest_framework.test import APITestCase
+from .utils import make_user, make_topic_graph, report
+
+
+class CloneBenchmark(APITestCase):
+    """Forking a topic is a handful of INSERT ... SELECT statements whatever its size."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_clone(self):
+        rows = [('nodes', 'edges', 'clone ms')]
+        for node_count, edge_count in ((5000, 10000), (25000, 50000)):
+            topic = make_topic_graph(self.user, node_count, edge_count, name=f'Bench {node_count}')
+            start = time.perf_counter()
+            response = self.client.post(f'/api/topics/{topic.id}/clone/', {}, format='json')
+            elapsed = (time.perf_counter() - start) * 1000
+            self.assertEqual((response.data['nodes'], response.data['connections']), (node_count, edge_count))
+            rows.append((node_count, edge_count, f'{elapsed:.0f}'))
+        report('POST /api/topics/<id>/clone/', rows)
+        self.assertLess(elapsed, 10000)
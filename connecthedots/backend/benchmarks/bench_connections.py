@@ -0,0 +1,29 @@
+from rest_framework.test import APITestCase
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class ConnectionListingBenchmark(APITestCase):
+    """Listing one topic's connections must not grow with unrelated topics."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+        self.topic = make_topic_graph(self.user, 50, 100)
+
+    def test_topic_listing_is_flat(self):
+        url = f'/api/connections/?topic_id={self.topic.id}'
+        rows = [('unrelated', 'edges', 'ms')]
+        timings = []
+        created = 0
+        for unrelated in (0, 20, 80):
+            while created < unrelated:
+                make_topic_graph(self.user, 50, 100, name=f'Unrelated {created}')
+                created += 1
+            elapsed = best_of(lambda: self.client.get(url))
+            response = self.client.get(url)
+            self.assertEqual(len(response.data), 100)
+            timings.append(elapsed)
+            rows.append((unrelated, unrelated * 100 + 100, f'{elapsed:.2f}'))
+        report('GET /api/connections/?topic_id=', rows)
+        # 80x more edges in the table should not cost more than a small constant factor
+        self.assertLess(timings[-1], timings[0] * 3)
@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from django.test import TransactionTestCase
+from wikis.dump import ingest_dump
+from wikis.models import Wiki
+from .utils import report
+
+LANGUAGES = ['en', 'de', 'fr', 'es', 'it', 'nl', 'pl', 'ru', 'ja', 'zh']
+
+
+def write_fixture_dump(path, count, seed=573):
+    """A gzipped dump of ``count`` items shaped like real ones: many languages, a few dozen claims."""
+    rng = random.Random(seed)
+    with gzip.open(path, 'wt', compresslevel=1) as f:
+        f.write('[\n')
+        for i in range(count):
+            entity = {
+                'type': 'item',
+                'id': f'Q{i + 1}',
+                'labels': {lang: {'language': lang, 'value': f'Item {i} {lang}'} for lang in LANGUAGES},
+                'descriptions': {lang: {'language': lang, 'value': f'Description of item {i}'} for lang in LANGUAGES},
+                'aliases': {'en': [{'language': 'en', 'value': f'Alias {i}'}]},
+                'claims': {
+                    f'P{rng.randint(1, 2000)}': [{
+                        'mainsnak': {'snaktype': 'value', 'property': 'P31',
+                                     'datavalue': {'value': {'entity-type': 'item', 'id': f'Q{rng.randint(1, 10 ** 6)}'},
+                                                   'type': 'wikibase-entityid'}},
+                        'type': 'statement', 'rank': 'normal',
+                    }]
+                    for _ in range(30)
+                },
+            }
+            f.write(json.dumps(entity) + (',\n' if i < count - 1 else '\n'))
+        f.write(']\n')
+
+
+class DumpIngestBenchmark(TransactionTestCase):
+    """Items per second from a gzipped dump, by number of parser processes."""
+
+    def test_ingest(self):
+        count = 20000
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fixture.json.gz')
+            write_fixture_dump(path, count)
+            size = os.path.getsize(path)
+            with gzip.open(path, 'rb') as f:
+                raw_size = sum(len(line) for line in f)
+
+            rows = [('workers', 'seconds', 'items/s', 'MB/s decompressed')]
+            for workers in sorted({1, 2, os.cpu_count() or 1}):
+                Wiki.objects.all().delete()
+                checkpoint = os.path.join(directory, f'checkpoint-{workers}')
+                start = time.perf_counter()
+                state = ingest_dump(path, ['en'], checkpoint, workers=workers, batch_size=5000)
+                elapsed = time.perf_counter() - start
+                self.assertEqual(state['entities'], count)
+                rows.append((workers, f'{elapsed:.2f}', f'{count / elapsed:.0f}',
+                             f'{raw_size / elapsed / 2 ** 20:.1f}'))
+        report(f'ingest_wikidata_dump, {count} items, {size / 2 ** 20:.1f} MB gzipped', rows)
+        self.assertEqual(Wiki.objects.count(), count)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from graphs.realtime import get_broker, graph_socket_application
+from topics.models import Topic
+from .utils import make_user, report
+
+MESSAGES = 20
+
+
+@override_settings(GRAPH_BROKER='graphs.realtime.InProcessBroker')
+class RealtimeFanOutBenchmark(APITestCase):
+    """Delivery latency of graph events to concurrent WebSocket subscribers of one topic."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.topic = Topic.objects.create(topicName='Realtime', createdBy=self.user)
+        self.token = str(AccessToken.for_user(self.user))
+
+    def measure(self, subscribers):
+        broker = get_broker()
+        scope = {
+            'type': 'websocket',
+            'path': f'/ws/topics/{self.topic.id}/',
+            'query_string': f'token={self.token}'.encode(),
+        }
+
+        async def run():
+            latencies = []
+            inboxes = []
+            tasks = []
+            for _ in range(subscribers):
+                incoming = asyncio.Queue()
+                outgoing = asyncio.Queue()
+                await incoming.put({'type': 'websocket.connect'})
+                tasks.append(asyncio.create_task(graph_socket_application(scope, incoming.get, outgoing.put)))
+                inboxes.append((incoming, outgoing))
+            for _, outgoing in inboxes:
+                await outgoing.get()  # accept
+                await outgoing.get()  # hello
+            self.assertEqual(broker.subscriber_count(self.topic.id), subscribers)
+
+            def publisher():
+                # views publish from worker threads, not from the event loop
+                for seq in range(MESSAGES):
+                    broker.publish(self.topic.id, {'type': 'graph.changes', 'seq': seq, 'sent': time.perf_counter()})
+                    time.sleep(0.001)
+
+            thread = threading.Thread(target=publisher)
+            thread.start()
+            for _, outgoing in inboxes:
+                for _ in range(MESSAGES):
+                    message = await outgoing.get()
+                    sent = json.loads(message['text'])['sent']
+                    latencies.append((time.perf_counter() - sent) * 1000)
+            thread.join()
+            for incoming, _ in inboxes:
+                await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+            await asyncio.gather(*tasks)
+            return latencies
+
+        return async_to_sync(run)()
+
+    def test_fan_out_latency(self):
+        rows = [('subscribers', 'messages', 'p50 ms', 'p99 ms')]
+        for subscribers in (10, 100, 1000):
+            latencies = sorted(self.measure(subscribers))
+            self.assertEqual(len(latencies), subscribers * MESSAGES)
+            p50 = statistics.median(latencies)
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            rows.append((subscribers, subscribers * MESSAGES, f'{p50:.2f}', f'{p99:.2f}'))
+        report('WebSocket fan-out per topic', rows)
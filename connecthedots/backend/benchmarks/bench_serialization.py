@@ -0,0 +1,35 @@
+from django.test import override_settings
+from rest_framework.test import APITestCase
+from forums.models import Post
+from topics.models import Topic
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class FastListBenchmark(APITestCase):
+    """List endpoints with the values_list path against the serializers, same bytes either way."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_endpoints(self):
+        topic = make_topic_graph(self.user, 20000, 20000)
+        Post.objects.bulk_create([Post(topic=topic, user=self.user, content=f'Post {i}') for i in range(5000)])
+        Topic.objects.bulk_create([Topic(topicName=f'Topic {i}', createdBy=self.user) for i in range(5000)])
+        urls = (
+            f'/api/nodes/?topic_id={topic.id}',
+            f'/api/connections/?topic_id={topic.id}',
+            f'/api/connections/?topic_id={topic.id}&page_size=5000',
+            f'/api/forums/posts/?topic={topic.id}',
+            '/api/topics/',
+        )
+        rows = [('endpoint', 'serializer ms', 'fast ms', 'speedup')]
+        for url in urls:
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(url).content
+                slow = best_of(lambda: self.client.get(url), repeat=3)
+            self.assertEqual(self.client.get(url).content, expected)
+            fast = best_of(lambda: self.client.get(url), repeat=3)
+            rows.append((url.split('?')[0], f'{slow:.0f}', f'{fast:.0f}', f'{slow / fast:.1f}x'))
+            self.assertLess(fast, slow)
+        report('list endpoints', rows)
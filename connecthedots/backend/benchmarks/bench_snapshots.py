@@ -0,0 +1,41 @@
+import json
+import time
+from rest_framework.test import APITestCase
+from nodes.models import Node
+from graphs.models import GraphSnapshot
+from graphs.utils import record_graph_reset
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class SnapshotBenchmark(APITestCase):
+    """Snapshot size, and diff and restore times that follow the topic size rather than row-by-row work."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_snapshot_diff_restore(self):
+        rows = [('nodes', 'edges', 'blob bytes', 'json bytes', 'snapshot ms', 'diff ms', 'restore ms')]
+        for node_count in (5000, 25000):
+            topic = make_topic_graph(self.user, node_count, node_count * 2, name=f'Bench {node_count}')
+            url = f'/api/topics/{topic.id}/snapshots/'
+            start = time.perf_counter()
+            snapshot_id = self.client.post(url, {'name': 'base'}, format='json').data['id']
+            taken = (time.perf_counter() - start) * 1000
+            size = len(GraphSnapshot.objects.get(id=snapshot_id).data)
+            json_size = len(json.dumps(self.client.get(f'/api/topics/{topic.id}/graph/').data))
+
+            # a bad bulk edit: a tenth of the nodes (and their connections) gone
+            Node.objects.filter(topic=topic, id__in=Node.objects.filter(topic=topic)[:node_count // 10]
+                                .values('id')).delete()
+            record_graph_reset(topic.id)
+            diff = best_of(lambda: self.client.get(f'{url}diff/', {'from': snapshot_id}), repeat=3)
+            start = time.perf_counter()
+            response = self.client.post(f'{url}{snapshot_id}/restore/')
+            restored = (time.perf_counter() - start) * 1000
+            self.assertEqual(response.data['nodes']['added'], node_count // 10)
+            self.assertEqual(Node.objects.filter(topic=topic).count(), node_count)
+            rows.append((node_count, node_count * 2, size, json_size, f'{taken:.0f}', f'{diff:.0f}',
+                         f'{restored:.0f}'))
+            self.assertLess(size, json_size / 4)
+        report('topic snapshots', rows)
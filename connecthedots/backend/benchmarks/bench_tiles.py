@@ -0,0 +1,40 @@
+import random
+import time
+from rest_framework.test import APITestCase
+from graphs.tiles import get_tiles
+from nodes.models import Node
+from nodes.utils import apply_positions
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class TilePyramidBenchmark(APITestCase):
+    """Zoomed-out reads cost O(tiles); moving nodes patches the pyramid instead of rebuilding it."""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def test_tiles_against_topic_size(self):
+        rows = [('nodes', 'rebuild ms', 'level 0 ms', 'level 3 ms', 'move 10 ms', 'move 100 ms')]
+        rng = random.Random(573)
+        for node_count in (10000, 100000):
+            topic = make_topic_graph(self.user, node_count, node_count, name=f'Bench {node_count}')
+            ids = list(Node.objects.filter(topic=topic).values_list('id', flat=True))
+            # spread the nodes over a 20000 x 20000 canvas, 20 x 20 cells at level 0
+            apply_positions({node_id: (rng.uniform(0, 20000), rng.uniform(0, 20000)) for node_id in ids})
+
+            start = time.perf_counter()
+            get_tiles(topic.id, 0)
+            rebuild = (time.perf_counter() - start) * 1000
+            fine = best_of(lambda: get_tiles(topic.id, 0))
+            coarse = best_of(lambda: get_tiles(topic.id, 3))
+
+            moves = []
+            for size in (10, 100):
+                moved = {node_id: (rng.uniform(0, 20000), rng.uniform(0, 20000)) for node_id in rng.sample(ids, size)}
+                start = time.perf_counter()
+                apply_positions(moved, topic.id)
+                moves.append((time.perf_counter() - start) * 1000)
+            rows.append((node_count, f'{rebuild:.0f}', f'{fine:.1f}', f'{coarse:.1f}',
+                         *(f'{move:.1f}' for move in moves)))
+        # level 0 has up to one edge row per connected cell pair, level 3 only a handful
+        report('Tile pyramid', rows)
@@ -0,0 +1,47 @@
+import io
+import time
+import tracemalloc
+from rest_framework.test import APITestCase
+from topics.models import Topic
+from graphs.transfer import export_ndjson, parse_ndjson, import_graph
+from .utils import make_user, make_topic_graph, report
+
+
+class GraphTransferBenchmark(APITestCase):
+    """Streaming export and import should keep peak memory flat as the graph grows."""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def test_memory_is_flat(self):
+        rows = [('nodes', 'edges', 'export ms', 'import ms', 'export KiB', 'import KiB')]
+        peaks = []
+        for node_count in (2000, 16000):
+            topic = make_topic_graph(self.user, node_count, node_count * 2, name=f'Bench {node_count}')
+            target = Topic.objects.create(topicName=f'Copy {node_count}', createdBy=self.user)
+
+            body = io.BytesIO()
+            tracemalloc.start()
+            start = time.perf_counter()
+            for chunk in export_ndjson(topic):
+                body.write(chunk.encode())
+            export_ms = (time.perf_counter() - start) * 1000
+            # the written body is the output, not working memory
+            export_peak = tracemalloc.get_traced_memory()[1] - body.getbuffer().nbytes
+            tracemalloc.stop()
+
+            body.seek(0)
+            tracemalloc.start()
+            start = time.perf_counter()
+            counts = import_graph(target, self.user, parse_ndjson(body))
+            import_ms = (time.perf_counter() - start) * 1000
+            import_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            self.assertEqual(counts['connections'], node_count * 2)
+            peaks.append(import_peak)
+            rows.append((node_count, node_count * 2, f'{export_ms:.0f}', f'{import_ms:.0f}',
+                         export_peak // 1024, import_peak // 1024))
+        report('NDJSON export / import', rows)
+        # 8x the rows should not need anywhere near 8x the memory
+        self.assertLess(peaks[-1], peaks[0] * 2)
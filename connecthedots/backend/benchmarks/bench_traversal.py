@@ -0,0 +1,54 @@
+import random
+from rest_framework.test import APITestCase
+from graphs.index import AdjacencyIndex, clear_topic_indexes, get_topic_index
+from graphs.traversal import SQLTraversal
+from nodes.models import Node
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class TraversalBenchmark(APITestCase):
+    """Traversal queries on a 50k-edge topic, in memory and with recursive SQL."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.topic = make_topic_graph(self.user, 10000, 50000)
+        clear_topic_indexes()
+
+    def test_traversal_queries(self):
+        build = best_of(lambda: AdjacencyIndex.from_topic(self.topic.id), repeat=3)
+        index = get_topic_index(self.topic.id)
+        self.assertEqual(index.edge_count, 50000)
+
+        rng = random.Random(573)
+        node_ids = list(index.node_ids)
+        pairs = [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(20)]
+
+        def paths():
+            for source, target in pairs:
+                index.shortest_path(source, target, directed=False)
+
+        rows = [('query', 'ms')]
+        rows.append(('build index', f'{build:.1f}'))
+        rows.append(('2-hop', f'{best_of(lambda: index.neighborhood(node_ids[0], 2)):.2f}'))
+        rows.append(('3-hop', f'{best_of(lambda: index.neighborhood(node_ids[0], 3)):.2f}'))
+        rows.append(('shortest path', f'{best_of(paths) / len(pairs):.2f}'))
+        rows.append(('reachable', f'{best_of(lambda: index.reachable(node_ids[0])):.2f}'))
+        report('Traversal on 10k nodes / 50k edges', rows)
+
+    def test_database_traversal_against_loading_the_topic(self):
+        node_id = Node.objects.filter(topic=self.topic).order_by('id').values_list('id', flat=True).first()
+        target = Node.objects.filter(topic=self.topic).order_by('-id').values_list('id', flat=True).first()
+        traversal = SQLTraversal(self.topic.id)
+
+        def load_and_query(query):
+            return lambda: query(AdjacencyIndex.from_topic(self.topic.id))
+
+        rows = [('query', 'sql ms', 'load+memory ms')]
+        for depth in (1, 2):
+            sql = best_of(lambda: traversal.neighborhood(node_id, depth), repeat=3)
+            memory = best_of(load_and_query(lambda index: index.neighborhood(node_id, depth)), repeat=3)
+            rows.append((f'{depth}-hop', f'{sql:.1f}', f'{memory:.1f}'))
+        sql = best_of(lambda: traversal.shortest_path(node_id, target, directed=False), repeat=3)
+        memory = best_of(load_and_query(lambda index: index.shortest_path(node_id, target, directed=False)), repeat=3)
+        rows.append(('path', f'{sql:.1f}', f'{memory:.1f}'))
+        report('Recursive SQL vs loading the whole 50k-edge topic', rows)
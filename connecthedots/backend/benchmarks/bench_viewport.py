@@ -0,0 +1,27 @@
+from rest_framework.test import APITestCase
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class ViewportBenchmark(APITestCase):
+    """A bbox request should cost what is inside the box, not the size of the topic."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_viewport_is_flat(self):
+        # make_topic_graph lays nodes out on a 100-wide grid, so this box holds 100 nodes
+        bbox = '10,10,19,19'
+        rows = [('nodes', 'bbox ms', 'full list ms')]
+        timings = []
+        for node_count in (10000, 100000):
+            topic = make_topic_graph(self.user, node_count, node_count, name=f'Bench {node_count}')
+            params = {'topic_id': topic.id, 'bbox': bbox}
+            response = self.client.get('/api/nodes/', params)
+            self.assertEqual(len(response.data['nodes']), 100)
+            elapsed = best_of(lambda: self.client.get('/api/nodes/', params))
+            full = best_of(lambda: self.client.get('/api/nodes/', {'topic_id': topic.id}), repeat=1)
+            timings.append(elapsed)
+            rows.append((node_count, f'{elapsed:.1f}', f'{full:.0f}'))
+        report('GET /api/nodes/?bbox=', rows)
+        self.assertLess(timings[-1], timings[0] * 3)
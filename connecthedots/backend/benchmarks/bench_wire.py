@@ -0,0 +1,26 @@
+import gzip
+import json
+from rest_framework.test import APITestCase
+from graphs.wire import decode_graph, GraphBinaryRenderer
+from .utils import best_of, make_user, make_topic_graph, report
+
+
+class WireFormatBenchmark(APITestCase):
+    """Payload size and client-side decode time of the columnar format against JSON."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(user=self.user)
+
+    def test_size_and_decode(self):
+        rows = [('nodes', 'edges', 'format', 'bytes', 'gzip bytes', 'decode ms')]
+        for node_count in (5000, 50000):
+            topic = make_topic_graph(self.user, node_count, node_count * 2, name=f'Bench {node_count}')
+            url = f'/api/topics/{topic.id}/graph/'
+            as_json = self.client.get(url).content
+            as_binary = self.client.get(url, HTTP_ACCEPT=GraphBinaryRenderer.media_type).content
+            for name, payload, decode in (('json', as_json, json.loads), ('binary', as_binary, decode_graph)):
+                rows.append((node_count, node_count * 2, name, len(payload), len(gzip.compress(payload)),
+                             f'{best_of(lambda: decode(payload)):.1f}'))
+            self.assertLess(len(as_binary), len(as_json) / 3)
+        report('GET /api/topics/<id>/graph/', rows)
@@ -0,0 +1,54 @@
+import random
+import time
+from django.contrib.auth import get_user_model
+from topics.models import Topic
+from nodes.models import Node
+from connections.models import Connection
+
+User = get_user_model()
+
+
+def best_of(func, repeat=5):
+    # smallest wall time of several runs, in milliseconds
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def make_user(username='benchuser'):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='benchpass123'
+    )
+
+
+def make_topic_graph(user, node_count, edge_count, name='Bench Topic', seed=573):
+    """Create a topic with ``node_count`` nodes and ``edge_count`` random connections in bulk."""
+    rng = random.Random(seed)
+    topic = Topic.objects.create(topicName=name, createdBy=user)
+    nodes = Node.objects.bulk_create([
+        Node(manual_name=f'Node {i}', topic=topic, created_by_user=user,
+             position_x=float(i % 100), position_y=float(i // 100))
+        for i in range(node_count)
+    ])
+    Connection.objects.bulk_create([
+        Connection(
+            firstNodeID=nodes[i % node_count],
+            secondNodeID=nodes[rng.randrange(node_count)],
+            relationName='related',
+            createdBy=user,
+            topic=topic
+        )
+        for i in range(edge_count)
+    ])
+    return topic
+
+
+def report(title, rows):
+    print(f'\n{title}')
+    for row in rows:
+        print('  ' + '  '.join(f'{value:>12}' for value in row))
@@ -0,0 +1,87 @@
+"""
+Fast read path for list endpoints.
+
+``ModelSerializer(queryset, many=True)`` builds a model instance per row and
+walks every field through its serializer field. For plain column fields the
+result can be built from ``values_list`` tuples instead, running only the
+conversions that change a value (dates become ISO strings, ints stay ints).
+The dicts are equal to the serializer's, key order included, so the JSON
+renderer produces the same bytes.
+"""
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# fields whose to_representation returns column values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.FloatField,
+    serializers.BooleanField,
+    serializers.PrimaryKeyRelatedField,
+)
+UNSUPPORTED_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.ManyRelatedField,
+    serializers.SerializerMethodField,
+    serializers.HiddenField,
+)
+
+
+def build_plan(serializer_class):
+    """
+    ``[(name, lookup, convert or None)]`` for the readable fields of a serializer.
+
+    Returns None if any field needs more than a column, such as nested
+    serializers, method fields or ``source='*'``.
+    """
+    plan = []
+    for name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, UNSUPPORTED_FIELDS) or field.source == '*':
+            return None
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is not None:
+            return None
+        convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+        plan.append((name, '__'.join(field.source_attrs), convert))
+    return plan
+
+
+def fast_serialize(queryset, serializer_class):
+    """Serializer output for ``queryset`` built from tuples, or None if the serializer is not supported."""
+    plan = build_plan(serializer_class)
+    if plan is None:
+        return None
+    names = [name for name, _, _ in plan]
+    converters = [(position, convert) for position, (_, _, convert) in enumerate(plan) if convert is not None]
+    rows = queryset.values_list(*[lookup for _, lookup, _ in plan])
+    if not converters:
+        return [dict(zip(names, row)) for row in rows]
+    data = []
+    for row in rows:
+        row = list(row)
+        for position, convert in converters:
+            # the serializer leaves None alone as well
+            if row[position] is not None:
+                row[position] = convert(row[position])
+        data.append(dict(zip(names, row)))
+    return data
+
+
+def serialize_list(queryset, serializer_class):
+    """``serializer_class(queryset, many=True).data``, through the fast path when it applies."""
+    if settings.FAST_LIST_SERIALIZATION:
+        data = fast_serialize(queryset, serializer_class)
+        if data is not None:
+            return data
+    return serializer_class(queryset, many=True).data
+
+
+class FastListMixin:
+    """``list()`` through ``fast_serialize`` for ViewSets without pagination."""
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        return Response(serialize_list(self.filter_queryset(self.get_queryset()), self.get_serializer_class()))
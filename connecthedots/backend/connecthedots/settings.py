@@ -30,7 +30,8 @@ INSTALLED_APPS = [
     "usernodes",
     "users",
     "usertopics",
-    "wikis"
+    "wikis",
+    "graphs"
 ]
 
 MIDDLEWARE = [
@@ -156,4 +157,50 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-}
\ No newline at end of file
+}
+# Node position write-behind: coalesce drag updates and flush them in bulk
+POSITION_WRITE_BEHIND = config('POSITION_WRITE_BEHIND', default=False, cast=bool)
+POSITION_FLUSH_INTERVAL = config('POSITION_FLUSH_INTERVAL', default=0.3, cast=float)
+
+# Fan-out of realtime graph events to WebSocket subscribers. The in-process broker only
+# reaches sockets held by the process that made the write, so it only suits a single
+# ASGI process (runserver, one uvicorn); with several workers use the PostgresBroker.
+GRAPH_BROKER = config('GRAPH_BROKER', default='graphs.realtime.InProcessBroker')
+
+# How often queued rebuilds of stale tile pyramids run; reads serve the old pyramid meanwhile
+TILE_REBUILD_INTERVAL = config('TILE_REBUILD_INTERVAL', default=0.5, cast=float)
+
+# Topics with more connections than this are traversed with recursive SQL
+# instead of an in-memory adjacency index (keeps workers under mem_limit)
+GRAPH_INDEX_MAX_EDGES = config('GRAPH_INDEX_MAX_EDGES', default=200000, cast=int)
+
+# List endpoints build their JSON from values_list tuples instead of model instances
+FAST_LIST_SERIALIZATION = config('FAST_LIST_SERIALIZATION', default=True, cast=bool)
+
+# Wikidata search proxy: pooled session, strict timeouts, per-process result cache and circuit breaker
+WIKIDATA_SPARQL_URL = config('WIKIDATA_SPARQL_URL', default='https://query.wikidata.org/sparql')
+WIKIDATA_CONNECT_TIMEOUT = config('WIKIDATA_CONNECT_TIMEOUT', default=2.0, cast=float)
+WIKIDATA_READ_TIMEOUT = config('WIKIDATA_READ_TIMEOUT', default=5.0, cast=float)
+WIKIDATA_POOL_SIZE = config('WIKIDATA_POOL_SIZE', default=10, cast=int)
+WIKIDATA_SEARCH_CACHE_SIZE = config('WIKIDATA_SEARCH_CACHE_SIZE', default=2048, cast=int)
+WIKIDATA_SEARCH_CACHE_TTL = config('WIKIDATA_SEARCH_CACHE_TTL', default=60 * 60, cast=int)
+WIKIDATA_SEARCH_STALE_TTL = config('WIKIDATA_SEARCH_STALE_TTL', default=60 * 60 * 24, cast=int)
+WIKIDATA_BREAKER_FAILURES = config('WIKIDATA_BREAKER_FAILURES', default=3, cast=int)
+WIKIDATA_BREAKER_RESET = config('WIKIDATA_BREAKER_RESET', default=30, cast=int)
+
+# Local autocomplete over stored Wikidata items, answered before going upstream
+AUTOCOMPLETE_INDEX_SIZE = config('AUTOCOMPLETE_INDEX_SIZE', default=50000, cast=int)
+AUTOCOMPLETE_INDEX_TTL = config('AUTOCOMPLETE_INDEX_TTL', default=300, cast=int)
+AUTOCOMPLETE_MIN_LOCAL_RESULTS = config('AUTOCOMPLETE_MIN_LOCAL_RESULTS', default=5, cast=int)
+
+# Background resolution of placeholder Wikidata items (empty label) with wbgetentities
+WIKI_ENRICHMENT = config('WIKI_ENRICHMENT', default=False, cast=bool)
+WIKIDATA_API_URL = config('WIKIDATA_API_URL', default='https://www.wikidata.org/w/api.php')
+WIKIDATA_LANGUAGE = config('WIKIDATA_LANGUAGE', default='en')
+WIKIDATA_ENRICH_READ_TIMEOUT = config('WIKIDATA_ENRICH_READ_TIMEOUT', default=10.0, cast=float)
+WIKI_ENRICHMENT_INTERVAL = config('WIKI_ENRICHMENT_INTERVAL', default=1.0, cast=float)
+WIKI_ENRICHMENT_RETRIES = config('WIKI_ENRICHMENT_RETRIES', default=3, cast=int)
+WIKI_ENRICHMENT_BACKOFF = config('WIKI_ENRICHMENT_BACKOFF', default=1.0, cast=float)
+
+# Upper bound on the time one batch resolve request spends calling wbgetentities
+WIKIDATA_RESOLVE_BUDGET = config('WIKIDATA_RESOLVE_BUDGET', default=5.0, cast=float)
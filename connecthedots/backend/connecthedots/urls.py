@@ -4,6 +4,7 @@ from django.urls import path, include
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/users/", include("users.urls")),
+    path("api/topics/<int:topic_id>/", include("graphs.urls")),
     path("api/", include("topics.urls")),
     path('api/forums/', include('forums.urls')),
     path('api/nodes/', include('nodes.urls')),
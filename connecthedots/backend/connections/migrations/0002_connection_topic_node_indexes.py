@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("connections", "0001_initial"),
+        ("nodes", "0002_node_position_x_node_position_y"),
+        ("topics", "0003_topic_graphversion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="connection",
+            index=models.Index(
+                fields=["topic", "firstNodeID"], name="connections_topic_i_30a4aa_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="connection",
+            index=models.Index(
+                fields=["topic", "secondNodeID"], name="connections_topic_i_21b253_idx"
+            ),
+        ),
+    ]
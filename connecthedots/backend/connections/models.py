@@ -35,6 +35,8 @@ class Connection(models.Model):
         db_table = 'connections'
         indexes = [
             models.Index(fields=['createdBy']),
+            models.Index(fields=['topic', 'firstNodeID']),
+            models.Index(fields=['topic', 'secondNodeID']),
         ]
 
     def __str__(self):
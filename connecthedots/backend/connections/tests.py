@@ -1,3 +1,60 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from topics.models import Topic
+from nodes.models import Node
+from .models import Connection
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ListConnectionsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.topic = Topic.objects.create(topicName='Topic', createdBy=self.user)
+        self.other_topic = Topic.objects.create(topicName='Other', createdBy=self.user)
+        self.connections = [self.make_connection(self.topic, i) for i in range(5)]
+        self.make_connection(self.other_topic, 99)
+
+    def make_connection(self, topic, index):
+        first = Node.objects.create(manual_name=f'A{index}', topic=topic, created_by_user=self.user)
+        second = Node.objects.create(manual_name=f'B{index}', topic=topic, created_by_user=self.user)
+        return Connection.objects.create(
+            firstNodeID=first,
+            secondNodeID=second,
+            relationName='rel',
+            createdBy=self.user,
+            topic=topic
+        )
+
+    def test_list_is_filtered_by_topic(self):
+        response = self.client.get(f'/api/connections/?topic_id={self.topic.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['id'] for c in response.data], [c.id for c in self.connections])
+
+    def test_keyset_pagination(self):
+        url = f'/api/connections/?topic_id={self.topic.id}&page_size=2'
+        seen = []
+        response = self.client.get(url)
+        while True:
+            seen.extend(c['id'] for c in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(f"{url}&after={response.data['next']}")
+        self.assertEqual(seen, [c.id for c in self.connections])
+
+    def test_output_matches_serializer(self):
+        for url in (f'/api/connections/?topic_id={self.topic.id}', f'/api/connections/?page_size=2&after=0'):
+            fast = self.client.get(url)
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.content, slow.content)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/connections/?after=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
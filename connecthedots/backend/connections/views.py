@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
@@ -7,19 +8,58 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from usertopics.utils import record_user_topic_action
 from topics.models import Topic
+from graphs.models import GraphChange
+from graphs.utils import record_graph_change, record_graph_update, lock_topics
+from connecthedots.serialization import serialize_list
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
 
 @api_view(['GET'])
 def list_connections(request):
+    topic_id = request.query_params.get('topic_id')
+    after = request.query_params.get('after')
+    page_size = request.query_params.get('page_size')
+    paginate = after is not None or page_size is not None
+
+    try:
+        topic_id = int(topic_id) if topic_id else None
+        after_id = int(after) if after else 0
+        page_size = int(page_size) if page_size else DEFAULT_PAGE_SIZE
+    except ValueError:
+        return Response({'error': 'topic_id, after and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if page_size < 1:
+        return Response({'error': 'page_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+    page_size = min(page_size, MAX_PAGE_SIZE)
+
     connections = Connection.objects.all()
-    serializer = ConnectionSerializer(connections, many=True)
-    return Response(serializer.data)
+    if topic_id is not None:
+        connections = connections.filter(topic_id=topic_id)
+    connections = connections.order_by('id')
+
+    # plain list when the client does not ask for pages (Graph.js)
+    if not paginate:
+        return Response(serialize_list(connections, ConnectionSerializer))
+
+    # keyset pagination on id: fetch one extra row to know if there is a next page
+    page = serialize_list(connections.filter(id__gt=after_id)[:page_size + 1], ConnectionSerializer)
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    return Response({
+        'results': page,
+        'next': page[-1]['id'] if has_more else None,
+    })
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_connection(request):
     serializer = ConnectionSerializer(data=request.data)
     if serializer.is_valid():
-        connection = serializer.save(createdBy=request.user)
+        with transaction.atomic():
+            lock_topics(serializer.validated_data['topic'].id)
+            connection = serializer.save(createdBy=request.user)
+            record_graph_change(connection.topic_id, GraphChange.CONNECTION, GraphChange.INSERT, connection.id,
+                                serializer.data)
         # record interaction
         topic = Topic.objects.get(id=connection.topic.id)
         record_user_topic_action(request.user, topic, 'addedNode')
@@ -35,12 +75,21 @@ def update_or_delete_connection(request, pk):
         return Response({"error": "Connection not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'PUT':
+        old_topic_id = connection.topic_id
         serializer = ConnectionSerializer(connection, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                lock_topics(old_topic_id, serializer.validated_data['topic'].id)
+                serializer.save()
+                record_graph_update(GraphChange.CONNECTION, connection.id, serializer.data, old_topic_id,
+                                    connection.topic_id)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        connection.delete()
+        connection_id = connection.id
+        with transaction.atomic():
+            lock_topics(connection.topic_id)
+            connection.delete()
+            record_graph_change(connection.topic_id, GraphChange.CONNECTION, GraphChange.DELETE, connection_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
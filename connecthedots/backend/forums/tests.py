@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from topics.models import Topic
+from .models import Post
 
+User = get_user_model()
 
+
+class PostListTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Topic', createdBy=self.user)
+        for content in ('first', 'second <b>post</b>'):
+            Post.objects.create(topic=self.topic, user=self.user, content=content)
+
+    def test_output_matches_serializer(self):
+        for url in ('/api/forums/posts/', f'/api/forums/posts/?topic={self.topic.id}'):
+            fast = self.client.get(url)
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(fast.data), 2)
+            self.assertEqual(fast.content, slow.content)
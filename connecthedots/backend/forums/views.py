@@ -3,8 +3,9 @@ from .models import Post
 from .serializers import PostSerializer
 from usertopics.models import UserTopics
 from usertopics.utils import record_user_topic_action
+from connecthedots.serialization import FastListMixin
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(FastListMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
 
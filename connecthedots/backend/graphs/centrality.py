@@ -0,0 +1,205 @@
+import hashlib
+import numpy as np
+from django.db import transaction
+from connections.models import Connection
+from nodes.models import Node
+from .models import TopicCentrality, NodeCentrality
+from .utils import get_graph_version
+
+DAMPING = 0.85
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 100
+# betweenness is estimated from this many BFS sources, exact below it
+BETWEENNESS_SAMPLES = 64
+WRITE_BATCH_SIZE = 1000
+
+
+def load_edges(topic_id):
+    """Node ids plus (m, 2) arrays of directed and undirected row-index pairs."""
+    ids = np.fromiter(
+        Node.objects.filter(topic_id=topic_id).order_by('id').values_list('id', flat=True).iterator(chunk_size=5000),
+        dtype=np.int64
+    )
+    # ordered, so the edge digest does not follow rows that an UPDATE moved on disk
+    rows = Connection.objects.filter(topic_id=topic_id).order_by('id').values_list(
+        'firstNodeID_id', 'secondNodeID_id', 'relationDirection'
+    )
+    first, second, forward, backward = [], [], [], []
+    for a, b, direction in rows.iterator(chunk_size=5000):
+        first.append(a)
+        second.append(b)
+        forward.append(direction != 'SECOND_TO_FIRST')
+        backward.append(direction != 'FIRST_TO_SECOND')
+    first = np.array(first, dtype=np.int64)
+    second = np.array(second, dtype=np.int64)
+    # connections to nodes outside the topic are left out, as in the adjacency index
+    inside = np.isin(first, ids) & np.isin(second, ids)
+    first = np.searchsorted(ids, first[inside])
+    second = np.searchsorted(ids, second[inside])
+    forward = np.array(forward, dtype=bool)[inside]
+    backward = np.array(backward, dtype=bool)[inside]
+    directed = np.concatenate([
+        np.stack([first[forward], second[forward]], axis=1),
+        np.stack([second[backward], first[backward]], axis=1),
+    ]).reshape(-1, 2)
+    undirected = np.stack([first, second], axis=1).reshape(-1, 2)
+    return ids, directed, undirected
+
+
+def edge_digest(ids, directed):
+    """Fingerprint of a topic's node set and connections, unchanged by moves and renames."""
+    return hashlib.sha1(ids.tobytes() + directed.tobytes()).hexdigest()
+
+
+def pagerank(count, edges, start=None, damping=DAMPING, tol=TOLERANCE, max_iter=MAX_ITERATIONS):
+    """
+    Power iteration over the sparse transition matrix given as edge pairs.
+
+    ``start`` is the previous rank vector to warm-start from; after a small
+    edit it is already close to the answer and only a few steps are needed.
+    Returns ``(ranks, iterations)``.
+    """
+    if not count:
+        return np.zeros(0), 0
+    sources, targets = edges[:, 0], edges[:, 1]
+    out_degree = np.bincount(sources, minlength=count).astype(np.float64)
+    dangling = out_degree == 0
+    weights = np.divide(1.0, out_degree, out=np.zeros(count), where=~dangling)
+
+    ranks = np.full(count, 1.0 / count) if start is None else np.asarray(start, dtype=np.float64)
+    ranks = ranks / ranks.sum()
+    for iteration in range(1, max_iter + 1):
+        spread = np.bincount(targets, weights=(ranks * weights)[sources], minlength=count)
+        updated = (1 - damping) / count + damping * (spread + ranks[dangling].sum() / count)
+        change = np.abs(updated - ranks).sum()
+        ranks = updated
+        if change < tol:
+            break
+    return ranks, iteration
+
+
+def csr(count, edges):
+    order = np.argsort(edges[:, 0], kind='stable')
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(edges[:, 0], minlength=count), out=offsets[1:])
+    return offsets, edges[order, 1]
+
+
+def betweenness(count, edges, samples=BETWEENNESS_SAMPLES, seed=0):
+    """
+    Normalised betweenness of the undirected graph with Brandes' algorithm.
+
+    Each BFS runs level by level over whole frontiers. With more than
+    ``samples`` nodes only that many sources are used and the result is
+    scaled up, which keeps large topics to a fixed number of passes.
+    """
+    scores = np.zeros(count)
+    if count < 3:
+        return scores
+    both = np.concatenate([edges, edges[:, ::-1]])
+    offsets, targets = csr(count, both)
+    if count <= samples:
+        sources = np.arange(count)
+    else:
+        sources = np.random.default_rng(seed).choice(count, samples, replace=False)
+
+    for source in sources:
+        distance = np.full(count, -1, dtype=np.int64)
+        paths = np.zeros(count)
+        distance[source] = 0
+        paths[source] = 1
+        frontier = np.array([source])
+        levels = []
+        depth = 0
+        while len(frontier):
+            starts = offsets[frontier]
+            sizes = offsets[frontier + 1] - starts
+            total = sizes.sum()
+            if not total:
+                break
+            slots = np.arange(total) + np.repeat(starts - np.cumsum(sizes) + sizes, sizes)
+            tails = np.repeat(frontier, sizes)
+            heads = targets[slots]
+            fresh = np.unique(heads[distance[heads] == -1])
+            distance[fresh] = depth + 1
+            step = distance[heads] == depth + 1
+            tails, heads = tails[step], heads[step]
+            paths += np.bincount(heads, weights=paths[tails], minlength=count)
+            levels.append((tails, heads))
+            frontier = fresh
+            depth += 1
+
+        dependency = np.zeros(count)
+        for tails, heads in reversed(levels):
+            dependency += np.bincount(
+                tails, weights=paths[tails] / paths[heads] * (1 + dependency[heads]), minlength=count
+            )
+        dependency[source] = 0
+        scores += dependency
+
+    # every unordered pair is counted from both ends
+    return scores * (count / len(sources)) / ((count - 1) * (count - 2))
+
+
+def refresh_centrality(topic_id, force=False):
+    """
+    Bring the stored centrality of a topic up to its current graph version.
+
+    PageRank restarts from the stored ranks rather than from a uniform
+    vector. Returns the ``TopicCentrality`` row, or None for a missing topic.
+    """
+    version = get_graph_version(topic_id)
+    if version is None:
+        return None
+    state = TopicCentrality.objects.filter(topic_id=topic_id).first()
+    if state is not None and state.graphVersion == version and not force:
+        return state
+
+    ids, directed, undirected = load_edges(topic_id)
+    digest = edge_digest(ids, directed)
+    if state is not None and state.edgeDigest == digest and not force:
+        # renames, moves and other writes that do not touch the graph structure
+        TopicCentrality.objects.filter(topic_id=topic_id).update(graphVersion=version)
+        state.graphVersion = version
+        return state
+
+    previous = dict(NodeCentrality.objects.filter(topic_id=topic_id).values_list('node_id', 'pagerank'))
+    start = None
+    if previous and len(ids):
+        # new nodes join with the average rank, pagerank() renormalises
+        start = np.array([previous.get(node_id, 1.0 / len(ids)) for node_id in ids.tolist()])
+
+    ranks, iterations = pagerank(len(ids), directed, start)
+    degrees = np.bincount(undirected.ravel(), minlength=len(ids))
+    between = betweenness(len(ids), undirected, seed=topic_id)
+
+    rows = [
+        NodeCentrality(node_id=node_id, topic_id=topic_id, pagerank=rank, degree=degree, betweenness=score)
+        for node_id, rank, degree, score in zip(ids.tolist(), ranks.tolist(), degrees.tolist(), between.tolist())
+    ]
+    with transaction.atomic():
+        # rows of nodes moved to another topic since the last run
+        NodeCentrality.objects.filter(topic_id=topic_id).exclude(node__topic_id=topic_id).delete()
+        NodeCentrality.objects.bulk_create(
+            rows,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['node'],
+            update_fields=['topic', 'pagerank', 'degree', 'betweenness'],
+        )
+        state, _ = TopicCentrality.objects.update_or_create(
+            topic_id=topic_id,
+            defaults={'graphVersion': version, 'iterations': iterations, 'edgeDigest': digest},
+        )
+    return state
+
+
+def get_centrality(topic_id):
+    """``{node id: {pagerank, degree, betweenness}}`` for a topic, refreshed if stale."""
+    if refresh_centrality(topic_id) is None:
+        return None
+    rows = NodeCentrality.objects.filter(topic_id=topic_id).values_list('node_id', 'pagerank', 'degree', 'betweenness')
+    return {
+        node_id: {'pagerank': rank, 'degree': degree, 'betweenness': score}
+        for node_id, rank, degree, score in rows
+    }
@@ -0,0 +1,126 @@
+"""
+Copying a topic, or part of one, into a new topic with set-based SQL.
+
+Rows never pass through Python: nodes and connections are copied with one
+``INSERT ... SELECT`` each. Old and new node ids are paired by rank in id
+order (a single ``INSERT ... SELECT ... ORDER BY`` hands out ids in that
+order) and kept in ``ImportedNode`` rows, which the connection copy joins on
+to point at the new nodes. When the new ids have no gaps, the pairing is a
+plain offset and needs no join at all.
+"""
+from uuid import uuid4
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+from nodes.models import Node
+from connections.models import Connection
+from topics.models import Topic
+from wikis.models import WikiTopic
+from usertopics.utils import record_user_topic_action
+from .models import ImportedNode
+from .utils import record_graph_reset
+
+MAX_SELECTED_NODES = 10000
+
+
+def _table(model):
+    return db_connection.ops.quote_name(model._meta.db_table)
+
+
+def _columns(model, *names):
+    return {name: db_connection.ops.quote_name(model._meta.get_field(name).column) for name in names}
+
+
+def clone_topic(source, user, topic_name=None, node_ids=None):
+    """
+    Copy ``source`` into a new topic owned by ``user`` and return it.
+
+    With ``node_ids`` only those nodes of ``source`` are copied, together
+    with the connections between them. Wikidata links are kept. The new
+    topic has ``node_count`` and ``connection_count`` attributes set.
+    """
+    node = _columns(Node, 'id', 'manual_name', 'qid', 'creation_date', 'topic', 'created_by_user',
+                    'description', 'position_x', 'position_y')
+    edge = _columns(Connection, 'id', 'firstNodeID', 'secondNodeID', 'relationName', 'relationDirection',
+                    'creationDate', 'createdBy', 'topic')
+    mapping = _columns(ImportedNode, 'importID', 'sourceID', 'node')
+    usage = _columns(WikiTopic, 'wiki', 'topic', 'nodeCount')
+    nodes, connections, imported, wiki_topics = map(_table, (Node, Connection, ImportedNode, WikiTopic))
+
+    selection, selection_params = '', []
+    if node_ids is not None:
+        selection = f' AND {node["id"]} IN ({", ".join(["%s"] * len(node_ids))})'
+        selection_params = list(node_ids)
+    now = db_connection.ops.adapt_datetimefield_value(timezone.now())
+    clone_id = uuid4().hex
+
+    with transaction.atomic():
+        target = Topic.objects.create(
+            topicName=topic_name or f'{source.topicName} (copy)',
+            description=source.description,
+            createdBy=user,
+        )
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {nodes} ({node["manual_name"]}, {node["qid"]}, {node["creation_date"]}, '
+                f'{node["topic"]}, {node["created_by_user"]}, {node["description"]}, {node["position_x"]}, '
+                f'{node["position_y"]}) '
+                f'SELECT {node["manual_name"]}, {node["qid"]}, %s, %s, %s, {node["description"]}, '
+                f'{node["position_x"]}, {node["position_y"]} '
+                f'FROM {nodes} WHERE {node["topic"]} = %s{selection} ORDER BY {node["id"]}',
+                [now, target.id, user.id, source.id, *selection_params],
+            )
+            cursor.execute(
+                f'SELECT MIN({node["id"]}), MAX({node["id"]}), COUNT(*) FROM {nodes} WHERE {node["topic"]} = %s',
+                [target.id],
+            )
+            first_id, last_id, node_count = cursor.fetchone()
+            # the new topic is not visible to anyone else yet, so its rows are exactly the copies
+            if node_count and last_id - first_id + 1 == node_count:
+                # ids were handed out without gaps, the usual case: no join needed
+                cursor.execute(
+                    f'INSERT INTO {imported} ({mapping["importID"]}, {mapping["sourceID"]}, {mapping["node"]}) '
+                    f'SELECT %s, CAST({node["id"]} AS VARCHAR(255)), '
+                    f'%s + ROW_NUMBER() OVER (ORDER BY {node["id"]}) - 1 '
+                    f'FROM {nodes} WHERE {node["topic"]} = %s{selection}',
+                    [clone_id, first_id, source.id, *selection_params],
+                )
+            elif node_count:
+                # another writer took ids in between, pair old and new rows by rank instead
+                cursor.execute(
+                    f'INSERT INTO {imported} ({mapping["importID"]}, {mapping["sourceID"]}, {mapping["node"]}) '
+                    f'SELECT %s, CAST(src.id AS VARCHAR(255)), dst.id '
+                    f'FROM (SELECT {node["id"]} AS id, ROW_NUMBER() OVER (ORDER BY {node["id"]}) AS seq '
+                    f'      FROM {nodes} WHERE {node["topic"]} = %s{selection}) src '
+                    f'JOIN (SELECT {node["id"]} AS id, ROW_NUMBER() OVER (ORDER BY {node["id"]}) AS seq '
+                    f'      FROM {nodes} WHERE {node["topic"]} = %s) dst ON dst.seq = src.seq',
+                    [clone_id, source.id, *selection_params, target.id],
+                )
+            cursor.execute(
+                f'INSERT INTO {connections} ({edge["firstNodeID"]}, {edge["secondNodeID"]}, '
+                f'{edge["relationName"]}, {edge["relationDirection"]}, {edge["creationDate"]}, '
+                f'{edge["createdBy"]}, {edge["topic"]}) '
+                f'SELECT a.{mapping["node"]}, b.{mapping["node"]}, c.{edge["relationName"]}, '
+                f'c.{edge["relationDirection"]}, %s, %s, %s '
+                f'FROM {connections} c '
+                f'JOIN {imported} a ON a.{mapping["importID"]} = %s '
+                f'AND a.{mapping["sourceID"]} = CAST(c.{edge["firstNodeID"]} AS VARCHAR(255)) '
+                f'JOIN {imported} b ON b.{mapping["importID"]} = %s '
+                f'AND b.{mapping["sourceID"]} = CAST(c.{edge["secondNodeID"]} AS VARCHAR(255)) '
+                f'WHERE c.{edge["topic"]} = %s ORDER BY c.{edge["id"]}',
+                [now, user.id, target.id, clone_id, clone_id, source.id],
+            )
+            connection_count = cursor.rowcount
+            cursor.execute(
+                f'INSERT INTO {wiki_topics} ({usage["wiki"]}, {usage["topic"]}, {usage["nodeCount"]}) '
+                f'SELECT {node["qid"]}, %s, COUNT(*) FROM {nodes} '
+                f'WHERE {node["topic"]} = %s AND {node["qid"]} IS NOT NULL GROUP BY {node["qid"]}',
+                [target.id, target.id],
+            )
+        ImportedNode.objects.filter(importID=clone_id).delete()
+        record_user_topic_action(user, target, 'created')
+        record_graph_reset(target.id)
+
+    target.refresh_from_db()
+    target.node_count = node_count
+    target.connection_count = connection_count
+    return target
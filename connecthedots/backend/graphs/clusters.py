@@ -0,0 +1,157 @@
+import random
+from collections import defaultdict
+from django.core.cache import cache
+from .centrality import load_edges, edge_digest
+from .utils import get_graph_version
+
+CLUSTER_CACHE_TIMEOUT = 60 * 30
+# stop once a pass over every node moves less than this share of them
+MIN_MOVED_SHARE = 0.01
+
+
+def connected_components(count, edges):
+    """Component label per node row, from union-find with path halving."""
+    parent = list(range(count))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for first, second in edges.tolist():
+        a, b = find(first), find(second)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    labels = {}
+    return [labels.setdefault(find(node), len(labels)) for node in range(count)]
+
+
+def _move_nodes(adjacency, rng):
+    """One level of Louvain local moving; returns (community per node, moved anything)."""
+    count = len(adjacency)
+    degree = [sum(row.values()) for row in adjacency]
+    total = sum(degree)
+    community = list(range(count))
+    community_degree = degree[:]
+    moved_any = False
+    order = list(range(count))
+    while True:
+        rng.shuffle(order)
+        moved = 0
+        for node in order:
+            current = community[node]
+            links = defaultdict(float)
+            for other, weight in adjacency[node].items():
+                if other != node:
+                    links[community[other]] += weight
+            community_degree[current] -= degree[node]
+            scale = degree[node] / total
+            best = current
+            best_gain = links.get(current, 0.0) - community_degree[current] * scale
+            for candidate, weight in links.items():
+                gain = weight - community_degree[candidate] * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = candidate, gain
+            community_degree[best] += degree[node]
+            if best != current:
+                community[node] = best
+                moved += 1
+        if moved:
+            moved_any = True
+        if moved <= MIN_MOVED_SHARE * count:
+            return community, moved_any
+
+
+def louvain(count, edges, seed=0):
+    """
+    Cluster label per node row from the Louvain modularity heuristic.
+
+    Connection directions are ignored and repeated connections add weight.
+    Returns ``(labels, modularity)``.
+    """
+    adjacency = [defaultdict(float) for _ in range(count)]
+    for first, second in edges.tolist():
+        adjacency[first][second] += 1.0
+        adjacency[second][first] += 1.0
+    total = sum(sum(row.values()) for row in adjacency)
+    if not total:
+        return list(range(count)), 0.0
+
+    rng = random.Random(seed)
+    labels = list(range(count))
+    while True:
+        community, moved = _move_nodes(adjacency, rng)
+        if not moved:
+            break
+        renumber = {}
+        community = [renumber.setdefault(c, len(renumber)) for c in community]
+        labels = [community[label] for label in labels]
+        # collapse every community into one node and repeat on the smaller graph
+        merged = [defaultdict(float) for _ in range(len(renumber))]
+        for node, row in enumerate(adjacency):
+            for other, weight in row.items():
+                merged[community[node]][community[other]] += weight
+        adjacency = merged
+
+    inside = [row.get(node, 0.0) for node, row in enumerate(adjacency)]
+    degree = [sum(row.values()) for row in adjacency]
+    modularity = sum(w / total - (d / total) ** 2 for w, d in zip(inside, degree))
+    return labels, modularity
+
+
+def _groups(ids, labels):
+    members = defaultdict(list)
+    for node_id, label in zip(ids, labels):
+        members[label].append(node_id)
+    # largest first, ties by lowest node id
+    return sorted(members.values(), key=lambda nodes: (-len(nodes), nodes[0]))
+
+
+def get_topic_clusters(topic_id):
+    """
+    Components and clusters of a topic, None for a missing topic.
+
+    Results are cached per edge digest, so writes that leave the graph
+    structure alone (moves, renames) reuse them; the digest of each graph
+    version is cached too, which spares reloading the edges.
+    """
+    version = get_graph_version(topic_id)
+    if version is None:
+        return None
+    digest_key = f'graph-edge-digest:{topic_id}:{version}'
+    digest = cache.get(digest_key)
+    edges = None
+    if digest is None:
+        edges = load_edges(topic_id)
+        digest = edge_digest(edges[0], edges[1])
+        cache.set(digest_key, digest, CLUSTER_CACHE_TIMEOUT)
+    cache_key = f'graph-clusters:{topic_id}:{digest}'
+    result = cache.get(cache_key)
+    if result is not None:
+        return {**result, 'version': version}
+
+    ids, _, undirected = edges if edges is not None else load_edges(topic_id)
+    ids = ids.tolist()
+    components = _groups(ids, connected_components(len(ids), undirected))
+    labels, modularity = louvain(len(ids), undirected, seed=topic_id)
+    clusters = _groups(ids, labels)
+
+    component_of = {node_id: index for index, nodes in enumerate(components) for node_id in nodes}
+    result = {
+        'topic': topic_id,
+        'version': version,
+        'digest': digest,
+        'modularity': round(modularity, 6),
+        'components': [
+            {'id': index, 'size': len(nodes), 'nodes': nodes}
+            for index, nodes in enumerate(components)
+        ],
+        'clusters': [
+            {'id': index, 'size': len(nodes), 'component': component_of[nodes[0]], 'nodes': nodes}
+            for index, nodes in enumerate(clusters)
+        ],
+    }
+    cache.set(cache_key, result, CLUSTER_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,158 @@
+import threading
+from array import array
+from collections import OrderedDict, deque
+from connections.models import Connection
+from nodes.models import Node
+from .utils import get_structure_version
+
+# how many topic indexes a worker keeps in memory
+INDEX_CACHE_SIZE = 16
+
+
+class AdjacencyIndex:
+    """
+    Compact adjacency of one topic in CSR form.
+
+    Nodes are renumbered 0..n-1. For every node the slice
+    ``targets[offsets[i]:offsets[i + 1]]`` holds its neighbours and
+    ``edges`` the matching connection ids. Two layouts are kept: ``out``
+    follows ``relationDirection`` and ``both`` ignores it.
+    """
+    mode = 'memory'
+    truncated = False
+
+    def __init__(self, node_ids, connections):
+        self.node_ids = array('q', sorted(node_ids))
+        self.position = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        out_pairs = []
+        both_pairs = []
+        for connection_id, first, second, direction in connections:
+            a = self.position.get(first)
+            b = self.position.get(second)
+            if a is None or b is None:
+                continue
+            both_pairs.append((a, b, connection_id))
+            both_pairs.append((b, a, connection_id))
+            if direction == 'FIRST_TO_SECOND':
+                out_pairs.append((a, b, connection_id))
+            elif direction == 'SECOND_TO_FIRST':
+                out_pairs.append((b, a, connection_id))
+            else:
+                out_pairs.append((a, b, connection_id))
+                out_pairs.append((b, a, connection_id))
+        self.edge_count = len(both_pairs) // 2
+        self.out = self._csr(out_pairs)
+        self.both = self._csr(both_pairs)
+
+    def _csr(self, pairs):
+        size = len(self.node_ids)
+        offsets = array('l', [0]) * (size + 1)
+        for source, _, _ in pairs:
+            offsets[source + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+        cursor = array('l', offsets[:size])
+        targets = array('l', [0]) * len(pairs)
+        edges = array('q', [0]) * len(pairs)
+        for source, target, connection_id in pairs:
+            slot = cursor[source]
+            targets[slot] = target
+            edges[slot] = connection_id
+            cursor[source] = slot + 1
+        return offsets, targets, edges
+
+    @classmethod
+    def from_topic(cls, topic_id):
+        node_ids = Node.objects.filter(topic_id=topic_id).values_list('id', flat=True)
+        connections = Connection.objects.filter(topic_id=topic_id).values_list(
+            'id', 'firstNodeID_id', 'secondNodeID_id', 'relationDirection'
+        )
+        return cls(node_ids, connections.iterator(chunk_size=5000))
+
+    def __contains__(self, node_id):
+        return node_id in self.position
+
+    def _layout(self, directed):
+        return self.out if directed else self.both
+
+    def _bfs(self, source, directed, depth=None, target=None):
+        # returns {index: (distance, parent index, connection id)}
+        offsets, targets, edges = self._layout(directed)
+        start = self.position[source]
+        goal = self.position.get(target) if target is not None else None
+        seen = {start: (0, -1, 0)}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            distance = seen[current][0]
+            if current == goal or (depth is not None and distance >= depth):
+                continue
+            for slot in range(offsets[current], offsets[current + 1]):
+                neighbour = targets[slot]
+                if neighbour not in seen:
+                    seen[neighbour] = (distance + 1, current, edges[slot])
+                    if neighbour == goal:
+                        return seen
+                    queue.append(neighbour)
+        return seen
+
+    def neighborhood(self, node_id, depth, directed=False):
+        """Node id -> hop distance for every node within ``depth`` hops."""
+        seen = self._bfs(node_id, directed, depth=depth)
+        return {self.node_ids[index]: distance for index, (distance, _, _) in seen.items()}
+
+    def shortest_path(self, source, target, directed=True):
+        """``(node ids, connection ids)`` of a shortest path, or None."""
+        seen = self._bfs(source, directed, target=target)
+        goal = self.position[target]
+        if goal not in seen:
+            return None
+        nodes = []
+        connections = []
+        current = goal
+        while current != -1:
+            _, parent, connection_id = seen[current]
+            nodes.append(self.node_ids[current])
+            if parent != -1:
+                connections.append(connection_id)
+            current = parent
+        return nodes[::-1], connections[::-1]
+
+    def reachable(self, source, directed=True):
+        """Ids of every node reachable from ``source``."""
+        return {self.node_ids[index] for index in self._bfs(source, directed)}
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_topic_index(topic_id, version=None):
+    """
+    The topic's index, rebuilt when its structure version moved on.
+
+    Node moves and renames do not touch the adjacency, so the index is kept
+    across them. Returns None when the topic does not exist.
+    """
+    if version is None:
+        version = get_structure_version(topic_id)
+    if version is None:
+        return None
+    with _indexes_lock:
+        cached = _indexes.get(topic_id)
+        if cached is not None and cached[0] == version:
+            _indexes.move_to_end(topic_id)
+            return cached[1]
+
+    index = AdjacencyIndex.from_topic(topic_id)
+    with _indexes_lock:
+        _indexes[topic_id] = (version, index)
+        _indexes.move_to_end(topic_id)
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def clear_topic_indexes():
+    with _indexes_lock:
+        _indexes.clear()
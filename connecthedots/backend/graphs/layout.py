@@ -0,0 +1,169 @@
+import time
+import numpy as np
+from connections.models import Connection
+from nodes.models import Node
+from nodes.utils import apply_positions
+
+# ideal edge length, matches the spacing Graph.js uses for its grid fallback
+IDEAL_DISTANCE = 250.0
+# entries per temporary array of a repulsion block (16 MB of float64): blocks get
+# fewer rows as the topic grows, so a step fits in the worker's memory limit
+REPULSION_CELLS = 2_000_000
+# layouts run on the request worker, so they are kept short
+MAX_TIME_BUDGET = 2.0
+
+
+def force_layout(positions, edges, movable=None, iterations=200, time_budget=None, ideal=IDEAL_DISTANCE):
+    """
+    Fruchterman-Reingold layout over NumPy arrays.
+
+    ``positions`` is an (n, 2) float array, ``edges`` an (m, 2) int array of
+    row indexes and ``movable`` a boolean mask of rows allowed to move (all
+    by default). Stops after ``iterations`` steps or ``time_budget``
+    seconds; the deadline is also checked between repulsion blocks, and a
+    step cut short there is dropped. Returns ``(positions, iterations run)``.
+    """
+    positions = np.array(positions, dtype=np.float64)
+    count = len(positions)
+    if count < 2:
+        return positions, 0
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if movable is None:
+        movable = np.ones(count, dtype=bool)
+    moving = np.flatnonzero(movable)
+    if not len(moving):
+        return positions, 0
+
+    span = np.ptp(positions, axis=0).max()
+    temperature = max(span, ideal * np.sqrt(count)) / 10
+    cooling = temperature / (iterations + 1)
+    ideal_sq = ideal * ideal
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    block = max(1, REPULSION_CELLS // count)
+
+    run = 0
+    for step_number in range(1, iterations + 1):
+        displacement = np.zeros((len(moving), 2))
+
+        # repulsion between every moving node and all nodes, in row blocks
+        xs = positions[:, 0]
+        ys = positions[:, 1]
+        for start in range(0, len(moving), block):
+            if start and deadline is not None and time.perf_counter() >= deadline:
+                return positions, run
+            rows = moving[start:start + block]
+            dx = xs[rows, None] - xs[None, :]
+            dy = ys[rows, None] - ys[None, :]
+            weight = dx * dx
+            weight += dy * dy
+            np.maximum(weight, 1e-2, out=weight)
+            np.divide(ideal_sq, weight, out=weight)
+            displacement[start:start + len(rows), 0] += (dx * weight).sum(axis=1)
+            displacement[start:start + len(rows), 1] += (dy * weight).sum(axis=1)
+
+        # attraction along connections
+        if len(edges):
+            delta = positions[edges[:, 0]] - positions[edges[:, 1]]
+            distance = np.sqrt(np.einsum('ij,ij->i', delta, delta))[:, None]
+            pull = delta * distance / ideal
+            full = np.zeros((count, 2))
+            np.add.at(full, edges[:, 0], -pull)
+            np.add.at(full, edges[:, 1], pull)
+            displacement += full[moving]
+
+        length = np.sqrt(np.einsum('ij,ij->i', displacement, displacement))
+        np.maximum(length, 1e-9, out=length)
+        step = np.minimum(length, temperature) / length
+        positions[moving] += displacement * step[:, None]
+        temperature = max(temperature - cooling, ideal / 100)
+        run = step_number
+
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+    return positions, run
+
+
+def place_near_neighbours(positions, edges, new, rng, ideal=IDEAL_DISTANCE):
+    """
+    Initial spot for every row flagged in ``new``: the centre of its already
+    placed neighbours plus some jitter, or the rim of the graph when it has none.
+    """
+    positions = np.array(positions, dtype=np.float64)
+    placed = ~new
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    if placed.any():
+        centre = positions[placed].mean(axis=0)
+        radius = np.sqrt(((positions[placed] - centre) ** 2).sum(axis=1)).max() + ideal
+    else:
+        centre = np.zeros(2)
+        radius = ideal
+
+    # sum and count of placed neighbour positions for every node
+    total = np.zeros_like(positions)
+    neighbours = np.zeros(len(positions))
+    for a, b in ((0, 1), (1, 0)):
+        usable = placed[edges[:, b]]
+        np.add.at(total, edges[usable, a], positions[edges[usable, b]])
+        np.add.at(neighbours, edges[usable, a], 1)
+
+    for row in np.flatnonzero(new):
+        angle = rng.uniform(0, 2 * np.pi)
+        direction = np.array([np.cos(angle), np.sin(angle)])
+        if neighbours[row]:
+            positions[row] = total[row] / neighbours[row] + ideal / 2 * direction
+        else:
+            positions[row] = centre + radius * direction
+    return positions
+
+
+def layout_topic(topic_id, mode='incremental', node_ids=None, time_budget=2.0, iterations=200, seed=None):
+    """
+    Compute and store positions for a topic.
+
+    ``incremental`` only places ``node_ids`` (by default the nodes still at
+    the model's (0, 0) default) next to their neighbours, ``full`` lays out
+    the whole topic. Positions are written back with one bulk update.
+    Returns a summary dict.
+    """
+    started = time.perf_counter()
+    rows = list(Node.objects.filter(topic_id=topic_id).order_by('id').values_list('id', 'position_x', 'position_y'))
+    if not rows:
+        return {'mode': mode, 'moved': 0, 'iterations': 0, 'elapsed_ms': 0.0}
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    positions = np.array([row[1:] for row in rows], dtype=np.float64)
+    row_of = {node_id: i for i, node_id in enumerate(ids.tolist())}
+    pairs = Connection.objects.filter(topic_id=topic_id).values_list('firstNodeID_id', 'secondNodeID_id')
+    edges = np.array(
+        [(row_of[a], row_of[b]) for a, b in pairs.iterator(chunk_size=5000) if a in row_of and b in row_of],
+        dtype=np.int64
+    ).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+
+    if mode == 'full':
+        movable = np.ones(len(ids), dtype=bool)
+        if np.ptp(positions, axis=0).max() == 0:
+            # nothing placed yet: start from a random disc instead of one point
+            positions = rng.normal(scale=IDEAL_DISTANCE * np.sqrt(len(ids)) / 2, size=positions.shape)
+    else:
+        if node_ids is None:
+            movable = (positions[:, 0] == 0) & (positions[:, 1] == 0)
+        else:
+            movable = np.isin(ids, np.array(list(node_ids), dtype=np.int64))
+        positions = place_near_neighbours(positions, edges, movable, rng)
+
+    time_budget = min(time_budget, MAX_TIME_BUDGET)
+    remaining = max(time_budget - (time.perf_counter() - started), 0.05)
+    positions, run = force_layout(positions, edges, movable, iterations=iterations, time_budget=remaining)
+
+    updates = {
+        int(node_id): (float(x), float(y))
+        for node_id, (x, y) in zip(ids[movable], positions[movable])
+    }
+    results = apply_positions(updates, topic_id)
+    return {
+        'mode': mode,
+        'moved': sum(1 for result in results.values() if result == 'updated'),
+        'iterations': run,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from graphs.models import GraphChange
+from graphs.utils import compact_graph_changes
+
+
+class Command(BaseCommand):
+    help = "Drop old graph change log entries, keeping the most recent ones per topic"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=10000, help='changes to keep per topic')
+        parser.add_argument('--topic', type=int, help='only compact this topic')
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        if keep < 0:
+            self.stderr.write('--keep must not be negative')
+            return
+        if options['topic']:
+            topic_ids = [options['topic']]
+        else:
+            topic_ids = GraphChange.objects.order_by().values_list('topic_id', flat=True).distinct()
+
+        total = 0
+        for topic_id in topic_ids:
+            total += compact_graph_changes(topic_id, keep)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {total} change log entries'))
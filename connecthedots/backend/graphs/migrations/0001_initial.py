@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("topics", "0003_topic_graphversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GraphChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("seq", models.PositiveBigIntegerField()),
+                (
+                    "entity",
+                    models.CharField(
+                        choices=[("node", "Node"), ("connection", "Connection")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "operation",
+                    models.CharField(
+                        choices=[
+                            ("insert", "Insert"),
+                            ("update", "Update"),
+                            ("delete", "Delete"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("objectID", models.BigIntegerField()),
+                ("data", models.JSONField(blank=True, null=True)),
+                ("creationDate", models.DateTimeField(auto_now_add=True)),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="graph_changes",
+                        to="topics.topic",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_changes",
+                "ordering": ["seq"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("topic", "seq"), name="graph_changes_topic_seq_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("graphs", "0001_initial"),
+        ("nodes", "0002_node_position_x_node_position_y"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportedNode",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("importID", models.CharField(max_length=36)),
+                ("sourceID", models.CharField(max_length=255)),
+                (
+                    "node",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="nodes.node",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_imported_nodes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("importID", "sourceID"),
+                        name="graph_imported_nodes_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("graphs", "0002_importednode"),
+        ("nodes", "0002_node_position_x_node_position_y"),
+        ("topics", "0003_topic_graphversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TopicCentrality",
+            fields=[
+                (
+                    "topic",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="centrality",
+                        serialize=False,
+                        to="topics.topic",
+                    ),
+                ),
+                ("graphVersion", models.PositiveBigIntegerField(default=0)),
+                ("iterations", models.IntegerField(default=0)),
+                ("edgeDigest", models.CharField(blank=True, default="", max_length=40)),
+                ("updatedDate", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "graph_topic_centrality",
+            },
+        ),
+        migrations.CreateModel(
+            name="NodeCentrality",
+            fields=[
+                (
+                    "node",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="centrality",
+                        serialize=False,
+                        to="nodes.node",
+                    ),
+                ),
+                ("pagerank", models.FloatField(default=0)),
+                ("degree", models.IntegerField(default=0)),
+                ("betweenness", models.FloatField(default=0)),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="node_centrality",
+                        to="topics.topic",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_node_centrality",
+                "indexes": [
+                    models.Index(
+                        fields=["topic", "-pagerank"],
+                        name="graph_node__topic_i_01901c_idx",
+                    )
+                ],
+            },
+        ),
+    ]
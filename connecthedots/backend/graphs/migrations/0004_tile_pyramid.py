@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("graphs", "0003_topiccentrality_nodecentrality"),
+        ("topics", "0003_topic_graphversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TilePyramid",
+            fields=[
+                (
+                    "topic",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="tile_pyramid",
+                        serialize=False,
+                        to="topics.topic",
+                    ),
+                ),
+                ("graphVersion", models.PositiveBigIntegerField(default=0)),
+                ("updatedDate", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "graph_tile_pyramids",
+            },
+        ),
+        migrations.CreateModel(
+            name="GraphTile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("level", models.SmallIntegerField()),
+                ("x", models.IntegerField()),
+                ("y", models.IntegerField()),
+                ("count", models.IntegerField(default=0)),
+                ("sumX", models.FloatField(default=0)),
+                ("sumY", models.FloatField(default=0)),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="graph_tiles",
+                        to="topics.topic",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_tiles",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("topic", "level", "x", "y"),
+                        name="graph_tiles_cell_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="GraphTileEdge",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("level", models.SmallIntegerField()),
+                ("x1", models.IntegerField()),
+                ("y1", models.IntegerField()),
+                ("x2", models.IntegerField()),
+                ("y2", models.IntegerField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="graph_tile_edges",
+                        to="topics.topic",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_tile_edges",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("topic", "level", "x1", "y1", "x2", "y2"),
+                        name="graph_tile_edges_pair_uniq",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("graphs", "0004_tile_pyramid"),
+        ("topics", "0003_topic_graphversion"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GraphSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("graphVersion", models.PositiveBigIntegerField()),
+                ("nodeCount", models.IntegerField()),
+                ("connectionCount", models.IntegerField()),
+                ("data", models.BinaryField()),
+                ("creationDate", models.DateTimeField(auto_now_add=True)),
+                (
+                    "createdBy",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="graph_snapshots",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="graph_snapshots",
+                        to="topics.topic",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "graph_snapshots",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("topic", "name"), name="graph_snapshots_name_uniq"
+                    )
+                ],
+            },
+        ),
+    ]
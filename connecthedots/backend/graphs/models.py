@@ -0,0 +1,186 @@
+from django.db import models
+
+
+class GraphChange(models.Model):
+    """Append-only log of node and connection writes, ordered per topic by ``seq``."""
+    NODE = 'node'
+    CONNECTION = 'connection'
+    ENTITY_CHOICES = [
+        (NODE, 'Node'),
+        (CONNECTION, 'Connection'),
+    ]
+    INSERT = 'insert'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [
+        (INSERT, 'Insert'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    topic = models.ForeignKey(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        related_name='graph_changes'
+    )
+    seq = models.PositiveBigIntegerField()
+    entity = models.CharField(max_length=20, choices=ENTITY_CHOICES)
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    objectID = models.BigIntegerField()
+    # full row for inserts, changed fields for updates, nothing for deletes
+    data = models.JSONField(null=True, blank=True)
+    creationDate = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'graph_changes'
+        ordering = ['seq']
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'seq'], name='graph_changes_topic_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Change {self.seq} on topic {self.topic_id}: {self.operation} {self.entity} {self.objectID}"
+
+
+class ImportedNode(models.Model):
+    """Maps node ids from an import file to the rows created for them while the import runs."""
+    importID = models.CharField(max_length=36)
+    sourceID = models.CharField(max_length=255)
+    node = models.ForeignKey('nodes.Node', on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        db_table = 'graph_imported_nodes'
+        constraints = [
+            models.UniqueConstraint(fields=['importID', 'sourceID'], name='graph_imported_nodes_uniq'),
+        ]
+
+
+class TopicCentrality(models.Model):
+    """Graph version the stored ``NodeCentrality`` rows of a topic were computed at."""
+    topic = models.OneToOneField(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='centrality'
+    )
+    graphVersion = models.PositiveBigIntegerField(default=0)
+    iterations = models.IntegerField(default=0)
+    # hash of the node ids and edges, a version bump that leaves them alone skips the recompute
+    edgeDigest = models.CharField(max_length=40, blank=True, default='')
+    updatedDate = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'graph_topic_centrality'
+
+
+class NodeCentrality(models.Model):
+    node = models.OneToOneField(
+        'nodes.Node',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='centrality'
+    )
+    topic = models.ForeignKey(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        related_name='node_centrality'
+    )
+    pagerank = models.FloatField(default=0)
+    degree = models.IntegerField(default=0)
+    betweenness = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'graph_node_centrality'
+        indexes = [
+            models.Index(fields=['topic', '-pagerank']),
+        ]
+
+
+class TilePyramid(models.Model):
+    """Graph version the stored tiles of a topic match; older pyramids are rebuilt in the background."""
+    topic = models.OneToOneField(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='tile_pyramid'
+    )
+    graphVersion = models.PositiveBigIntegerField(default=0)
+    updatedDate = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'graph_tile_pyramids'
+
+
+class GraphTile(models.Model):
+    """Nodes of one grid cell at one zoom level; the cell is ``TILE_SIZE * 2 ** level`` wide."""
+    topic = models.ForeignKey(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        related_name='graph_tiles'
+    )
+    level = models.SmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    count = models.IntegerField(default=0)
+    # sums rather than means so moves can be applied as plain deltas
+    sumX = models.FloatField(default=0)
+    sumY = models.FloatField(default=0)
+
+    class Meta:
+        db_table = 'graph_tiles'
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'level', 'x', 'y'], name='graph_tiles_cell_uniq'),
+        ]
+
+
+class GraphTileEdge(models.Model):
+    """Number of connections between two cells of a level, stored once with the smaller cell first."""
+    topic = models.ForeignKey(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        related_name='graph_tile_edges'
+    )
+    level = models.SmallIntegerField()
+    x1 = models.IntegerField()
+    y1 = models.IntegerField()
+    x2 = models.IntegerField()
+    y2 = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'graph_tile_edges'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['topic', 'level', 'x1', 'y1', 'x2', 'y2'], name='graph_tile_edges_pair_uniq'
+            ),
+        ]
+
+
+class GraphSnapshot(models.Model):
+    """A named copy of a topic's nodes and connections, zlib-compressed in the precise wire layout."""
+    topic = models.ForeignKey(
+        'topics.Topic',
+        on_delete=models.CASCADE,
+        related_name='graph_snapshots'
+    )
+    name = models.CharField(max_length=100)
+    graphVersion = models.PositiveBigIntegerField()
+    nodeCount = models.IntegerField()
+    connectionCount = models.IntegerField()
+    data = models.BinaryField()
+    createdBy = models.ForeignKey(
+        'users.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='graph_snapshots'
+    )
+    creationDate = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'graph_snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['topic', 'name'], name='graph_snapshots_name_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Snapshot {self.name} of topic {self.topic_id} at version {self.graphVersion}"
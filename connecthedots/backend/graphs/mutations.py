@@ -0,0 +1,297 @@
+import math
+from django.db import transaction
+from django.db.models import Q
+from nodes.models import Node
+from nodes.serializers import NodeSerializer
+from connections.models import Connection
+from connections.serializers import ConnectionSerializer
+from wikis.models import Wiki
+from wikis.utils import record_wiki_usage
+from wikis.enrichment import enrich_later
+from usertopics.utils import record_user_topic_action
+from .models import GraphChange
+from .utils import record_graph_changes
+
+MAX_OPERATIONS = 5000
+OPERATIONS = ('create', 'update', 'delete')
+NODE_FIELDS = {'manual_name', 'qid', 'description', 'position_x', 'position_y'}
+CONNECTION_FIELDS = {'firstNodeID', 'secondNodeID', 'relationName', 'relationDirection'}
+DIRECTIONS = {choice for choice, _ in Connection.DIRECTION_CHOICES}
+ENDPOINTS = [Connection._meta.get_field(name) for name in ('firstNodeID', 'secondNodeID')]
+
+
+def _text(value, name, max_length=None, nullable=True):
+    if value is None and nullable:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{name} must be a string')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'{name} must be at most {max_length} characters')
+    return value
+
+
+def _ends(connection):
+    # only endpoints assigned in the batch are cached, reading others would query
+    return [field.get_cached_value(connection, None) for field in ENDPOINTS]
+
+
+def _number(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f'{name} must be a finite number')
+    return float(value)
+
+
+class MutationBatch:
+    """
+    Applies an ordered list of node and connection operations to one topic.
+
+    Operations are first replayed on in-memory rows, so later ones see the
+    effect of earlier ones and may refer to rows created earlier in the batch
+    by their client ``tempId``. Only the net result is written, with one bulk
+    statement per kind of write, and logged as one run of graph changes.
+    """
+
+    def __init__(self, topic, user):
+        self.topic = topic
+        self.user = user
+        self.nodes = {}
+        self.connections = {}
+        self.temp_nodes = {}
+        self.temp_connections = {}
+        self.updated_nodes = {}
+        self.updated_connections = {}
+        self.deleted_nodes = set()
+        self.deleted_connections = set()
+        self.old_usage = {}
+
+    def run(self, operations):
+        if not isinstance(operations, list) or not operations:
+            raise ValueError('operations must be a non-empty list')
+        if len(operations) > MAX_OPERATIONS:
+            raise ValueError(f'at most {MAX_OPERATIONS} operations per batch')
+        self.load(operations)
+        for index, operation in enumerate(operations):
+            try:
+                self.apply(operation)
+            except ValueError as e:
+                raise ValueError(f'operation {index}: {e}')
+        with transaction.atomic():
+            return self.write()
+
+    def load(self, operations):
+        """Fetch every existing row the batch refers to, two queries in total."""
+        node_ids, connection_ids = set(), set()
+        for operation in operations:
+            if not isinstance(operation, dict):
+                raise ValueError('every operation must be an object')
+            ids = node_ids if operation.get('type') == 'node' else connection_ids
+            if isinstance(operation.get('id'), int):
+                ids.add(operation['id'])
+            data = operation.get('data')
+            if isinstance(data, dict):
+                ends = (data.get('firstNodeID'), data.get('secondNodeID'))
+                node_ids.update(end for end in ends if isinstance(end, int))
+        if node_ids:
+            self.nodes = Node.objects.filter(topic_id=self.topic.id).in_bulk(node_ids)
+        if connection_ids:
+            self.connections = Connection.objects.filter(topic_id=self.topic.id).in_bulk(connection_ids)
+        self.old_usage = {node.id: (node.qid_id, node.topic_id) for node in self.nodes.values()}
+
+    def apply(self, operation):
+        op, kind = operation.get('op'), operation.get('type')
+        if op not in OPERATIONS:
+            raise ValueError('op must be create, update or delete')
+        if kind not in ('node', 'connection'):
+            raise ValueError('type must be node or connection')
+        data = operation.get('data', {})
+        if not isinstance(data, dict):
+            raise ValueError('data must be an object')
+        allowed = NODE_FIELDS if kind == 'node' else CONNECTION_FIELDS
+        unknown = data.keys() - allowed
+        if unknown:
+            raise ValueError(f'unknown fields {", ".join(sorted(unknown))}')
+
+        if op == 'create':
+            temp_id = operation.get('tempId')
+            if not isinstance(temp_id, str) or not temp_id:
+                raise ValueError('create needs a string tempId')
+            temps = self.temp_nodes if kind == 'node' else self.temp_connections
+            if temp_id in temps:
+                raise ValueError(f'tempId {temp_id!r} is used twice')
+            if kind == 'node':
+                row = Node(topic=self.topic, created_by_user=self.user)
+                self.set_node_fields(row, data)
+            else:
+                missing = {'firstNodeID', 'secondNodeID', 'relationName'} - data.keys()
+                if missing:
+                    raise ValueError(f'missing fields {", ".join(sorted(missing))}')
+                row = Connection(topic=self.topic, createdBy=self.user)
+                self.set_connection_fields(row, data)
+            temps[temp_id] = row
+            return
+
+        row = self.node(operation.get('id')) if kind == 'node' else self.connection(operation.get('id'))
+        if op == 'update':
+            if kind == 'node':
+                fields = self.set_node_fields(row, data)
+                updated = self.updated_nodes
+            else:
+                fields = self.set_connection_fields(row, data)
+                updated = self.updated_connections
+            if row.pk is not None:
+                updated.setdefault(row.pk, set()).update(fields)
+        elif kind == 'node':
+            self.delete_node(row)
+        else:
+            self.delete_connection(row)
+
+    def node(self, ref):
+        return self._resolve(ref, self.nodes, self.temp_nodes, self.deleted_nodes, 'node')
+
+    def connection(self, ref):
+        return self._resolve(ref, self.connections, self.temp_connections, self.deleted_connections, 'connection')
+
+    def _resolve(self, ref, existing, temps, deleted, name):
+        if isinstance(ref, str):
+            row = temps.get(ref)
+            if row is None:
+                raise ValueError(f'{name} tempId {ref!r} is not created earlier in the batch')
+            return row
+        if isinstance(ref, bool) or not isinstance(ref, int):
+            raise ValueError(f'{name} id must be an integer or a tempId')
+        if ref not in existing or ref in deleted:
+            raise ValueError(f'{name} {ref} not found in this topic')
+        return existing[ref]
+
+    def set_node_fields(self, node, data):
+        for name, value in data.items():
+            if name == 'qid':
+                node.qid_id = _text(value, name, max_length=100) or None
+            elif name in ('position_x', 'position_y'):
+                setattr(node, name, _number(value, name))
+            else:
+                setattr(node, name, _text(value, name, max_length=255 if name == 'manual_name' else None))
+        return set(data)
+
+    def set_connection_fields(self, connection, data):
+        for name, value in data.items():
+            if name in ('firstNodeID', 'secondNodeID'):
+                setattr(connection, name, self.node(value))
+            elif name == 'relationDirection':
+                if value not in DIRECTIONS:
+                    raise ValueError(f'unknown relationDirection {value!r}')
+                connection.relationDirection = value
+            else:
+                connection.relationName = _text(value, name, max_length=255, nullable=False)
+        return set(data)
+
+    def delete_node(self, node):
+        # connections pointed at the node in this batch go with it, as the database cascade would
+        # do; rows still pointing where they did in the database are found after the writes
+        pending = [
+            *(connection for connection in self.temp_connections.values() if connection is not None),
+            *(self.connections[connection_id] for connection_id in self.updated_connections),
+        ]
+        for connection in pending:
+            if any(end is not None and end == node for end in _ends(connection)):
+                self.delete_connection(connection)
+        if node.pk is None:
+            self._forget(node, self.temp_nodes)
+        else:
+            self.deleted_nodes.add(node.pk)
+            self.updated_nodes.pop(node.pk, None)
+
+    def delete_connection(self, connection):
+        if connection.pk is None:
+            self._forget(connection, self.temp_connections)
+        else:
+            self.deleted_connections.add(connection.pk)
+            self.updated_connections.pop(connection.pk, None)
+
+    @staticmethod
+    def _forget(row, temps):
+        # the tempId stays taken but resolves to nothing from now on
+        for temp_id, other in temps.items():
+            if other is row:
+                temps[temp_id] = None
+
+    def write(self):
+        created_nodes = {temp_id: node for temp_id, node in self.temp_nodes.items() if node is not None}
+        created_connections = {
+            temp_id: connection for temp_id, connection in self.temp_connections.items() if connection is not None
+        }
+        updated_nodes = [self.nodes[node_id] for node_id in self.updated_nodes]
+        updated_connections = [self.connections[connection_id] for connection_id in self.updated_connections]
+
+        qids = {node.qid_id for node in [*created_nodes.values(), *updated_nodes] if node.qid_id}
+        if qids:
+            # placeholders for items not seen before, as the node views do one at a time
+            Wiki.objects.bulk_create([Wiki(qID=qid, label='', description='') for qid in qids], ignore_conflicts=True)
+            enrich_later(qids)
+
+        Node.objects.bulk_create(created_nodes.values())
+        self._bulk_update(Node, updated_nodes, self.updated_nodes)
+        Connection.objects.bulk_create(created_connections.values())
+        self._bulk_update(Connection, updated_connections, self.updated_connections)
+
+        deleted_connections = set(self.deleted_connections)
+        if self.deleted_nodes:
+            deleted_connections.update(
+                Connection.objects.filter(topic_id=self.topic.id)
+                .filter(Q(firstNodeID_id__in=self.deleted_nodes) | Q(secondNodeID_id__in=self.deleted_nodes))
+                .values_list('id', flat=True)
+            )
+            updated_connections = [c for c in updated_connections if c.pk not in deleted_connections]
+        Connection.objects.filter(id__in=deleted_connections).delete()
+        Node.objects.filter(id__in=self.deleted_nodes).delete()
+
+        nodes = NodeSerializer([*created_nodes.values(), *updated_nodes], many=True).data
+        connections = ConnectionSerializer([*created_connections.values(), *updated_connections], many=True).data
+        created_node_count = len(created_nodes)
+        created_connection_count = len(created_connections)
+        changes = [
+            (GraphChange.NODE, GraphChange.INSERT, data['id'], data) for data in nodes[:created_node_count]
+        ] + [
+            (GraphChange.CONNECTION, GraphChange.INSERT, data['id'], data)
+            for data in connections[:created_connection_count]
+        ] + [
+            (GraphChange.NODE, GraphChange.UPDATE, data['id'], data) for data in nodes[created_node_count:]
+        ] + [
+            (GraphChange.CONNECTION, GraphChange.UPDATE, data['id'], data)
+            for data in connections[created_connection_count:]
+        ] + [
+            (GraphChange.CONNECTION, GraphChange.DELETE, connection_id, None)
+            for connection_id in sorted(deleted_connections)
+        ] + [
+            (GraphChange.NODE, GraphChange.DELETE, node_id, None) for node_id in sorted(self.deleted_nodes)
+        ]
+
+        record_wiki_usage(
+            added=[(node.qid_id, node.topic_id) for node in [*created_nodes.values(), *updated_nodes]],
+            removed=[self.old_usage[node.id] for node in updated_nodes]
+            + [self.old_usage[node_id] for node_id in self.deleted_nodes],
+        )
+        version = record_graph_changes(self.topic.id, changes) or self.topic.graphVersion
+        # one interaction for the whole batch
+        record_user_topic_action(self.user, self.topic, 'addedNode')
+        return {
+            'version': version,
+            'ids': {
+                'nodes': {temp_id: node.id for temp_id, node in created_nodes.items()},
+                'connections': {temp_id: connection.id for temp_id, connection in created_connections.items()},
+            },
+            'nodes': nodes,
+            'connections': connections,
+            'deleted': {'nodes': sorted(self.deleted_nodes), 'connections': sorted(deleted_connections)},
+        }
+
+    @staticmethod
+    def _bulk_update(model, rows, fields_by_id):
+        fields = set().union(*fields_by_id.values()) if fields_by_id else set()
+        if rows and fields:
+            model.objects.bulk_update(rows, sorted(fields))
+
+
+def apply_mutations(topic, user, operations):
+    """Run a mutation batch against ``topic``; raises ValueError for an invalid batch."""
+    return MutationBatch(topic, user).run(operations)
@@ -0,0 +1,271 @@
+import asyncio
+import json
+import logging
+import re
+import select
+import threading
+from collections import defaultdict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+SOCKET_PATH = re.compile(r'^/ws/topics/(?P<topic_id>\d+)/$')
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+NOTIFY_CHANNEL = 'graph_events'
+# PostgreSQL refuses NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_BYTES = 7900
+LISTEN_POLL_SECONDS = 5
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """A subscriber's queue, bound to the event loop that reads it."""
+
+    def __init__(self, topic_id, loop, max_queue):
+        self.topic_id = topic_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+
+    def deliver(self, message):
+        # publishers run in worker threads, the queue belongs to the socket's loop
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        if self.queue.full():
+            # a slow client lost events; tell it to reload instead of blocking publishers
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'graph.resync', 'topic': self.topic_id})
+            return
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Fan-out of graph events to the WebSocket subscribers of this process.
+
+    Writes handled by another worker process never reach these subscribers,
+    so this broker only suits a single process; see ``PostgresBroker``.
+    """
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic_id):
+        subscription = Subscription(topic_id, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers[topic_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic_id]
+
+    def publish(self, topic_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+        return len(subscribers)
+
+    def subscriber_count(self, topic_id):
+        with self._lock:
+            return len(self._subscribers.get(topic_id, ()))
+
+
+def notification_payload(message):
+    """``message`` as a NOTIFY payload; events over the size limit become a resync of the same version."""
+    payload = json.dumps(message, separators=(',', ':'))
+    if len(payload.encode()) <= MAX_NOTIFY_BYTES:
+        return payload
+    return json.dumps({'type': 'graph.resync', 'topic': message['topic'], 'version': message.get('version')})
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Fan-out across worker processes through PostgreSQL LISTEN/NOTIFY.
+
+    ``publish`` sends a NOTIFY on the default database; every process with
+    subscribers runs a listener thread on its own connection and hands what
+    arrives to its local subscribers, the publishing process included.
+    Events too large for a notification (8000 bytes) arrive as
+    ``graph.resync``, which clients answer by reading ``/changes/``.
+    """
+
+    def __init__(self, max_queue=1000, channel=NOTIFY_CHANNEL):
+        super().__init__(max_queue)
+        self.channel = channel
+        self._listener = None
+        self._stop = threading.Event()
+
+    def subscribe(self, topic_id):
+        self._ensure_listener()
+        return super().subscribe(topic_id)
+
+    def publish(self, topic_id, message):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, notification_payload(message)])
+        return self.subscriber_count(topic_id)
+
+    def stop(self):
+        self._stop.set()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='graph-listener', daemon=True)
+                self._listener.start()
+
+    def _connect(self):
+        import psycopg2
+        from django.db import connections
+        database = connections['default'].settings_dict
+        connection = psycopg2.connect(
+            dbname=database['NAME'], user=database['USER'], password=database['PASSWORD'],
+            host=database['HOST'], port=database['PORT'],
+        )
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return connection
+
+    def _listen(self):
+        delay = 1
+        while not self._stop.is_set():
+            try:
+                connection = self._connect()
+            except Exception:
+                logger.exception('Connecting the graph event listener failed')
+                self._stop.wait(delay)
+                delay = min(delay * 2, 30)
+                continue
+            delay = 1
+            try:
+                while not self._stop.is_set():
+                    if select.select([connection], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        message = json.loads(connection.notifies.pop(0).payload)
+                        InProcessBroker.publish(self, message['topic'], message)
+            except Exception:
+                logger.exception('Graph event listener lost its connection')
+            finally:
+                connection.close()
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """The broker named by ``settings.GRAPH_BROKER``, one instance per process."""
+    path = settings.GRAPH_BROKER
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)()
+        return _brokers[path]
+
+
+def publish_graph_changes(topic_id, changes):
+    message = {
+        'type': 'graph.changes',
+        'topic': topic_id,
+        'version': changes[-1].seq,
+        'changes': [
+            {
+                'seq': change.seq,
+                'entity': change.entity,
+                'operation': change.operation,
+                'objectID': change.objectID,
+                'data': change.data,
+            }
+            for change in changes
+        ],
+    }
+    return get_broker().publish(topic_id, message)
+
+
+def publish_graph_reset(topic_id, version):
+    return get_broker().publish(topic_id, {'type': 'graph.resync', 'topic': topic_id, 'version': version})
+
+
+def authenticate_token(token):
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    if not token:
+        return None
+    try:
+        return AccessToken(token).get('user_id')
+    except TokenError:
+        return None
+
+
+def get_topic_version(topic_id):
+    from .utils import get_graph_version
+    return get_graph_version(topic_id)
+
+
+async def graph_socket_application(scope, receive, send):
+    """
+    ASGI WebSocket endpoint ``/ws/topics/<id>/?token=<jwt>``.
+
+    Sends a ``graph.hello`` message with the current graph version, then
+    every committed node, connection and position change of the topic.
+    """
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    match = SOCKET_PATH.match(scope['path'])
+    if match is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    topic_id = int(match.group('topic_id'))
+
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if authenticate_token(query.get('token', [None])[0]) is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+        return
+    version = await sync_to_async(get_topic_version)(topic_id)
+    if version is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+
+    broker = get_broker()
+    subscription = broker.subscribe(topic_id)
+    await send({'type': 'websocket.accept'})
+    await send({'type': 'websocket.send', 'text': json.dumps(
+        {'type': 'graph.hello', 'topic': topic_id, 'version': version}
+    )})
+
+    async def pump():
+        while True:
+            message = await subscription.get()
+            await send({'type': 'websocket.send', 'text': json.dumps(message)})
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive' and message.get('text') == 'ping':
+                await send({'type': 'websocket.send', 'text': 'pong'})
+    finally:
+        pump_task.cancel()
+        broker.unsubscribe(subscription)
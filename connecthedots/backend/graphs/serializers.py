@@ -0,0 +1,12 @@
+from rest_framework import serializers
+from .models import GraphChange, GraphSnapshot
+
+class GraphChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GraphChange
+        fields = ['seq', 'entity', 'operation', 'objectID', 'data', 'creationDate']
+
+class GraphSnapshotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GraphSnapshot
+        fields = ['id', 'topic', 'name', 'graphVersion', 'nodeCount', 'connectionCount', 'createdBy', 'creationDate']
@@ -0,0 +1,238 @@
+import zlib
+from datetime import datetime, timezone
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection as db_connection, transaction
+from nodes.models import Node
+from nodes.serializers import NodeSerializer
+from connections.models import Connection
+from connections.serializers import ConnectionSerializer
+from wikis.models import Wiki
+from wikis.utils import recount_topic_wikis
+from wikis.enrichment import enrich_later
+from usertopics.utils import record_user_topic_action
+from topics.models import Topic
+from connecthedots.serialization import serialize_list
+from .models import GraphSnapshot
+from .utils import get_graph_version, record_graph_reset
+from .wire import encode_graph, decode_graph, DIRECTIONS
+
+GRAPH_CACHE_TIMEOUT = 60 * 10
+WRITE_BATCH_SIZE = 1000
+NODE_COLUMNS = ('manual_name', 'qid', 'description', 'position_x', 'position_y')
+CONNECTION_COLUMNS = ('connection_endpoints', 'relation_name', 'relation_direction')
+NODE_FIELDS = ['manual_name', 'qid', 'description', 'position_x', 'position_y']
+CONNECTION_FIELDS = ['firstNodeID', 'secondNodeID', 'relationName', 'relationDirection']
+
+
+def build_graph_snapshot(topic_id, version):
+    cache_key = f'graph-snapshot:{topic_id}:{version}'
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        nodes = Node.objects.filter(topic_id=topic_id).order_by('id')
+        connections = Connection.objects.filter(topic_id=topic_id).order_by('id')
+        snapshot = {
+            'topic': topic_id,
+            'version': version,
+            'nodes': serialize_list(nodes, NodeSerializer),
+            'connections': serialize_list(connections, ConnectionSerializer),
+        }
+        cache.set(cache_key, snapshot, GRAPH_CACHE_TIMEOUT)
+    return snapshot
+
+
+def take_snapshot(topic, user, name):
+    """Store the current graph of ``topic`` under ``name``."""
+    version = get_graph_version(topic.id)
+    graph = build_graph_snapshot(topic.id, version)
+    return GraphSnapshot.objects.create(
+        topic=topic,
+        name=name,
+        graphVersion=version,
+        nodeCount=len(graph['nodes']),
+        connectionCount=len(graph['connections']),
+        data=zlib.compress(encode_graph(graph, precise=True)),
+        createdBy=user,
+    )
+
+
+def snapshot_columns(snapshot):
+    return _with_strings(decode_graph(zlib.decompress(bytes(snapshot.data))))
+
+
+def live_columns(topic_id):
+    graph = build_graph_snapshot(topic_id, get_graph_version(topic_id))
+    return _with_strings(decode_graph(encode_graph(graph, precise=True)))
+
+
+def _with_strings(columns):
+    # string table indexes are only comparable within one payload, values are comparable across them
+    table = np.array([*columns['strings'], None], dtype=object)
+    for name in ('manual_name', 'qid', 'description', 'relation_name'):
+        columns[name] = table[columns[name]]
+    return columns
+
+
+def _diff_rows(before_ids, after_ids, before, after, names):
+    common, before_rows, after_rows = np.intersect1d(before_ids, after_ids, assume_unique=True,
+                                                     return_indices=True)
+    changed = np.zeros(len(common), dtype=bool)
+    for name in names:
+        differs = np.not_equal(before[name][before_rows], after[name][after_rows]).astype(bool)
+        changed |= differs.any(axis=1) if differs.ndim > 1 else differs
+    return {
+        'added': np.setdiff1d(after_ids, before_ids, assume_unique=True).tolist(),
+        'removed': np.setdiff1d(before_ids, after_ids, assume_unique=True).tolist(),
+        'changed': common[changed].tolist(),
+    }
+
+
+def diff_graphs(before, after):
+    """Ids added, removed and changed going from one set of graph columns to another."""
+    return {
+        'nodes': _diff_rows(before['node_id'], after['node_id'], before, after, NODE_COLUMNS),
+        'connections': _diff_rows(before['connection_id'], after['connection_id'], before, after,
+                                  CONNECTION_COLUMNS),
+    }
+
+
+def _rows(ids, columns, key):
+    # snapshot rows are sorted by id
+    return np.searchsorted(columns[key], ids)
+
+
+def _insert_keeping_ids(model, rows):
+    """Insert ``rows`` under their own ids where free; returns {old id: new id} for the rest."""
+    taken = set(model.objects.filter(id__in=[row.id for row in rows]).values_list('id', flat=True))
+    moved = [row for row in rows if row.id in taken]
+    old_ids = [row.id for row in moved]
+    for row in moved:
+        row.id = None
+    model.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+    return {old_id: row.id for old_id, row in zip(old_ids, moved)}
+
+
+def _restore_dates(model, field, rows, millis):
+    # auto_now_add stamped the insert time on the way in, put the snapshot's back; one prepared
+    # statement run per row, bulk_update would build a CASE branch for every one of them
+    quote = db_connection.ops.quote_name
+    params = [
+        (db_connection.ops.adapt_datetimefield_value(datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)),
+         row.pk)
+        for row, value in zip(rows, millis)
+    ]
+    if params:
+        with db_connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {quote(model._meta.db_table)} SET {quote(model._meta.get_field(field).column)} = %s '
+                f'WHERE {quote(model._meta.pk.column)} = %s',
+                params,
+            )
+
+
+def restore_snapshot(snapshot, user):
+    """
+    Make the live graph of the snapshot's topic equal to the snapshot.
+
+    Only the difference is written: rows missing from the live graph are
+    inserted again under their old ids when those are still free, rows that
+    changed are updated, and rows that are not in the snapshot are deleted.
+    """
+    topic_id = snapshot.topic_id
+    target = snapshot_columns(snapshot)
+    with transaction.atomic():
+        # hold the topic row so no write lands between reading the live graph and replacing it
+        Topic.objects.select_for_update().get(id=topic_id)
+        diff = diff_graphs(live_columns(topic_id), target)
+        nodes, connections = diff['nodes'], diff['connections']
+
+        users = {*target['node_created_by_user'].tolist(), *target['connection_created_by'].tolist()}
+        users = set(get_user_model().objects.filter(id__in=users).values_list('id', flat=True))
+        qids = {qid for qid in target['qid'].tolist() if qid is not None}
+        if qids:
+            Wiki.objects.bulk_create(
+                [Wiki(qID=qid, label='', description='') for qid in qids], ignore_conflicts=True
+            )
+            enrich_later(qids)
+
+        new_nodes = []
+        for row in _rows(nodes['added'], target, 'node_id').tolist():
+            created_by = int(target['node_created_by_user'][row])
+            new_nodes.append(Node(
+                id=int(target['node_id'][row]),
+                manual_name=target['manual_name'][row],
+                qid_id=target['qid'][row],
+                description=target['description'][row],
+                position_x=float(target['position_x'][row]),
+                position_y=float(target['position_y'][row]),
+                topic_id=topic_id,
+                created_by_user_id=created_by if created_by in users else user.id,
+            ))
+        node_ids = _insert_keeping_ids(Node, new_nodes)
+        _restore_dates(Node, 'creation_date', new_nodes,
+                       target['node_creation_date'][_rows(nodes['added'], target, 'node_id')])
+
+        changed = Node.objects.in_bulk(nodes['changed'])
+        for node_id, row in zip(nodes['changed'], _rows(nodes['changed'], target, 'node_id').tolist()):
+            node = changed[node_id]
+            node.manual_name = target['manual_name'][row]
+            node.qid_id = target['qid'][row]
+            node.description = target['description'][row]
+            node.position_x = float(target['position_x'][row])
+            node.position_y = float(target['position_y'][row])
+        Node.objects.bulk_update(changed.values(), NODE_FIELDS, batch_size=WRITE_BATCH_SIZE)
+
+        # point changed connections back at their snapshot endpoints before any node goes, so
+        # none of them is removed by the cascade of a node created after the snapshot
+        changed = Connection.objects.in_bulk(connections['changed'])
+        for connection_id, row in zip(connections['changed'],
+                                      _rows(connections['changed'], target, 'connection_id').tolist()):
+            connection = changed[connection_id]
+            first, second = target['connection_endpoints'][row].tolist()
+            connection.firstNodeID_id = node_ids.get(first, first)
+            connection.secondNodeID_id = node_ids.get(second, second)
+            connection.relationName = target['relation_name'][row]
+            connection.relationDirection = DIRECTIONS[target['relation_direction'][row]]
+        Connection.objects.bulk_update(
+            changed.values(), CONNECTION_FIELDS, batch_size=WRITE_BATCH_SIZE
+        )
+
+        Connection.objects.filter(id__in=connections['removed']).delete()
+        Node.objects.filter(id__in=nodes['removed']).delete()
+
+        snapshot_nodes = set(target['node_id'].tolist())
+        endpoints = {end for pair in target['connection_endpoints'].tolist() for end in pair} - snapshot_nodes
+        existing = snapshot_nodes | set(Node.objects.filter(id__in=endpoints).values_list('id', flat=True))
+        skipped = 0
+        new_connections = []
+        connection_dates = []
+        for row in _rows(connections['added'], target, 'connection_id').tolist():
+            first, second = target['connection_endpoints'][row].tolist()
+            if first not in existing or second not in existing:
+                skipped += 1
+                continue
+            connection_dates.append(target['connection_creation_date'][row])
+            created_by = int(target['connection_created_by'][row])
+            new_connections.append(Connection(
+                id=int(target['connection_id'][row]),
+                firstNodeID_id=node_ids.get(first, first),
+                secondNodeID_id=node_ids.get(second, second),
+                relationName=target['relation_name'][row],
+                relationDirection=DIRECTIONS[target['relation_direction'][row]],
+                createdBy_id=created_by if created_by in users else user.id,
+                topic_id=topic_id,
+            ))
+        _insert_keeping_ids(Connection, new_connections)
+        _restore_dates(Connection, 'creationDate', new_connections, connection_dates)
+
+        recount_topic_wikis(topic_id)
+        record_user_topic_action(user, snapshot.topic, 'addedNode')
+        version = record_graph_reset(topic_id)
+
+    return {
+        'version': version,
+        'nodes': {key: len(ids) for key, ids in nodes.items()},
+        'connections': {key: len(ids) for key, ids in connections.items()},
+        'skipped_connections': skipped,
+    }
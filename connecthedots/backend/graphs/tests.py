@@ -0,0 +1,1087 @@
+import asyncio
+import json
+import numpy as np
+from unittest import skip, skipUnless
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection as db_connection
+from django.test import AsyncClient, SimpleTestCase, TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework import status
+from rest_framework.test import APITestCase
+from topics.models import Topic
+from nodes.models import Node
+from connections.models import Connection
+from wikis.models import Wiki, WikiTopic
+from .models import ImportedNode
+from .utils import compact_graph_changes
+from .realtime import (InProcessBroker, PostgresBroker, MAX_NOTIFY_BYTES, get_broker,
+                       graph_socket_application, notification_payload)
+from .index import clear_topic_indexes, get_topic_index
+from .traversal import SQLTraversal, MAX_SQL_DEPTH
+from .layout import force_layout
+from .centrality import pagerank, betweenness, refresh_centrality
+from .clusters import connected_components, louvain
+from .tiles import rebuild_tiles, get_tiles, TileRebuilder
+from .wire import decode_graph, GraphBinaryRenderer
+from .models import GraphTile, GraphTileEdge, GraphSnapshot
+
+User = get_user_model()
+
+
+class TopicGraphTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        # snapshots are cached per (topic, version), and both repeat across tests
+        self.addCleanup(cache.clear)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.first = Node.objects.create(manual_name='A', topic=self.topic, created_by_user=self.user)
+        self.second = Node.objects.create(manual_name='B', topic=self.topic, created_by_user=self.user)
+        self.connection = Connection.objects.create(
+            firstNodeID=self.first,
+            secondNodeID=self.second,
+            relationName='knows',
+            createdBy=self.user,
+            topic=self.topic
+        )
+        self.url = f'/api/topics/{self.topic.id}/graph/'
+
+    def test_graph_returns_nodes_and_connections(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([n['id'] for n in response.data['nodes']], [self.first.id, self.second.id])
+        self.assertEqual([c['id'] for c in response.data['connections']], [self.connection.id])
+        self.assertIn('ETag', response)
+
+    def test_unchanged_graph_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_node_write_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post('/api/nodes/', {'manual_name': 'C', 'topic': self.topic.id}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['nodes']), 3)
+
+    def test_node_edit_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(f'/api/nodes/{self.first.id}/', {'manual_name': 'A2'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['nodes'][0]['manual_name'], 'A2')
+
+    def test_missing_topic_returns_404(self):
+        response = self.client.get('/api/topics/9999/graph/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_binary_format_matches_json(self):
+        expected = self.client.get(self.url).data
+        response = self.client.get(self.url, HTTP_ACCEPT=GraphBinaryRenderer.media_type)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], GraphBinaryRenderer.media_type)
+        graph = decode_graph(response.content)
+        self.assertEqual(graph['node_id'].tolist(), [n['id'] for n in expected['nodes']])
+        self.assertEqual([graph['strings'][i] for i in graph['manual_name']], ['A', 'B'])
+        self.assertEqual(graph['connection_endpoints'].tolist(), [[self.first.id, self.second.id]])
+        self.assertEqual(graph['strings'][graph['relation_name'][0]], 'knows')
+        self.assertEqual(graph['qid'].tolist(), [-1, -1])
+
+    def test_binary_format_has_its_own_etag(self):
+        json_etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_ACCEPT=GraphBinaryRenderer.media_type,
+                                   HTTP_IF_NONE_MATCH=json_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], json_etag)
+        response = self.client.get('/api/topics/9999/graph/', HTTP_ACCEPT=GraphBinaryRenderer.media_type)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {'error': 'Topic not found'})
+
+
+class TopicChangesTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.url = f'/api/topics/{self.topic.id}/changes/'
+
+    def create_node(self, name):
+        response = self.client.post('/api/nodes/', {'manual_name': name, 'topic': self.topic.id}, format='json')
+        return response.data['id']
+
+    def test_changes_since_returns_only_new_edits(self):
+        first = self.create_node('A')
+        version = self.client.get(self.url).data['version']
+        second = self.create_node('B')
+        self.client.post('/api/nodes/update_positions/', {
+            'positions': [{'id': first, 'position_x': 5, 'position_y': 6}]
+        }, format='json')
+
+        response = self.client.get(f'{self.url}?since={version}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        changes = [(c['operation'], c['entity'], c['objectID']) for c in response.data['changes']]
+        self.assertEqual(changes, [('insert', 'node', second), ('update', 'node', first)])
+        self.assertEqual(response.data['changes'][1]['data'], {'position_x': 5.0, 'position_y': 6.0})
+        self.assertEqual(response.data['last_seq'], response.data['version'])
+
+    def test_repeated_node_edits_are_logged(self):
+        node = self.create_node('A')
+        version = self.client.get(self.url).data['version']
+        for name in ('B', 'C'):
+            response = self.client.put(f'/api/nodes/{node}/', {'manual_name': name, 'topic': self.topic.id},
+                                       format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f'{self.url}?since={version}')
+        changes = response.data['changes']
+        self.assertEqual([(c['operation'], c['data']['manual_name']) for c in changes],
+                         [('update', 'B'), ('update', 'C')])
+        self.assertEqual([c['seq'] for c in changes], [version + 1, version + 2])
+        self.assertEqual(response.data['version'], version + 2)
+
+    def test_write_is_rolled_back_when_logging_fails(self):
+        node = self.create_node('A')
+        version = self.client.get(self.url).data['version']
+        with patch('nodes.views.record_graph_update', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.client.put(f'/api/nodes/{node}/', {'manual_name': 'B', 'topic': self.topic.id}, format='json')
+        with patch('connections.views.record_graph_change', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            self.client.post('/api/connections/create/', {
+                'firstNodeID': node, 'secondNodeID': node, 'relationName': 'rel',
+                'topic': self.topic.id, 'createdBy': self.user.id
+            }, format='json')
+        self.assertEqual(Node.objects.get(id=node).manual_name, 'A')
+        self.assertFalse(Connection.objects.filter(topic=self.topic).exists())
+        self.assertEqual(self.client.get(self.url).data['version'], version)
+
+    def test_node_delete_logs_cascaded_connections(self):
+        first = self.create_node('A')
+        second = self.create_node('B')
+        connection = self.client.post('/api/connections/create/', {
+            'firstNodeID': first,
+            'secondNodeID': second,
+            'relationName': 'knows',
+            'topic': self.topic.id,
+            'createdBy': self.user.id
+        }, format='json').data['id']
+        version = self.client.get(self.url).data['version']
+
+        self.client.delete(f'/api/nodes/{first}/')
+        changes = self.client.get(f'{self.url}?since={version}').data['changes']
+        self.assertEqual(
+            [(c['operation'], c['entity'], c['objectID']) for c in changes],
+            [('delete', 'connection', connection), ('delete', 'node', first)]
+        )
+
+    def test_compacted_log_requires_resync(self):
+        for name in 'ABC':
+            self.create_node(name)
+        compact_graph_changes(self.topic.id, keep=1)
+        response = self.client.get(f'{self.url}?since=1')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertTrue(response.data['resync'])
+        response = self.client.get(f'{self.url}?since=2')
+        self.assertEqual(len(response.data['changes']), 1)
+
+
+class RecordingBroker(InProcessBroker):
+    """Local stand-in that also keeps every published message."""
+
+    def __init__(self):
+        super().__init__()
+        self.published = []
+
+    def publish(self, topic_id, message):
+        self.published.append((topic_id, message))
+        return super().publish(topic_id, message)
+
+
+@override_settings(GRAPH_BROKER='graphs.tests.RecordingBroker')
+class RealtimeGraphTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.token = str(AccessToken.for_user(self.user))
+        self.broker = get_broker()
+        self.broker.published.clear()
+
+    def test_committed_writes_are_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/nodes/', {'manual_name': 'A', 'topic': self.topic.id}, format='json')
+        topic_id, message = self.broker.published[-1]
+        self.assertEqual(topic_id, self.topic.id)
+        self.assertEqual(message['type'], 'graph.changes')
+        self.assertEqual(message['changes'][0]['objectID'], response.data['id'])
+        self.assertEqual(message['changes'][0]['operation'], 'insert')
+
+    def open_socket(self, path, token):
+        async def run():
+            incoming = asyncio.Queue()
+            outgoing = asyncio.Queue()
+            scope = {'type': 'websocket', 'path': path, 'query_string': f'token={token}'.encode()}
+            await incoming.put({'type': 'websocket.connect'})
+            task = asyncio.create_task(graph_socket_application(scope, incoming.get, outgoing.put))
+            messages = [await asyncio.wait_for(outgoing.get(), 1)]
+            if messages[0]['type'] == 'websocket.accept':
+                messages.append(await asyncio.wait_for(outgoing.get(), 1))
+                self.broker.publish(self.topic.id, {'type': 'graph.changes', 'changes': []})
+                messages.append(await asyncio.wait_for(outgoing.get(), 1))
+                await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+            await asyncio.wait_for(task, 1)
+            return messages
+        return async_to_sync(run)()
+
+    def test_socket_receives_hello_and_topic_events(self):
+        messages = self.open_socket(f'/ws/topics/{self.topic.id}/', self.token)
+        self.assertEqual(messages[0]['type'], 'websocket.accept')
+        self.assertEqual(json.loads(messages[1]['text'])['type'], 'graph.hello')
+        self.assertEqual(json.loads(messages[2]['text'])['type'], 'graph.changes')
+        self.assertEqual(self.broker.subscriber_count(self.topic.id), 0)
+
+    def test_socket_rejects_invalid_token(self):
+        messages = self.open_socket(f'/ws/topics/{self.topic.id}/', 'invalid')
+        self.assertEqual(messages, [{'type': 'websocket.close', 'code': 4403}])
+
+
+class NotificationPayloadTests(SimpleTestCase):
+    def test_oversized_events_become_resync(self):
+        small = {'type': 'graph.changes', 'topic': 3, 'version': 9, 'changes': []}
+        self.assertEqual(json.loads(notification_payload(small)), small)
+        large = {**small, 'changes': [{'data': 'x' * MAX_NOTIFY_BYTES}]}
+        self.assertEqual(json.loads(notification_payload(large)), {'type': 'graph.resync', 'topic': 3, 'version': 9})
+
+
+@skipUnless(db_connection.vendor == 'postgresql', 'LISTEN/NOTIFY needs PostgreSQL')
+class PostgresBrokerTests(TransactionTestCase):
+    def test_events_reach_subscribers_through_notify(self):
+        broker = PostgresBroker(channel='graph_events_test')
+        self.addCleanup(broker.stop)
+
+        async def run():
+            subscription = broker.subscribe(7)
+            # give the listener thread time to connect and LISTEN
+            await asyncio.sleep(1)
+            message = {'type': 'graph.changes', 'topic': 7, 'version': 1, 'changes': []}
+            await sync_to_async(broker.publish)(7, message)
+            return await asyncio.wait_for(subscription.get(), 5)
+
+        self.assertEqual(async_to_sync(run)()['version'], 1)
+
+
+class TraversalTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        # a -> b -> c, c - d undirected, e isolated
+        self.a, self.b, self.c, self.d, self.e = [
+            Node.objects.create(manual_name=name, topic=self.topic, created_by_user=self.user)
+            for name in 'abcde'
+        ]
+        self.ab = self.connect(self.a, self.b, 'FIRST_TO_SECOND')
+        self.cb = self.connect(self.c, self.b, 'SECOND_TO_FIRST')
+        self.cd = self.connect(self.c, self.d, 'UNDIRECTED')
+        self.base = f'/api/topics/{self.topic.id}'
+        clear_topic_indexes()
+        cache.clear()
+
+    def connect(self, first, second, direction):
+        return Connection.objects.create(
+            firstNodeID=first,
+            secondNodeID=second,
+            relationName='rel',
+            relationDirection=direction,
+            createdBy=self.user,
+            topic=self.topic
+        )
+
+    def test_k_hop_neighborhood(self):
+        response = self.client.get(f'{self.base}/neighbors/?node={self.a.id}&depth=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        distances = {n['id']: n['distance'] for n in response.data['nodes']}
+        self.assertEqual(distances, {self.a.id: 0, self.b.id: 1, self.c.id: 2})
+
+    def test_shortest_path_respects_direction(self):
+        response = self.client.get(f'{self.base}/path/?source={self.a.id}&target={self.d.id}')
+        self.assertEqual(response.data['path'], [self.a.id, self.b.id, self.c.id, self.d.id])
+        self.assertEqual(response.data['connections'], [self.ab.id, self.cb.id, self.cd.id])
+        response = self.client.get(f'{self.base}/path/?source={self.d.id}&target={self.a.id}')
+        self.assertIsNone(response.data['path'])
+        response = self.client.get(f'{self.base}/path/?source={self.d.id}&target={self.a.id}&directed=0')
+        self.assertEqual(response.data['length'], 3)
+
+    def test_reachability(self):
+        response = self.client.get(f'{self.base}/reachable/?source={self.b.id}')
+        self.assertEqual(response.data['nodes'], sorted([self.b.id, self.c.id, self.d.id]))
+        response = self.client.get(f'{self.base}/reachable/?source={self.a.id}&target={self.e.id}')
+        self.assertFalse(response.data['reachable'])
+
+    def test_index_survives_moves_but_not_new_connections(self):
+        index = get_topic_index(self.topic.id)
+        self.client.patch(f'/api/nodes/{self.a.id}/', {'position_x': 40, 'manual_name': 'moved'}, format='json')
+        self.assertIs(get_topic_index(self.topic.id), index)
+        self.client.post('/api/connections/create/', {
+            'firstNodeID': self.d.id,
+            'secondNodeID': self.e.id,
+            'relationName': 'rel',
+            'topic': self.topic.id,
+            'createdBy': self.user.id
+        }, format='json')
+        self.assertIsNot(get_topic_index(self.topic.id), index)
+
+    def test_index_is_rebuilt_after_writes(self):
+        self.client.get(f'{self.base}/reachable/?source={self.a.id}')
+        self.client.post('/api/connections/create/', {
+            'firstNodeID': self.d.id,
+            'secondNodeID': self.e.id,
+            'relationName': 'rel',
+            'topic': self.topic.id,
+            'createdBy': self.user.id
+        }, format='json')
+        response = self.client.get(f'{self.base}/reachable/?source={self.a.id}&target={self.e.id}')
+        self.assertTrue(response.data['reachable'])
+
+    def test_cached_index_needs_no_graph_queries(self):
+        self.client.get(f'{self.base}/neighbors/?node={self.a.id}')
+        with self.assertNumQueries(1):
+            self.client.get(f'{self.base}/neighbors/?node={self.b.id}&depth=3')
+
+    def test_unknown_node(self):
+        response = self.client.get(f'{self.base}/neighbors/?node=99999')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(GRAPH_INDEX_MAX_EDGES=0)
+class SQLTraversalTests(TraversalTests):
+    """The same queries answered by recursive SQL instead of the in-memory index."""
+
+    def test_database_mode_is_used(self):
+        response = self.client.get(f'{self.base}/neighbors/?node={self.a.id}')
+        self.assertEqual(response.data['mode'], 'database')
+
+    @skip('only the in-memory index is cached')
+    def test_cached_index_needs_no_graph_queries(self):
+        pass
+
+    def test_row_limit_truncates_walk(self):
+        traversal = SQLTraversal(self.topic.id, max_rows=2)
+        distances = traversal.neighborhood(self.a.id, 3, directed=False)
+        self.assertEqual(len(distances), 2)
+        self.assertTrue(traversal.truncated)
+
+    def test_depth_limit_truncates_walk(self):
+        chain = [Node.objects.create(manual_name=f'C{i}', topic=self.topic, created_by_user=self.user)
+                 for i in range(9)]
+        for first, second in zip(chain, chain[1:]):
+            self.connect(first, second, 'FIRST_TO_SECOND')
+        start, end = chain[0].id, chain[-1].id
+
+        response = self.client.get(f'{self.base}/neighbors/?node={start}&depth=10')
+        self.assertTrue(response.data['truncated'])
+        self.assertEqual(max(node['distance'] for node in response.data['nodes']), MAX_SQL_DEPTH)
+        response = self.client.get(f'{self.base}/neighbors/?node={start}&depth=3')
+        self.assertFalse(response.data['truncated'])
+
+        response = self.client.get(f'{self.base}/path/?source={start}&target={end}')
+        self.assertIsNone(response.data['path'])
+        self.assertTrue(response.data['truncated'])
+        response = self.client.get(f'{self.base}/path/?source={start}&target={chain[MAX_SQL_DEPTH].id}')
+        self.assertEqual(response.data['length'], MAX_SQL_DEPTH)
+
+        response = self.client.get(f'{self.base}/reachable/?source={start}&target={end}')
+        self.assertEqual((response.data['reachable'], response.data['truncated']), (False, True))
+        response = self.client.get(f'{self.base}/reachable/?source={chain[3].id}')
+        self.assertFalse(response.data['truncated'])
+
+
+class LayoutTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.placed = [
+            Node.objects.create(manual_name=f'P{i}', topic=self.topic, created_by_user=self.user,
+                                position_x=1000 + i * 250, position_y=1000)
+            for i in range(3)
+        ]
+        self.new = Node.objects.create(manual_name='New', topic=self.topic, created_by_user=self.user)
+        Connection.objects.create(
+            firstNodeID=self.placed[0],
+            secondNodeID=self.new,
+            relationName='rel',
+            createdBy=self.user,
+            topic=self.topic
+        )
+        self.url = f'/api/topics/{self.topic.id}/layout/'
+
+    def test_force_layout_pulls_connected_nodes_together(self):
+        positions = [[0, 0], [2000, 0], [0, 10]]
+        result, _ = force_layout(positions, [[0, 1]], iterations=100)
+        connected = abs(result[0] - result[1]).sum()
+        self.assertLess(connected, 2000)
+
+    def test_time_budget_is_checked_between_repulsion_blocks(self):
+        positions = np.arange(40, dtype=np.float64).reshape(20, 2) * 100
+        with patch('graphs.layout.REPULSION_CELLS', len(positions)):
+            result, run = force_layout(positions, [[0, 1]], iterations=100, time_budget=1e-9)
+        # the deadline passes during the first step, which is dropped
+        self.assertEqual(run, 0)
+        np.testing.assert_array_equal(result, positions)
+
+    def test_incremental_places_only_new_nodes_near_neighbours(self):
+        response = self.client.post(self.url, {'mode': 'incremental'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['moved'], 1)
+        self.new.refresh_from_db()
+        anchor = self.placed[0]
+        distance = ((self.new.position_x - anchor.position_x) ** 2 + (self.new.position_y - anchor.position_y) ** 2) ** 0.5
+        self.assertLess(distance, 1000)
+        for node in self.placed:
+            before = (node.position_x, node.position_y)
+            node.refresh_from_db()
+            self.assertEqual((node.position_x, node.position_y), before)
+
+    def test_full_relayout_moves_every_node(self):
+        response = self.client.post(self.url, {'mode': 'full', 'time_budget': 0.5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['moved'], 4)
+
+    def test_invalid_mode(self):
+        response = self.client.post(self.url, {'mode': 'spiral'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransferTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Source', createdBy=self.user)
+        self.target = Topic.objects.create(topicName='Target', createdBy=self.user)
+        Wiki.objects.create(qID='Q42', label='Douglas Adams', description='writer')
+        self.first = Node.objects.create(manual_name='A', qid_id='Q42', topic=self.topic,
+                                         created_by_user=self.user, position_x=10, position_y=20)
+        self.second = Node.objects.create(manual_name='B & <C>', topic=self.topic, created_by_user=self.user)
+        Connection.objects.create(
+            firstNodeID=self.first,
+            secondNodeID=self.second,
+            relationName='wrote',
+            relationDirection='FIRST_TO_SECOND',
+            createdBy=self.user,
+            topic=self.topic
+        )
+
+    def export(self, output):
+        response = self.client.get(f'/api/topics/{self.topic.id}/export/', {'output': output})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_asgi_export_streams_in_chunks(self):
+        expected = self.export('ndjson')
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+        async def run():
+            response = await AsyncClient().get(f'/api/topics/{self.topic.id}/export/', {'output': 'ndjson'},
+                                               headers=headers)
+            self.assertTrue(response.is_async)
+            return [chunk async for chunk in response.streaming_content]
+
+        with patch('graphs.transfer.EXPORT_CHUNK_SIZE', 2):
+            chunks = async_to_sync(run)()
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(b''.join(chunks), expected)
+
+    def assert_copied(self):
+        nodes = Node.objects.filter(topic=self.target).order_by('id')
+        self.assertEqual([(n.manual_name, n.qid_id, n.position_x) for n in nodes],
+                         [('A', 'Q42', 10), ('B & <C>', None, 0)])
+        connection = Connection.objects.get(topic=self.target)
+        self.assertEqual((connection.firstNodeID_id, connection.secondNodeID_id), (nodes[0].id, nodes[1].id))
+        self.assertEqual(connection.relationDirection, 'FIRST_TO_SECOND')
+        self.assertFalse(ImportedNode.objects.exists())
+
+    def test_ndjson_round_trip(self):
+        body = self.export('ndjson')
+        self.assertEqual([json.loads(line)['type'] for line in body.splitlines()],
+                         ['topic', 'node', 'node', 'connection'])
+        response = self.client.post(f'/api/topics/{self.target.id}/import/', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['nodes'], 2)
+        self.assertEqual(response.data['connections'], 1)
+        self.assert_copied()
+
+    def test_graphml_round_trip(self):
+        body = self.export('graphml')
+        response = self.client.post(f'/api/topics/{self.target.id}/import/', body,
+                                    content_type='application/graphml+xml')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assert_copied()
+
+    def test_import_upserts_wikis_and_records_action_once(self):
+        lines = [{'type': 'node', 'id': i, 'qid': 'Q1', 'qid_label': 'Earth'} for i in range(3)]
+        lines.append({'type': 'node', 'id': 'x', 'qid': 'Q2'})
+        lines.append({'type': 'connection', 'firstNodeID': 0, 'secondNodeID': 'missing'})
+        body = ''.join(json.dumps(line) + '\n' for line in lines)
+        response = self.client.post(f'/api/topics/{self.target.id}/import/', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.data['skipped_connections'], 1)
+        self.assertEqual(Wiki.objects.get(qID='Q1').label, 'Earth')
+        self.assertTrue(Wiki.objects.filter(qID='Q2').exists())
+        self.target.refresh_from_db()
+        self.assertEqual(self.target.interactionCount, 1)
+
+    def test_import_fills_placeholders_but_keeps_existing_labels(self):
+        Wiki.objects.create(qID='Q1', label='', description='')
+        lines = [
+            {'type': 'node', 'id': 0, 'qid': 'Q1', 'qid_label': 'Earth', 'qid_description': 'planet'},
+            {'type': 'node', 'id': 1, 'qid': 'Q42', 'qid_label': 'Someone else', 'qid_description': 'forged'},
+        ]
+        body = ''.join(json.dumps(line) + '\n' for line in lines)
+        response = self.client.post(f'/api/topics/{self.target.id}/import/', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Wiki.objects.get(qID='Q1').label, 'Earth')
+        self.assertEqual(Wiki.objects.values_list('label', 'description').get(qID='Q42'),
+                         ('Douglas Adams', 'writer'))
+
+    def test_import_forces_resync(self):
+        since = self.target.graphVersion
+        self.client.post('/api/nodes/', {'manual_name': 'Before', 'topic': self.target.id}, format='json')
+        body = self.export('ndjson')
+        self.client.post(f'/api/topics/{self.target.id}/import/', body, content_type='application/x-ndjson')
+        response = self.client.get(f'/api/topics/{self.target.id}/changes/', {'since': since})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['changes']), 1)
+        response = self.client.get(f'/api/topics/{self.target.id}/changes/', {'since': response.data['last_seq']})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_invalid_import_rolls_back(self):
+        body = json.dumps({'type': 'node', 'id': 1}) + '\nnot json\n'
+        response = self.client.post(f'/api/topics/{self.target.id}/import/', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Node.objects.filter(topic=self.target).exists())
+
+
+class CentralityTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        # a star: every leaf points at the hub
+        self.hub = Node.objects.create(manual_name='Hub', topic=self.topic, created_by_user=self.user)
+        self.leaves = [
+            Node.objects.create(manual_name=f'L{i}', topic=self.topic, created_by_user=self.user)
+            for i in range(4)
+        ]
+        for leaf in self.leaves:
+            self.client.post('/api/connections/create/', {
+                'firstNodeID': leaf.id,
+                'secondNodeID': self.hub.id,
+                'relationName': 'points at',
+                'relationDirection': 'FIRST_TO_SECOND',
+                'createdBy': self.user.id,
+                'topic': self.topic.id,
+            }, format='json')
+
+    def test_pagerank_and_betweenness_on_a_path(self):
+        edges = np.array([[0, 1], [1, 2]])
+        ranks, _ = pagerank(3, np.concatenate([edges, edges[:, ::-1]]))
+        self.assertAlmostEqual(ranks.sum(), 1.0)
+        self.assertGreater(ranks[1], ranks[0])
+        self.assertEqual(betweenness(3, edges).tolist(), [0.0, 1.0, 0.0])
+
+    def test_ranking_puts_hub_first(self):
+        response = self.client.get(f'/api/topics/{self.topic.id}/centrality/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hub = response.data['nodes'][0]
+        self.assertEqual(hub['id'], self.hub.id)
+        self.assertEqual(hub['degree'], 4)
+        self.assertAlmostEqual(hub['betweenness'], 1.0)
+
+    def test_node_listing_includes_centrality_on_request(self):
+        response = self.client.get('/api/nodes/', {'topic_id': self.topic.id})
+        self.assertNotIn('pagerank', response.data[0])
+        response = self.client.get('/api/nodes/', {'topic_id': self.topic.id, 'include': 'centrality'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        degrees = {node['id']: node['degree'] for node in response.data}
+        self.assertEqual(degrees[self.hub.id], 4)
+
+    def test_refresh_is_warm_started_after_an_edit(self):
+        cold = refresh_centrality(self.topic.id).iterations
+        with self.assertNumQueries(2):
+            refresh_centrality(self.topic.id)
+        self.client.patch(f'/api/nodes/{self.leaves[0].id}/', {'manual_name': 'Renamed'}, format='json')
+        renamed = refresh_centrality(self.topic.id)
+        self.assertEqual(renamed.graphVersion, Topic.objects.get(id=self.topic.id).graphVersion)
+        self.assertEqual(renamed.iterations, cold)
+
+        self.client.post('/api/connections/create/', {
+            'firstNodeID': self.leaves[0].id,
+            'secondNodeID': self.leaves[1].id,
+            'relationName': 'knows',
+            'createdBy': self.user.id,
+            'topic': self.topic.id,
+        }, format='json')
+        warm = refresh_centrality(self.topic.id)
+        self.assertLess(warm.iterations, cold)
+
+
+class ClusterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.url = f'/api/topics/{self.topic.id}/clusters/'
+
+    def test_components_from_union_find(self):
+        edges = np.array([[0, 1], [2, 3], [1, 4]])
+        self.assertEqual(connected_components(6, edges), [0, 0, 1, 1, 0, 2])
+
+    def test_louvain_splits_two_bridged_cliques(self):
+        clique = [(a, b) for a in range(5) for b in range(a + 1, 5)]
+        edges = np.array(clique + [(a + 5, b + 5) for a, b in clique] + [(0, 5)])
+        labels, modularity = louvain(10, edges)
+        self.assertEqual(len(set(labels[:5])), 1)
+        self.assertEqual(len(set(labels[5:])), 1)
+        self.assertNotEqual(labels[0], labels[5])
+        self.assertGreater(modularity, 0.4)
+
+    def test_clusters_endpoint_is_cached_per_version(self):
+        nodes = [
+            Node.objects.create(manual_name=f'N{i}', topic=self.topic, created_by_user=self.user)
+            for i in range(3)
+        ]
+        Connection.objects.create(firstNodeID=nodes[0], secondNodeID=nodes[1], relationName='rel',
+                                  createdBy=self.user, topic=self.topic)
+        cache.clear()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['nodes'] for c in response.data['components']],
+                         [[nodes[0].id, nodes[1].id], [nodes[2].id]])
+        self.assertEqual(response.data['clusters'][0]['component'], 0)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_clusters_survive_moves_and_honor_if_none_match(self):
+        nodes = [
+            Node.objects.create(manual_name=f'N{i}', topic=self.topic, created_by_user=self.user)
+            for i in range(3)
+        ]
+        Connection.objects.create(firstNodeID=nodes[0], secondNodeID=nodes[1], relationName='rel',
+                                  createdBy=self.user, topic=self.topic)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        first = self.client.get(self.url)
+        etag = first['ETag']
+
+        self.client.patch(f'/api/nodes/{nodes[2].id}/', {'position_x': 40}, format='json')
+        with patch('graphs.clusters.louvain') as louvain_call:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        louvain_call.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertGreater(self.client.get(self.url).data['version'], first.data['version'])
+
+        self.client.post('/api/connections/create/', {
+            'firstNodeID': nodes[1].id,
+            'secondNodeID': nodes[2].id,
+            'relationName': 'rel',
+            'topic': self.topic.id,
+            'createdBy': self.user.id
+        }, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['components']), 1)
+
+    def test_missing_topic(self):
+        response = self.client.get('/api/topics/9999/clusters/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TileTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.nodes = [
+            Node.objects.create(manual_name=f'N{i}', topic=self.topic, created_by_user=self.user,
+                                position_x=x, position_y=y)
+            for i, (x, y) in enumerate([(100, 100), (200, 300), (1500, 100), (2500, 2500)])
+        ]
+        for first, second in [(0, 1), (0, 2), (1, 2), (2, 3)]:
+            Connection.objects.create(firstNodeID=self.nodes[first], secondNodeID=self.nodes[second],
+                                      relationName='rel', createdBy=self.user, topic=self.topic)
+        self.url = f'/api/topics/{self.topic.id}/tiles/'
+
+    def snapshot(self):
+        tiles = sorted(GraphTile.objects.filter(topic=self.topic).values_list('level', 'x', 'y', 'count'))
+        edges = sorted(GraphTileEdge.objects.filter(topic=self.topic).values_list(
+            'level', 'x1', 'y1', 'x2', 'y2', 'count'))
+        return tiles, edges
+
+    def test_level_zero_cells_and_edges(self):
+        response = self.client.get(self.url, {'level': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(t['x'], t['y'], t['count']) for t in response.data['tiles']],
+                         [(0, 0, 2), (1, 0, 1), (2, 2, 1)])
+        self.assertEqual(response.data['tiles'][0]['center_x'], 150)
+        self.assertEqual([(e['source'], e['target'], e['count']) for e in response.data['edges']],
+                         [([0, 0], [1, 0], 2), ([1, 0], [2, 2], 1)])
+
+    def test_coarse_level_collapses_everything(self):
+        response = self.client.get(self.url, {'level': 3})
+        self.assertEqual([t['count'] for t in response.data['tiles']], [4])
+        self.assertEqual(response.data['edges'], [])
+
+    def test_update_positions_patches_the_pyramid(self):
+        self.client.get(self.url, {'level': 0})
+        self.client.post('/api/nodes/update_positions/', {'positions': [
+            {'id': self.nodes[0].id, 'position_x': 2600, 'position_y': 2100},
+            {'id': self.nodes[3].id, 'position_x': -50, 'position_y': 10},
+        ]}, format='json')
+        patched = self.snapshot()
+        rebuild_tiles(self.topic.id, Topic.objects.get(id=self.topic.id).graphVersion)
+        self.assertEqual(patched, self.snapshot())
+        with self.assertNumQueries(4):
+            get_tiles(self.topic.id, 0)
+
+    def test_stale_pyramid_is_served_while_rebuilt_in_background(self):
+        self.client.get(self.url, {'level': 0})
+        built = Topic.objects.get(id=self.topic.id).graphVersion
+        self.client.post('/api/nodes/', {'manual_name': 'New', 'topic': self.topic.id,
+                                         'position_x': 5000, 'position_y': 5000}, format='json')
+        rebuilder = TileRebuilder(autostart=False)
+        with patch('graphs.tiles.get_tile_rebuilder', return_value=rebuilder), \
+                patch('graphs.tiles.rebuild_tiles', wraps=rebuild_tiles) as rebuild:
+            response = self.client.get(self.url, {'level': 0})
+            rebuild.assert_not_called()
+            self.assertEqual((response.data['version'], response.data['stale']), (built, True))
+            self.assertEqual(len(response.data['tiles']), 3)
+            self.assertEqual(rebuilder.pending(), 1)
+            self.assertEqual(rebuilder.flush(), 1)
+
+        response = self.client.get(self.url, {'level': 0})
+        self.assertFalse(response.data['stale'])
+        self.assertEqual(response.data['version'], Topic.objects.get(id=self.topic.id).graphVersion)
+        self.assertEqual(len(response.data['tiles']), 4)
+
+    def test_bbox_and_invalid_level(self):
+        response = self.client.get(self.url, {'level': 0, 'bbox': '0,0,999,999'})
+        self.assertEqual(len(response.data['tiles']), 1)
+        self.assertEqual(len(response.data['edges']), 1)
+        response = self.client.get(self.url, {'level': 99})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MutationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        self.other = Topic.objects.create(topicName='Other', createdBy=self.user)
+        self.first = Node.objects.create(manual_name='A', topic=self.topic, created_by_user=self.user)
+        self.second = Node.objects.create(manual_name='B', topic=self.topic, created_by_user=self.user)
+        self.connection = Connection.objects.create(
+            firstNodeID=self.first, secondNodeID=self.second, relationName='knows',
+            createdBy=self.user, topic=self.topic
+        )
+        self.url = f'/api/topics/{self.topic.id}/mutations/'
+
+    def mutate(self, *operations):
+        return self.client.post(self.url, {'operations': list(operations)}, format='json')
+
+    def test_temp_ids_and_change_log(self):
+        since = Topic.objects.get(id=self.topic.id).graphVersion
+        response = self.mutate(
+            {'op': 'create', 'type': 'node', 'tempId': 'n1', 'data': {'manual_name': 'New', 'qid': 'Q42'}},
+            {'op': 'create', 'type': 'connection', 'tempId': 'c1',
+             'data': {'firstNodeID': 'n1', 'secondNodeID': self.first.id, 'relationName': 'cites'}},
+            {'op': 'update', 'type': 'node', 'id': 'n1', 'data': {'position_x': 5}},
+            {'op': 'update', 'type': 'node', 'id': self.first.id, 'data': {'manual_name': 'A2'}},
+            {'op': 'update', 'type': 'connection', 'id': self.connection.id, 'data': {'secondNodeID': 'n1'}},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_id = response.data['ids']['nodes']['n1']
+        node = Node.objects.get(id=new_id)
+        self.assertEqual((node.manual_name, node.qid_id, node.position_x), ('New', 'Q42', 5))
+        created = Connection.objects.get(id=response.data['ids']['connections']['c1'])
+        self.assertEqual((created.firstNodeID_id, created.secondNodeID_id), (new_id, self.first.id))
+        self.connection.refresh_from_db()
+        self.assertEqual(self.connection.secondNodeID_id, new_id)
+        self.assertEqual(Wiki.objects.get(qID='Q42').label, '')
+
+        response = self.client.get(f'/api/topics/{self.topic.id}/changes/', {'since': since})
+        self.assertEqual(
+            [(c['entity'], c['operation']) for c in response.data['changes']],
+            [('node', 'insert'), ('connection', 'insert'), ('node', 'update'), ('connection', 'update')]
+        )
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.interactionCount, 1)
+
+    def test_deletes_cascade_within_the_batch(self):
+        response = self.mutate(
+            {'op': 'create', 'type': 'node', 'tempId': 'n1'},
+            {'op': 'create', 'type': 'connection', 'tempId': 'c1',
+             'data': {'firstNodeID': 'n1', 'secondNodeID': self.second.id, 'relationName': 'x'}},
+            {'op': 'delete', 'type': 'node', 'id': 'n1'},
+            {'op': 'delete', 'type': 'node', 'id': self.first.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['ids'], {'nodes': {}, 'connections': {}})
+        self.assertEqual(response.data['deleted'], {'nodes': [self.first.id], 'connections': [self.connection.id]})
+        self.assertEqual(list(Node.objects.filter(topic=self.topic)), [self.second])
+        self.assertFalse(Connection.objects.exists())
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def batch(size):
+            return [
+                {'op': 'create', 'type': 'node', 'tempId': f'n{i}', 'data': {'manual_name': str(i)}}
+                for i in range(size)
+            ] + [
+                {'op': 'create', 'type': 'connection', 'tempId': f'c{i}',
+                 'data': {'firstNodeID': f'n{i}', 'secondNodeID': self.first.id, 'relationName': 'r'}}
+                for i in range(size)
+            ]
+
+        # the first batch also creates the user-topic row
+        self.mutate(*batch(1))
+        with self.assertNumQueries(14):
+            self.mutate(*batch(2))
+        with self.assertNumQueries(14):
+            self.mutate(*batch(50))
+
+    def test_invalid_batches_write_nothing(self):
+        foreign = Node.objects.create(manual_name='F', topic=self.other, created_by_user=self.user)
+        version = Topic.objects.get(id=self.topic.id).graphVersion
+        for operations in (
+            [{'op': 'create', 'type': 'node', 'tempId': 'n1'},
+             {'op': 'update', 'type': 'node', 'id': 'n2', 'data': {}}],
+            [{'op': 'update', 'type': 'node', 'id': foreign.id, 'data': {'manual_name': 'x'}}],
+            [{'op': 'create', 'type': 'node', 'tempId': 'n1', 'data': {'topic': self.other.id}}],
+            [{'op': 'create', 'type': 'node', 'tempId': 'n1', 'data': {'position_x': 'left'}}],
+            [{'op': 'delete', 'type': 'connection', 'id': self.connection.id},
+             {'op': 'delete', 'type': 'connection', 'id': self.connection.id}],
+            [],
+        ):
+            response = self.mutate(*operations)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, operations)
+        self.assertEqual(Node.objects.filter(topic=self.topic).count(), 2)
+        self.assertEqual(Topic.objects.get(id=self.topic.id).graphVersion, version)
+
+
+class CloneTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Source', description='about', createdBy=self.user)
+        Wiki.objects.create(qID='Q42', label='Douglas Adams', description='writer')
+        self.nodes = [
+            Node.objects.create(manual_name=f'N{i}', qid_id='Q42' if i < 2 else None, topic=self.topic,
+                                created_by_user=self.user, position_x=i, position_y=-i)
+            for i in range(4)
+        ]
+        for first, second in ((0, 1), (1, 2), (2, 3), (3, 0)):
+            Connection.objects.create(
+                firstNodeID=self.nodes[first], secondNodeID=self.nodes[second], relationName=f'{first}-{second}',
+                relationDirection='FIRST_TO_SECOND', createdBy=self.user, topic=self.topic
+            )
+        self.url = f'/api/topics/{self.topic.id}/clone/'
+
+    def graph(self, topic_id):
+        nodes = Node.objects.filter(topic_id=topic_id).order_by('id')
+        names = {node.id: node.manual_name for node in nodes}
+        return (
+            [(node.manual_name, node.qid_id, node.position_x, node.position_y) for node in nodes],
+            sorted(
+                (names[c.firstNodeID_id], names[c.secondNodeID_id], c.relationName, c.relationDirection)
+                for c in Connection.objects.filter(topic_id=topic_id)
+            ),
+        )
+
+    def test_clone_whole_topic(self):
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['topicName'], response.data['nodes'], response.data['connections']),
+                         ('Source (copy)', 4, 4))
+        clone_id = response.data['id']
+        self.assertEqual(self.graph(clone_id), self.graph(self.topic.id))
+        self.assertFalse(set(Node.objects.filter(topic_id=clone_id).values_list('id', flat=True))
+                         & {node.id for node in self.nodes})
+        self.assertFalse(ImportedNode.objects.exists())
+        self.assertEqual(WikiTopic.objects.get(topic_id=clone_id).nodeCount, 2)
+        self.assertEqual(Topic.objects.get(id=clone_id).graphVersion, 1)
+
+    def test_clone_subset(self):
+        subset = [self.nodes[3].id, self.nodes[1].id, self.nodes[2].id]
+        response = self.client.post(self.url, {'topicName': 'Fork', 'nodes': subset}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        nodes, connections = self.graph(response.data['id'])
+        self.assertEqual([node[0] for node in nodes], ['N1', 'N2', 'N3'])
+        self.assertEqual(connections, [
+            ('N1', 'N2', '1-2', 'FIRST_TO_SECOND'),
+            ('N2', 'N3', '2-3', 'FIRST_TO_SECOND'),
+        ])
+
+    def test_invalid_selection(self):
+        other = Topic.objects.create(topicName='Other', createdBy=self.user)
+        foreign = Node.objects.create(manual_name='F', topic=other, created_by_user=self.user)
+        for body in ({'nodes': [foreign.id]}, {'nodes': []}, {'nodes': ['a']}, {'topicName': 5}):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Topic.objects.count(), 2)
+
+
+class SnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Graph Topic', createdBy=self.user)
+        Wiki.objects.create(qID='Q42', label='Douglas Adams', description='writer')
+        self.nodes = [
+            Node.objects.create(manual_name=f'N{i}', qid_id='Q42' if i == 0 else None, topic=self.topic,
+                                created_by_user=self.user, position_x=0.1 * i, position_y=1e-9)
+            for i in range(3)
+        ]
+        self.connection = Connection.objects.create(
+            firstNodeID=self.nodes[0], secondNodeID=self.nodes[1], relationName='knows',
+            relationDirection='FIRST_TO_SECOND', createdBy=self.user, topic=self.topic
+        )
+        self.url = f'/api/topics/{self.topic.id}/snapshots/'
+        # cached graphs are keyed by topic id and version, which the next test reuses
+        self.addCleanup(cache.clear)
+
+    def rows(self):
+        return (
+            list(Node.objects.filter(topic=self.topic).order_by('id').values_list(
+                'id', 'manual_name', 'qid', 'description', 'position_x', 'position_y', 'created_by_user'
+            )),
+            list(Connection.objects.filter(topic=self.topic).order_by('id').values_list(
+                'id', 'firstNodeID', 'secondNodeID', 'relationName', 'relationDirection'
+            )),
+        )
+
+    def snapshot(self, name):
+        response = self.client.post(self.url, {'name': name}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def edit(self):
+        self.client.patch(f'/api/nodes/{self.nodes[1].id}/', {'manual_name': 'renamed', 'position_x': 7}, format='json')
+        self.client.delete(f'/api/nodes/{self.nodes[0].id}/')
+        self.client.post('/api/nodes/', {'manual_name': 'new', 'topic': self.topic.id}, format='json')
+
+    def test_diff_against_live_and_between_snapshots(self):
+        first = self.snapshot('before')
+        self.edit()
+        response = self.client.get(f'{self.url}diff/', {'from': first})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        added = Node.objects.get(manual_name='new').id
+        self.assertEqual(response.data['nodes'], {'added': [added], 'removed': [self.nodes[0].id],
+                                                  'changed': [self.nodes[1].id]})
+        self.assertEqual(response.data['connections'], {'added': [], 'removed': [self.connection.id], 'changed': []})
+
+        second = self.snapshot('after')
+        response = self.client.get(f'{self.url}diff/', {'from': second, 'to': first})
+        self.assertEqual(response.data['nodes']['added'], [self.nodes[0].id])
+        self.assertEqual(response.data['nodes']['removed'], [added])
+
+    def test_restore_brings_back_deleted_rows(self):
+        before = self.rows()
+        snapshot_id = self.snapshot('before')
+        self.edit()
+        response = self.client.post(f'{self.url}{snapshot_id}/restore/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['nodes'], {'added': 1, 'removed': 1, 'changed': 1})
+        self.assertEqual(self.rows(), before)
+        self.assertEqual(Node.objects.get(id=self.nodes[0].id).creation_date.replace(microsecond=0),
+                         self.nodes[0].creation_date.replace(microsecond=0))
+        self.assertEqual(WikiTopic.objects.get(topic=self.topic).nodeCount, 1)
+        response = self.client.get(f'{self.url}diff/', {'from': snapshot_id})
+        self.assertEqual(response.data['nodes'], {'added': [], 'removed': [], 'changed': []})
+
+    def test_restore_moves_connections_off_nodes_it_deletes(self):
+        before = self.rows()
+        snapshot_id = self.snapshot('before')
+        added = self.client.post('/api/nodes/', {'manual_name': 'new', 'topic': self.topic.id}, format='json')
+        response = self.client.put(f'/api/connections/{self.connection.id}/', {
+            'firstNodeID': self.nodes[0].id,
+            'secondNodeID': added.data['id'],
+            'relationName': 'knows',
+            'relationDirection': 'FIRST_TO_SECOND',
+            'topic': self.topic.id,
+            'createdBy': self.user.id
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.post(f'{self.url}{snapshot_id}/restore/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['connections'], {'added': 0, 'removed': 0, 'changed': 1})
+        self.assertEqual(self.rows(), before)
+
+    def test_listing_and_errors(self):
+        snapshot_id = self.snapshot('before')
+        response = self.client.post(self.url, {'name': 'before'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url)
+        self.assertEqual([(s['name'], s['nodeCount'], s['connectionCount']) for s in response.data],
+                         [('before', 3, 1)])
+        self.assertEqual(self.client.get(f'{self.url}diff/').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(f'{self.url}diff/', {'from': 999}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(f'{self.url}{snapshot_id}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(GraphSnapshot.objects.exists())
@@ -0,0 +1,339 @@
+import atexit
+import logging
+import math
+import threading
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection as db_connection, transaction
+from django.db.models import Q
+from connections.models import Connection
+from nodes.models import Node
+from topics.models import Topic
+from .models import TilePyramid, GraphTile, GraphTileEdge
+from .utils import get_graph_version
+
+logger = logging.getLogger(__name__)
+
+# width of a level 0 cell, four times the ideal edge length of the layout
+TILE_SIZE = 1000.0
+LEVELS = 8
+WRITE_BATCH_SIZE = 1000
+# exact cell matches OR-ed into one query, kept well under SQL parameter limits
+LOOKUP_CHUNK_SIZE = 200
+TILE_KEY = ('level', 'x', 'y')
+EDGE_KEY = ('level', 'x1', 'y1', 'x2', 'y2')
+
+
+def cell_size(level):
+    return TILE_SIZE * 2 ** level
+
+
+def cell_of(x, y, level):
+    size = cell_size(level)
+    return math.floor(x / size), math.floor(y / size)
+
+
+def _pair(a, b):
+    return (a, b) if a <= b else (b, a)
+
+
+def rebuild_tiles(topic_id, version):
+    """Recompute every level of a topic's pyramid from its nodes and connections."""
+    rows = Node.objects.filter(topic_id=topic_id).order_by('id').values_list('id', 'position_x', 'position_y')
+    rows = np.array(list(rows.iterator(chunk_size=5000)), dtype=np.float64).reshape(-1, 3)
+    ids = rows[:, 0].astype(np.int64)
+    positions = rows[:, 1:]
+    pairs = Connection.objects.filter(topic_id=topic_id).values_list('firstNodeID_id', 'secondNodeID_id')
+    pairs = np.array(list(pairs.iterator(chunk_size=5000)), dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[np.isin(pairs, ids).all(axis=1)]
+    ends = np.searchsorted(ids, pairs)
+
+    tiles = []
+    edges = []
+    for level in range(LEVELS):
+        cells = np.floor(positions / cell_size(level)).astype(np.int64)
+        unique, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        sum_x = np.bincount(inverse, weights=positions[:, 0], minlength=len(unique))
+        sum_y = np.bincount(inverse, weights=positions[:, 1], minlength=len(unique))
+        tiles.extend(
+            GraphTile(topic_id=topic_id, level=level, x=x, y=y, count=count, sumX=sx, sumY=sy)
+            for (x, y), count, sx, sy in zip(unique.tolist(), counts.tolist(), sum_x.tolist(), sum_y.tolist())
+        )
+
+        first, second = cells[ends[:, 0]], cells[ends[:, 1]]
+        apart = (first != second).any(axis=1)
+        first, second = first[apart], second[apart]
+        # order each pair so (a, b) and (b, a) land on the same row
+        swap = (first[:, 0] > second[:, 0]) | ((first[:, 0] == second[:, 0]) & (first[:, 1] > second[:, 1]))
+        first[swap], second[swap] = second[swap], first[swap].copy()
+        unique, counts = np.unique(np.hstack([first, second]), axis=0, return_counts=True)
+        edges.extend(
+            GraphTileEdge(topic_id=topic_id, level=level, x1=x1, y1=y1, x2=x2, y2=y2, count=count)
+            for (x1, y1, x2, y2), count in zip(unique.tolist(), counts.tolist())
+        )
+
+    with transaction.atomic():
+        # the topic row lock keeps rebuilds and update_positions patches from interleaving
+        Topic.objects.select_for_update().filter(id=topic_id).exists()
+        GraphTile.objects.filter(topic_id=topic_id).delete()
+        GraphTileEdge.objects.filter(topic_id=topic_id).delete()
+        GraphTile.objects.bulk_create(tiles, batch_size=WRITE_BATCH_SIZE)
+        GraphTileEdge.objects.bulk_create(edges, batch_size=WRITE_BATCH_SIZE)
+        TilePyramid.objects.update_or_create(topic_id=topic_id, defaults={'graphVersion': version})
+
+
+def apply_tile_moves(topic_id, moves, previous_version, version):
+    """
+    Shift tile counts and inter-cell edges for nodes moved by ``update_positions``.
+
+    ``moves`` maps node id to ``((old x, old y), (new x, new y))``. Only a
+    pyramid that was current at ``previous_version`` is patched; anything
+    older is left for the background rebuild ``get_tiles`` queues. Returns True when patched.
+    """
+    pyramid = TilePyramid.objects.select_for_update().filter(topic_id=topic_id).first()
+    if pyramid is None or pyramid.graphVersion != previous_version:
+        return False
+
+    tile_delta = defaultdict(lambda: [0, 0.0, 0.0])
+    for (old_x, old_y), (new_x, new_y) in moves.values():
+        for level in range(LEVELS):
+            old = tile_delta[(level, *cell_of(old_x, old_y, level))]
+            old[0] -= 1
+            old[1] -= old_x
+            old[2] -= old_y
+            new = tile_delta[(level, *cell_of(new_x, new_y, level))]
+            new[0] += 1
+            new[1] += new_x
+            new[2] += new_y
+
+    edge_delta = defaultdict(int)
+    connections = list(
+        Connection.objects.filter(topic_id=topic_id)
+        .filter(Q(firstNodeID_id__in=moves.keys()) | Q(secondNodeID_id__in=moves.keys()))
+        .values_list('firstNodeID_id', 'secondNodeID_id')
+    )
+    still = {end for pair in connections for end in pair if end not in moves}
+    fixed = {
+        node_id: (x, y)
+        for node_id, x, y in Node.objects.filter(id__in=still, topic_id=topic_id).values_list(
+            'id', 'position_x', 'position_y'
+        )
+    } if still else {}
+    for first, second in connections:
+        if (first not in moves and first not in fixed) or (second not in moves and second not in fixed):
+            continue
+        old_first, new_first = moves[first] if first in moves else (fixed[first], fixed[first])
+        old_second, new_second = moves[second] if second in moves else (fixed[second], fixed[second])
+        for level in range(LEVELS):
+            before = _pair(cell_of(*old_first, level), cell_of(*old_second, level))
+            after = _pair(cell_of(*new_first, level), cell_of(*new_second, level))
+            if before == after:
+                continue
+            if before[0] != before[1]:
+                edge_delta[(level, *before[0], *before[1])] -= 1
+            if after[0] != after[1]:
+                edge_delta[(level, *after[0], *after[1])] += 1
+
+    _apply_tile_delta(topic_id, tile_delta)
+    _apply_edge_delta(topic_id, edge_delta)
+    pyramid.graphVersion = version
+    pyramid.save(update_fields=['graphVersion', 'updatedDate'])
+    return True
+
+
+def _fetch_rows(model, topic_id, fields, keys):
+    """Rows of ``model`` in a topic whose ``fields`` values are one of ``keys``, as {key: row}."""
+    quote = db_connection.ops.quote_name
+    # the topic goes into every branch so each one is a unique index lookup; built as
+    # plain SQL because compiling hundreds of Q branches costs more than the query
+    branch = '(' + ' AND '.join(f'{quote(name)} = %s' for name in ('topic_id', *fields)) + ')'
+    keys = list(keys)
+    rows = {}
+    for offset in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = keys[offset:offset + LOOKUP_CHUNK_SIZE]
+        sql = f'SELECT * FROM {quote(model._meta.db_table)} WHERE ' + ' OR '.join([branch] * len(chunk))
+        params = [value for key in chunk for value in (topic_id, *key)]
+        for row in model.objects.raw(sql, params):
+            rows[tuple(getattr(row, field) for field in fields)] = row
+    return rows
+
+
+def _replace_rows(model, existing, rows):
+    # delete and insert again is one statement each, bulk_update would build a CASE per column
+    if existing:
+        model.objects.filter(pk__in=[row.pk for row in existing.values()]).delete()
+    for row in rows:
+        row.pk = None
+    model.objects.bulk_create([row for row in rows if row.count > 0], batch_size=WRITE_BATCH_SIZE)
+
+
+def _apply_tile_delta(topic_id, delta):
+    delta = {key: change for key, change in delta.items() if change[0] or change[1] or change[2]}
+    if not delta:
+        return
+    existing = _fetch_rows(GraphTile, topic_id, TILE_KEY, delta)
+    rows = []
+    for key, (count, sum_x, sum_y) in delta.items():
+        tile = existing.get(key) or GraphTile(topic_id=topic_id, level=key[0], x=key[1], y=key[2])
+        tile.count += count
+        tile.sumX += sum_x
+        tile.sumY += sum_y
+        rows.append(tile)
+    _replace_rows(GraphTile, existing, rows)
+
+
+def _apply_edge_delta(topic_id, delta):
+    delta = {key: change for key, change in delta.items() if change}
+    if not delta:
+        return
+    existing = _fetch_rows(GraphTileEdge, topic_id, EDGE_KEY, delta)
+    rows = []
+    for key, count in delta.items():
+        edge = existing.get(key) or GraphTileEdge(
+            topic_id=topic_id, level=key[0], x1=key[1], y1=key[2], x2=key[3], y2=key[4]
+        )
+        edge.count += count
+        rows.append(edge)
+    _replace_rows(GraphTileEdge, existing, rows)
+
+
+class TileRebuilder:
+    """
+    Rebuilds stale pyramids off the request path.
+
+    Topics are queued by ``get_tiles`` and rebuilt one after the other at the
+    graph version current when their turn comes, so a burst of writes costs
+    one rebuild rather than one per read.
+    """
+
+    def __init__(self, interval=0.5, autostart=True):
+        self.interval = interval
+        self.autostart = autostart
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.rebuilds = 0
+        self.failures = 0
+
+    def add(self, topic_id):
+        with self._lock:
+            self._pending[topic_id] = None
+        if self.autostart:
+            self._ensure_thread()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Rebuild every queued pyramid that is still stale; returns the number rebuilt."""
+        with self._flush_lock:
+            with self._lock:
+                queued, self._pending = list(self._pending), {}
+            rebuilt = 0
+            for topic_id in queued:
+                version = get_graph_version(topic_id)
+                if version is None or TilePyramid.objects.filter(topic_id=topic_id, graphVersion=version).exists():
+                    continue
+                try:
+                    rebuild_tiles(topic_id, version)
+                except Exception:
+                    # the next read of the stale pyramid queues it again
+                    logger.exception('Rebuilding the tiles of topic %s failed', topic_id)
+                    self.failures += 1
+                    continue
+                rebuilt += 1
+            self.rebuilds += rebuilt
+            return rebuilt
+
+    def stop(self):
+        """Stop the background thread; queued topics are rebuilt on their next read."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2 + 1)
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='tile-rebuilder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+
+_rebuilder = None
+_rebuilder_lock = threading.Lock()
+
+
+def get_tile_rebuilder():
+    """Process-wide rebuilder, stopped when the worker exits."""
+    global _rebuilder
+    if _rebuilder is None:
+        with _rebuilder_lock:
+            if _rebuilder is None:
+                _rebuilder = TileRebuilder(interval=settings.TILE_REBUILD_INTERVAL)
+                atexit.register(_rebuilder.stop)
+    return _rebuilder
+
+
+def get_tiles(topic_id, level, bbox=None):
+    """
+    Cells and inter-cell edges of one pyramid level.
+
+    A topic without a pyramid has it built first. A stale pyramid is served
+    as it is, with the version it matches and ``stale`` set, while a rebuild
+    is queued in the background. ``bbox`` limits the result to cells
+    overlapping it, and to edges with at least one end in those cells.
+    Returns None for a missing topic.
+    """
+    version = get_graph_version(topic_id)
+    if version is None:
+        return None
+    built = TilePyramid.objects.filter(topic_id=topic_id).values_list('graphVersion', flat=True).first()
+    if built is None:
+        rebuild_tiles(topic_id, version)
+        built = version
+    elif built != version:
+        get_tile_rebuilder().add(topic_id)
+
+    tiles = GraphTile.objects.filter(topic_id=topic_id, level=level)
+    edges = GraphTileEdge.objects.filter(topic_id=topic_id, level=level)
+    if bbox is not None:
+        min_x, min_y, max_x, max_y = bbox
+        low_x, low_y = cell_of(min_x, min_y, level)
+        high_x, high_y = cell_of(max_x, max_y, level)
+        tiles = tiles.filter(x__range=(low_x, high_x), y__range=(low_y, high_y))
+        edges = edges.filter(
+            Q(x1__range=(low_x, high_x), y1__range=(low_y, high_y))
+            | Q(x2__range=(low_x, high_x), y2__range=(low_y, high_y))
+        )
+    return {
+        'topic': topic_id,
+        'version': built,
+        'stale': built != version,
+        'level': level,
+        'cell_size': cell_size(level),
+        'tiles': [
+            {'x': x, 'y': y, 'count': count, 'center_x': sum_x / count, 'center_y': sum_y / count}
+            for x, y, count, sum_x, sum_y in tiles.order_by('x', 'y').values_list('x', 'y', 'count', 'sumX', 'sumY')
+        ],
+        'edges': [
+            {'source': [x1, y1], 'target': [x2, y2], 'count': count}
+            for x1, y1, x2, y2, count in edges.order_by('x1', 'y1', 'x2', 'y2').values_list(
+                'x1', 'y1', 'x2', 'y2', 'count'
+            )
+        ],
+    }
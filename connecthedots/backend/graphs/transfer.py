@@ -0,0 +1,313 @@
+import json
+from itertools import islice
+from uuid import uuid4
+from xml.etree.ElementTree import iterparse, ParseError
+from xml.sax.saxutils import escape, quoteattr
+from asgiref.sync import sync_to_async
+from django.db import transaction, IntegrityError
+from nodes.models import Node
+from connections.models import Connection
+from wikis.models import Wiki
+from wikis.utils import record_wiki_usage
+from wikis.enrichment import enrich_later
+from usertopics.utils import record_user_topic_action
+from .models import ImportedNode
+from .utils import record_graph_reset
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_CHUNK_SIZE = 1000
+GRAPHML_NS = 'http://graphml.graphdrawing.org/xmlns'
+
+NODE_FIELDS = ['manual_name', 'qid', 'qid_label', 'qid_description', 'description', 'position_x', 'position_y']
+CONNECTION_FIELDS = ['relationName', 'relationDirection']
+DIRECTIONS = {choice for choice, _ in Connection.DIRECTION_CHOICES}
+
+
+def iter_node_records(topic_id):
+    # iterator() streams through a server-side cursor on PostgreSQL instead of loading every row
+    rows = (
+        Node.objects.filter(topic_id=topic_id)
+        .order_by('id')
+        .values('id', 'manual_name', 'qid_id', 'qid__label', 'qid__description',
+                'description', 'position_x', 'position_y')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for row in rows:
+        yield {
+            'type': 'node',
+            'id': row['id'],
+            'manual_name': row['manual_name'],
+            'qid': row['qid_id'],
+            'qid_label': row['qid__label'],
+            'qid_description': row['qid__description'],
+            'description': row['description'],
+            'position_x': row['position_x'],
+            'position_y': row['position_y'],
+        }
+
+
+def iter_connection_records(topic_id):
+    rows = (
+        Connection.objects.filter(topic_id=topic_id)
+        .order_by('id')
+        .values_list('id', 'firstNodeID_id', 'secondNodeID_id', 'relationName', 'relationDirection')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for connection_id, first, second, relation_name, relation_direction in rows:
+        yield {
+            'type': 'connection',
+            'id': connection_id,
+            'firstNodeID': first,
+            'secondNodeID': second,
+            'relationName': relation_name,
+            'relationDirection': relation_direction,
+        }
+
+
+def export_ndjson(topic):
+    yield json.dumps({
+        'type': 'topic',
+        'id': topic.id,
+        'topicName': topic.topicName,
+        'version': topic.graphVersion,
+    }) + '\n'
+    for record in iter_node_records(topic.id):
+        yield json.dumps(record) + '\n'
+    for record in iter_connection_records(topic.id):
+        yield json.dumps(record) + '\n'
+
+
+def graphml_data(record, fields):
+    return ''.join(
+        f'<data key="{field}">{escape(str(record[field]))}</data>'
+        for field in fields
+        if record[field] is not None
+    )
+
+
+def export_graphml(topic):
+    keys = [('node', field, 'double' if field.startswith('position_') else 'string') for field in NODE_FIELDS]
+    keys += [('edge', field, 'string') for field in CONNECTION_FIELDS]
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<graphml xmlns="{GRAPHML_NS}">\n'
+        + ''.join(
+            f'<key id="{name}" for="{kind}" attr.name="{name}" attr.type="{kind_type}"/>\n'
+            for kind, name, kind_type in keys
+        )
+        + f'<graph id={quoteattr(str(topic.id))} edgedefault="directed">\n'
+    )
+    for record in iter_node_records(topic.id):
+        yield f'<node id="{record["id"]}">{graphml_data(record, NODE_FIELDS)}</node>\n'
+    # source and target are always first and second node, relationDirection keeps the real direction
+    for record in iter_connection_records(topic.id):
+        yield (
+            f'<edge id="{record["id"]}" source="{record["firstNodeID"]}" target="{record["secondNodeID"]}">'
+            f'{graphml_data(record, CONNECTION_FIELDS)}</edge>\n'
+        )
+    yield '</graph>\n</graphml>\n'
+
+
+async def iterate_async(export):
+    """
+    Serve a sync export generator from an async view without loading it whole.
+
+    Under ASGI Django drains a sync streaming iterator into a list before the
+    first byte goes out. Here every hop to the sync side pulls one chunk of
+    ``EXPORT_CHUNK_SIZE`` pieces. The hops are thread sensitive, so they all
+    run on the same thread and the server-side cursor stays on its connection.
+    """
+    pull = sync_to_async(lambda: ''.join(islice(export, EXPORT_CHUNK_SIZE)))
+    while chunk := await pull():
+        yield chunk
+
+
+def parse_ndjson(stream):
+    for number, line in enumerate(iter(stream.readline, b''), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise ValueError(f'line {number} is not valid JSON')
+        if not isinstance(record, dict):
+            raise ValueError(f'line {number} must be a JSON object')
+        yield record
+
+
+def parse_graphml(stream):
+    keys = {}
+    graph = None
+    try:
+        for event, element in iterparse(stream, events=('start', 'end')):
+            tag = element.tag.rpartition('}')[2]
+            if event == 'start':
+                if tag == 'graph' and graph is None:
+                    graph = element
+                continue
+            if tag == 'key':
+                keys[element.get('id')] = element.get('attr.name') or element.get('id')
+            elif tag in ('node', 'edge'):
+                record = {
+                    keys.get(data.get('key'), data.get('key')): data.text
+                    for data in element
+                    if data.tag.rpartition('}')[2] == 'data'
+                }
+                if tag == 'node':
+                    record.update(type='node', id=element.get('id'))
+                else:
+                    record.update(
+                        type='connection',
+                        id=element.get('id'),
+                        firstNodeID=element.get('source'),
+                        secondNodeID=element.get('target'),
+                    )
+                yield record
+                # drop finished elements so the parsed tree never grows
+                element.clear()
+                if graph is not None:
+                    graph.clear()
+    except ParseError as e:
+        raise ValueError(f'invalid GraphML: {e}')
+
+
+class GraphImporter:
+    """
+    Loads node and connection records into a topic in chunks.
+
+    Source node ids are kept in ``ImportedNode`` rows rather than in memory, so
+    connections can point at nodes from any earlier chunk.
+    """
+
+    def __init__(self, topic, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.topic = topic
+        self.user = user
+        self.chunk_size = chunk_size
+        self.import_id = uuid4().hex
+        self.nodes = []
+        self.connections = []
+        self.counts = {'nodes': 0, 'connections': 0, 'wikis': 0, 'skipped_connections': 0}
+
+    def add(self, record):
+        kind = record.get('type')
+        if kind == 'node':
+            self.nodes.append(record)
+            if len(self.nodes) >= self.chunk_size:
+                self.flush_nodes()
+        elif kind == 'connection':
+            self.connections.append(record)
+            if len(self.connections) >= self.chunk_size:
+                self.flush_connections()
+        elif kind != 'topic':
+            raise ValueError(f'unknown record type {kind!r}')
+
+    def flush_nodes(self):
+        if not self.nodes:
+            return
+        self.upsert_wikis(self.nodes)
+        created = Node.objects.bulk_create([
+            Node(
+                manual_name=record.get('manual_name') or None,
+                qid_id=record.get('qid') or None,
+                description=record.get('description'),
+                position_x=float(record.get('position_x') or 0),
+                position_y=float(record.get('position_y') or 0),
+                topic=self.topic,
+                created_by_user=self.user,
+            )
+            for record in self.nodes
+        ])
+        mapping = [
+            ImportedNode(importID=self.import_id, sourceID=str(record['id']), node_id=node.id)
+            for record, node in zip(self.nodes, created)
+            if record.get('id') is not None
+        ]
+        try:
+            with transaction.atomic():
+                ImportedNode.objects.bulk_create(mapping)
+        except IntegrityError:
+            raise ValueError('node ids must be unique')
+        record_wiki_usage(added=[(node.qid_id, self.topic.id) for node in created])
+        self.counts['nodes'] += len(created)
+        self.nodes = []
+
+    def upsert_wikis(self, records):
+        labelled = {}
+        bare = set()
+        for record in records:
+            qid = record.get('qid')
+            if not qid:
+                continue
+            if record.get('qid_label'):
+                labelled[qid] = Wiki(qID=qid, label=record['qid_label'], description=record.get('qid_description') or '')
+            else:
+                bare.add(qid)
+        if labelled:
+            # wikis are shared by every topic: an import adds missing rows and
+            # fills placeholders, but never overwrites a label someone has set
+            Wiki.objects.bulk_create(labelled.values(), ignore_conflicts=True)
+            placeholders = list(Wiki.objects.filter(qID__in=labelled.keys(), label=''))
+            for wiki in placeholders:
+                wiki.label, wiki.description = labelled[wiki.qID].label, labelled[wiki.qID].description
+            Wiki.objects.bulk_update(placeholders, ['label', 'description'])
+        # qids without a label only need a row to point at, existing ones stay as they are
+        bare -= labelled.keys()
+        if bare:
+            Wiki.objects.bulk_create([Wiki(qID=qid, label='', description='') for qid in bare], ignore_conflicts=True)
+            enrich_later(bare)
+        self.counts['wikis'] += len(labelled) + len(bare)
+
+    def flush_connections(self):
+        if not self.connections:
+            return
+        self.flush_nodes()
+        source_ids = set()
+        for record in self.connections:
+            source_ids.add(str(record.get('firstNodeID')))
+            source_ids.add(str(record.get('secondNodeID')))
+        node_ids = dict(
+            ImportedNode.objects.filter(importID=self.import_id, sourceID__in=source_ids)
+            .values_list('sourceID', 'node_id')
+        )
+        connections = []
+        for record in self.connections:
+            first = node_ids.get(str(record.get('firstNodeID')))
+            second = node_ids.get(str(record.get('secondNodeID')))
+            if first is None or second is None:
+                self.counts['skipped_connections'] += 1
+                continue
+            direction = record.get('relationDirection') or 'UNDIRECTED'
+            if direction not in DIRECTIONS:
+                raise ValueError(f'unknown relationDirection {direction!r}')
+            connections.append(Connection(
+                firstNodeID_id=first,
+                secondNodeID_id=second,
+                relationName=record.get('relationName') or '',
+                relationDirection=direction,
+                createdBy=self.user,
+                topic=self.topic,
+            ))
+        Connection.objects.bulk_create(connections)
+        self.counts['connections'] += len(connections)
+        self.connections = []
+
+    def finish(self):
+        self.flush_nodes()
+        self.flush_connections()
+        ImportedNode.objects.filter(importID=self.import_id).delete()
+        if self.counts['nodes'] or self.counts['connections']:
+            # one interaction and one version step for the whole file instead of one per row
+            record_user_topic_action(self.user, self.topic, 'addedNode')
+            self.counts['version'] = record_graph_reset(self.topic.id)
+        else:
+            self.counts['version'] = self.topic.graphVersion
+        return self.counts
+
+
+def import_graph(topic, user, records):
+    """Import parsed records into ``topic`` in one transaction and return the counts."""
+    with transaction.atomic():
+        importer = GraphImporter(topic, user)
+        for record in records:
+            importer.add(record)
+        return importer.finish()
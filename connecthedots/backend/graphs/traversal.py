@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection as db_connection
+from django.db.models import Q
+from connections.models import Connection
+from nodes.models import Node
+from .index import get_topic_index
+from .utils import get_structure_version
+
+# hard limits for database-side traversal
+MAX_SQL_DEPTH = 6
+MAX_SQL_ROWS = 20000
+
+
+def _edges_sql(directed):
+    """
+    SQL for the topic's half-edges ``(src, dst)``.
+
+    Every connection is listed once per direction it can be walked in, so
+    each branch is a plain lookup on the (topic, firstNodeID) or
+    (topic, secondNodeID) index once the walk joins on ``src``. Takes the
+    topic id twice as parameters.
+    """
+    qn = db_connection.ops.quote_name
+    opts = Connection._meta
+    table = qn(opts.db_table)
+    topic = qn(opts.get_field('topic').column)
+    first = qn(opts.get_field('firstNodeID').column)
+    second = qn(opts.get_field('secondNodeID').column)
+    direction = qn(opts.get_field('relationDirection').column)
+    forward = f"SELECT {first} AS src, {second} AS dst FROM {table} WHERE {topic} = %s"
+    backward = f"SELECT {second} AS src, {first} AS dst FROM {table} WHERE {topic} = %s"
+    if directed:
+        forward += f" AND {direction} IN ('UNDIRECTED', 'FIRST_TO_SECOND')"
+        backward += f" AND {direction} IN ('UNDIRECTED', 'SECOND_TO_FIRST')"
+    return f"{forward} UNION ALL {backward}"
+
+
+def _leads_to(previous, current, first, direction):
+    if direction == 'UNDIRECTED':
+        return True
+    if direction == 'FIRST_TO_SECOND':
+        return first == previous
+    return first == current
+
+
+class SQLTraversal:
+    """
+    Traversal answered by recursive SQL over the ``connections`` table.
+
+    Used for topics too large to hold in memory. Walks are cut at
+    ``MAX_SQL_DEPTH`` hops and ``MAX_SQL_ROWS`` visited rows; ``truncated``
+    tells whether the last query was cut short by either limit.
+
+    The row limit is the fan-out bound: there is no per-node neighbour limit.
+    SQLite's recursive step can neither use window functions nor LATERAL,
+    and ranking every edge of the topic up front would turn each hop's
+    indexed lookup into a sort of the whole topic per query. A hub therefore
+    spends the shared row budget, and the walk reports itself truncated.
+    """
+    mode = 'database'
+
+    def __init__(self, topic_id, max_rows=MAX_SQL_ROWS):
+        self.topic_id = topic_id
+        self.max_rows = max_rows
+        self.truncated = False
+
+    def __contains__(self, node_id):
+        return Node.objects.filter(topic_id=self.topic_id, id=node_id).exists()
+
+    def _fetch(self, sql, params):
+        with db_connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def neighborhood(self, node_id, depth=None, directed=False, stop_at=None):
+        """
+        Node id -> hop distance; walks do not continue past ``stop_at``.
+
+        ``depth`` None walks as far as allowed. When the depth limit is below
+        what was asked, the walk goes one hop further to find out whether the
+        limit cut anything off.
+        """
+        capped = depth is None or depth > MAX_SQL_DEPTH
+        if capped:
+            depth = MAX_SQL_DEPTH + 1
+        # UNION drops repeated (node, depth) pairs, the LIMIT stops the walk early
+        sql = f"""
+            WITH RECURSIVE edges(src, dst) AS ({_edges_sql(directed)}),
+            walk(node, depth) AS (
+                SELECT CAST(%s AS BIGINT), 0
+                UNION
+                SELECT e.dst, w.depth + 1
+                FROM walk w
+                JOIN edges e ON e.src = w.node
+                WHERE w.depth < %s AND w.node <> %s
+            )
+            SELECT node, depth FROM walk LIMIT %s
+        """
+        stop_at = -1 if stop_at is None else stop_at
+        params = [self.topic_id, self.topic_id, node_id, depth, stop_at, self.max_rows + 1]
+        rows = self._fetch(sql, params)
+        self.truncated = len(rows) > self.max_rows
+        distances = {}
+        for node, distance in rows[:self.max_rows]:
+            if node not in distances or distance < distances[node]:
+                distances[node] = distance
+        if capped:
+            beyond = [node for node, distance in distances.items() if distance > MAX_SQL_DEPTH]
+            for node in beyond:
+                del distances[node]
+            self.truncated = self.truncated or bool(beyond)
+        return distances
+
+    def shortest_path(self, source, target, directed=True):
+        """
+        Like ``AdjacencyIndex.shortest_path``; when nothing is found,
+        ``truncated`` tells whether the walk stopped at a limit first.
+
+        Distances come from the recursive walk, then the path is traced back
+        from ``target`` one indexed lookup per hop.
+        """
+        distances = self.neighborhood(source, directed=directed, stop_at=target)
+        if target not in distances:
+            return None
+
+        nodes = [target]
+        connections = []
+        current = target
+        for distance in range(distances[target], 0, -1):
+            candidates = Connection.objects.filter(
+                Q(firstNodeID=current) | Q(secondNodeID=current), topic_id=self.topic_id
+            ).values_list('id', 'firstNodeID_id', 'secondNodeID_id', 'relationDirection')
+            for connection_id, first, second, direction in candidates.order_by('id'):
+                previous = first if second == current else second
+                if distances.get(previous) != distance - 1:
+                    continue
+                if directed and not _leads_to(previous, current, first, direction):
+                    continue
+                nodes.append(previous)
+                connections.append(connection_id)
+                current = previous
+                break
+        return nodes[::-1], connections[::-1]
+
+    def reachable(self, source, directed=True):
+        return set(self.neighborhood(source, directed=directed))
+
+
+def get_edge_count(topic_id, version):
+    cache_key = f'graph-edge-count:{topic_id}:{version}'
+    count = cache.get(cache_key)
+    if count is None:
+        count = Connection.objects.filter(topic_id=topic_id).count()
+        cache.set(cache_key, count, 60 * 60)
+    return count
+
+
+def get_traversal(topic_id):
+    """
+    In-memory index for normal topics, recursive SQL above
+    ``settings.GRAPH_INDEX_MAX_EDGES`` edges. None when the topic does not exist.
+    """
+    version = get_structure_version(topic_id)
+    if version is None:
+        return None
+    if get_edge_count(topic_id, version) > settings.GRAPH_INDEX_MAX_EDGES:
+        return SQLTraversal(topic_id)
+    return get_topic_index(topic_id, version)
@@ -0,0 +1,22 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('graph/', views.topic_graph, name='topic-graph'),
+    path('changes/', views.topic_changes, name='topic-changes'),
+    path('neighbors/', views.topic_neighbors, name='topic-neighbors'),
+    path('path/', views.topic_path, name='topic-path'),
+    path('reachable/', views.topic_reachable, name='topic-reachable'),
+    path('layout/', views.topic_layout, name='topic-layout'),
+    path('centrality/', views.topic_centrality, name='topic-centrality'),
+    path('clusters/', views.topic_clusters, name='topic-clusters'),
+    path('tiles/', views.topic_tiles, name='topic-tiles'),
+    path('export/', views.topic_export, name='topic-export'),
+    path('import/', views.topic_import, name='topic-import'),
+    path('mutations/', views.topic_mutations, name='topic-mutations'),
+    path('clone/', views.topic_clone, name='topic-clone'),
+    path('snapshots/', views.topic_snapshots, name='topic-snapshots'),
+    path('snapshots/diff/', views.topic_snapshot_diff, name='topic-snapshot-diff'),
+    path('snapshots/<int:snapshot_id>/', views.topic_snapshot, name='topic-snapshot'),
+    path('snapshots/<int:snapshot_id>/restore/', views.topic_snapshot_restore, name='topic-snapshot-restore'),
+]
@@ -0,0 +1,156 @@
+from functools import partial
+from django.db import transaction
+from django.db.models import Q
+from topics.models import Topic
+from .models import GraphChange
+from .realtime import publish_graph_changes, publish_graph_reset
+
+
+def record_graph_changes(topic_id, changes):
+    """
+    Append ``(entity, operation, object_id, data)`` changes to a topic's log.
+
+    Every change gets the next sequence number and the topic's graphVersion
+    is moved to the last one, so cached graphs and ETags expire; so is its
+    structureVersion, unless every change is a node update. Returns the new
+    version, or None when the topic does not exist.
+    """
+    if not topic_id or not changes:
+        return None
+    with transaction.atomic():
+        # the row lock serializes writers so sequence numbers never collide
+        version = (
+            Topic.objects.select_for_update()
+            .filter(id=topic_id)
+            .values_list('graphVersion', flat=True)
+            .first()
+        )
+        if version is None:
+            return None
+        entries = GraphChange.objects.bulk_create([
+            GraphChange(
+                topic_id=topic_id,
+                seq=version + offset,
+                entity=entity,
+                operation=operation,
+                objectID=object_id,
+                data=data,
+            )
+            for offset, (entity, operation, object_id, data) in enumerate(changes, start=1)
+        ])
+        version += len(changes)
+        versions = {'graphVersion': version}
+        if any(entity != GraphChange.NODE or operation != GraphChange.UPDATE for entity, operation, _, _ in changes):
+            versions['structureVersion'] = version
+        Topic.objects.filter(id=topic_id).update(**versions)
+        # collaborators only hear about changes that were really committed
+        transaction.on_commit(partial(publish_graph_changes, topic_id, entries))
+    return version
+
+
+def record_graph_reset(topic_id):
+    """
+    Move the version on without logging rows, for bulk writes such as imports.
+
+    Clients syncing from an older version are told to reload the graph.
+    """
+    with transaction.atomic():
+        version = (
+            Topic.objects.select_for_update()
+            .filter(id=topic_id)
+            .values_list('graphVersion', flat=True)
+            .first()
+        )
+        if version is None:
+            return None
+        version += 1
+        Topic.objects.filter(id=topic_id).update(graphVersion=version, structureVersion=version)
+        transaction.on_commit(partial(publish_graph_reset, topic_id, version))
+    return version
+
+
+def lock_topics(*topic_ids):
+    """
+    Lock the rows of the given topics, in id order so writers never deadlock.
+
+    Called first inside the ``transaction.atomic()`` around a graph write, so
+    the write and its log entries commit together and in ``seq`` order.
+    """
+    ids = sorted({topic_id for topic_id in topic_ids if topic_id})
+    list(Topic.objects.select_for_update().filter(id__in=ids).order_by('id').values_list('id', flat=True))
+
+
+def record_graph_change(topic_id, entity, operation, object_id, data=None):
+    return record_graph_changes(topic_id, [(entity, operation, object_id, data)])
+
+
+def record_graph_update(entity, object_id, data, old_topic_id, topic_id):
+    # moving a row to another topic is a delete there and an insert here
+    if old_topic_id == topic_id:
+        return record_graph_change(topic_id, entity, GraphChange.UPDATE, object_id, data)
+    record_graph_change(old_topic_id, entity, GraphChange.DELETE, object_id)
+    return record_graph_change(topic_id, entity, GraphChange.INSERT, object_id, data)
+
+
+def node_delete_changes(node):
+    """Changes for deleting ``node``, including the connections it cascades to."""
+    from connections.models import Connection
+
+    connection_ids = Connection.objects.filter(
+        Q(firstNodeID=node) | Q(secondNodeID=node), topic_id=node.topic_id
+    ).values_list('id', flat=True)
+    changes = [
+        (GraphChange.CONNECTION, GraphChange.DELETE, connection_id, None)
+        for connection_id in sorted(connection_ids)
+    ]
+    changes.append((GraphChange.NODE, GraphChange.DELETE, node.id, None))
+    return changes
+
+
+def get_changes_since(topic_id, since, limit):
+    """
+    Changes with ``seq > since`` for a topic.
+
+    Returns ``(version, changes, resync)``; ``resync`` is True when the log no
+    longer holds every change after ``since`` and the client must reload.
+    """
+    version = get_graph_version(topic_id)
+    if version is None:
+        return None, [], False
+    if since > version:
+        return version, [], True
+    if since == version:
+        return version, [], False
+
+    changes = list(
+        GraphChange.objects.filter(topic_id=topic_id, seq__gt=since).order_by('seq')[:limit]
+    )
+    # a hole in the sequence is a compacted or bulk (unlogged) write: stop in front of it
+    for position, change in enumerate(changes):
+        if change.seq != since + 1 + position:
+            changes = changes[:position]
+            break
+    if not changes:
+        return version, [], True
+    return version, changes, False
+
+
+def compact_graph_changes(topic_id, keep):
+    """Drop all but the last ``keep`` changes of a topic; returns the number deleted."""
+    version = get_graph_version(topic_id)
+    if version is None:
+        return 0
+    deleted, _ = GraphChange.objects.filter(topic_id=topic_id, seq__lte=version - keep).delete()
+    return deleted
+
+
+def get_graph_version(topic_id):
+    return Topic.objects.filter(id=topic_id).values_list('graphVersion', flat=True).first()
+
+
+def get_structure_version(topic_id):
+    return Topic.objects.filter(id=topic_id).values_list('structureVersion', flat=True).first()
+
+
+def graph_etag(topic_id, version):
+    return f'"topic-{topic_id}-v{version}"'
@@ -0,0 +1,468 @@
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.settings import api_settings
+from nodes.models import Node
+from .serializers import GraphChangeSerializer, GraphSnapshotSerializer
+from .utils import get_graph_version, graph_etag, get_changes_since
+from .traversal import get_traversal
+from .layout import layout_topic
+from .centrality import refresh_centrality
+from .clusters import get_topic_clusters
+from .tiles import get_tiles, LEVELS
+from nodes.utils import parse_bbox
+from .models import NodeCentrality, GraphSnapshot
+from .wire import GraphBinaryRenderer
+from .transfer import export_ndjson, export_graphml, parse_ndjson, parse_graphml, import_graph, iterate_async
+from .mutations import apply_mutations
+from .clone import clone_topic, MAX_SELECTED_NODES
+from .snapshots import build_graph_snapshot, take_snapshot, snapshot_columns, live_columns, diff_graphs, \
+    restore_snapshot
+from topics.serializers import TopicSerializer
+from topics.models import Topic
+
+MAX_CHANGES = 1000
+MAX_DEPTH = 10
+MAX_RANKING = 500
+RANKING_ORDERS = ('pagerank', 'degree', 'betweenness')
+EXPORT_FORMATS = {
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'graphml': (export_graphml, 'application/graphml+xml'),
+}
+
+
+def etag_matches(request, etag):
+    if_none_match = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, GraphBinaryRenderer])
+def topic_graph(request, topic_id):
+    version = get_graph_version(topic_id)
+    if version is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = graph_etag(topic_id, version)
+    if isinstance(request.accepted_renderer, GraphBinaryRenderer):
+        # a different representation of the same version needs its own validator
+        etag = etag[:-1] + '-bin"'
+    headers = {'ETag': etag, 'Vary': 'Accept'}
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    snapshot = build_graph_snapshot(topic_id, version)
+    return Response(snapshot, headers=headers)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_changes(request, topic_id):
+    try:
+        since = int(request.query_params.get('since', 0))
+    except ValueError:
+        return Response({'error': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if since < 0:
+        return Response({'error': 'since must not be negative'}, status=status.HTTP_400_BAD_REQUEST)
+
+    version, changes, resync = get_changes_since(topic_id, since, MAX_CHANGES)
+    if version is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    if resync:
+        return Response(
+            {'error': 'Changes are no longer available, reload the graph', 'resync': True, 'version': version},
+            status=status.HTTP_410_GONE
+        )
+
+    last_seq = changes[-1].seq if changes else since
+    return Response({
+        'version': version,
+        'since': since,
+        'last_seq': last_seq,
+        'has_more': last_seq < version,
+        'resync': False,
+        'changes': GraphChangeSerializer(changes, many=True).data,
+    })
+
+
+REQUIRED = object()
+
+
+def int_param(request, name, default=REQUIRED):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        if default is REQUIRED:
+            raise ValueError(f'{name} is required')
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+
+def bool_param(request, name, default):
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def load_traversal(topic_id, *node_ids):
+    """The topic's traversal backend (memory or database), or an error Response."""
+    traversal = get_traversal(topic_id)
+    if traversal is None:
+        return None, Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    for node_id in node_ids:
+        if node_id not in traversal:
+            return None, Response({"error": f"Node {node_id} not found in topic"}, status=status.HTTP_404_NOT_FOUND)
+    return traversal, None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_neighbors(request, topic_id):
+    try:
+        node_id = int_param(request, 'node')
+        depth = int_param(request, 'depth', 1)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= depth <= MAX_DEPTH:
+        return Response({'error': f'depth must be between 0 and {MAX_DEPTH}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    traversal, error = load_traversal(topic_id, node_id)
+    if error:
+        return error
+    distances = traversal.neighborhood(node_id, depth, directed=bool_param(request, 'directed', False))
+    return Response({
+        'node': node_id,
+        'depth': depth,
+        'mode': traversal.mode,
+        'truncated': traversal.truncated,
+        'nodes': [{'id': other, 'distance': distance} for other, distance in sorted(distances.items())],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_path(request, topic_id):
+    try:
+        source = int_param(request, 'source')
+        target = int_param(request, 'target')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    traversal, error = load_traversal(topic_id, source, target)
+    if error:
+        return error
+    path = traversal.shortest_path(source, target, directed=bool_param(request, 'directed', True))
+    if path is None:
+        return Response({
+            'source': source,
+            'target': target,
+            'mode': traversal.mode,
+            'truncated': traversal.truncated,
+            'path': None,
+            'connections': None,
+            'length': None,
+        })
+    nodes, connections = path
+    return Response({
+        'source': source,
+        'target': target,
+        'mode': traversal.mode,
+        'truncated': traversal.truncated,
+        'path': nodes,
+        'connections': connections,
+        'length': len(connections),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_reachable(request, topic_id):
+    try:
+        source = int_param(request, 'source')
+        target = int_param(request, 'target', None)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    traversal, error = load_traversal(topic_id, source)
+    if error:
+        return error
+    reachable = traversal.reachable(source, directed=bool_param(request, 'directed', True))
+    if target is not None:
+        return Response({
+            'source': source,
+            'target': target,
+            'mode': traversal.mode,
+            'truncated': traversal.truncated,
+            'reachable': target in reachable,
+        })
+    return Response({
+        'source': source,
+        'mode': traversal.mode,
+        'truncated': traversal.truncated,
+        'nodes': sorted(reachable),
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def topic_layout(request, topic_id):
+    if not Topic.objects.filter(id=topic_id).exists():
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    mode = request.data.get('mode', 'incremental')
+    if mode not in ('incremental', 'full'):
+        return Response({'error': 'mode must be incremental or full'}, status=status.HTTP_400_BAD_REQUEST)
+    node_ids = request.data.get('node_ids')
+    try:
+        time_budget = float(request.data.get('time_budget', 2.0))
+        iterations = int(request.data.get('iterations', 200))
+        if node_ids is not None:
+            node_ids = [int(node_id) for node_id in node_ids]
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'time_budget, iterations and node_ids must be numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if time_budget <= 0 or not 1 <= iterations <= 1000:
+        return Response(
+            {'error': 'time_budget must be positive and iterations between 1 and 1000'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    summary = layout_topic(topic_id, mode, node_ids=node_ids, time_budget=time_budget, iterations=iterations)
+    return Response(summary)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_centrality(request, topic_id):
+    order = request.query_params.get('order', 'pagerank')
+    if order not in RANKING_ORDERS:
+        return Response({'error': 'order must be pagerank, degree or betweenness'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int_param(request, 'limit', 20)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= MAX_RANKING:
+        return Response({'error': f'limit must be between 1 and {MAX_RANKING}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    state = refresh_centrality(topic_id)
+    if state is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    rows = (
+        NodeCentrality.objects.filter(topic_id=topic_id)
+        .order_by(f'-{order}', 'node_id')
+        .values('node_id', 'pagerank', 'degree', 'betweenness')[:limit]
+    )
+    return Response({
+        'version': state.graphVersion,
+        'iterations': state.iterations,
+        'order': order,
+        'nodes': [
+            {'id': row['node_id'], 'pagerank': row['pagerank'], 'degree': row['degree'],
+             'betweenness': row['betweenness']}
+            for row in rows
+        ],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_clusters(request, topic_id):
+    clusters = get_topic_clusters(topic_id)
+    if clusters is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    # clusters only change with the graph structure, so the validator follows the edges
+    headers = {'ETag': f'"topic-{topic_id}-clusters-{clusters["digest"][:16]}"'}
+    if etag_matches(request, headers['ETag']):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(clusters, headers=headers)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_tiles(request, topic_id):
+    try:
+        level = int_param(request, 'level')
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= level < LEVELS:
+        return Response({'error': f'level must be between 0 and {LEVELS - 1}'}, status=status.HTTP_400_BAD_REQUEST)
+    bbox = request.query_params.get('bbox')
+    try:
+        bbox = parse_bbox(bbox) if bbox else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    tiles = get_tiles(topic_id, level, bbox)
+    if tiles is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    return Response(tiles, headers={'ETag': graph_etag(topic_id, tiles['version'])})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_export(request, topic_id):
+    # "output" rather than "format", which DRF keeps for content negotiation
+    output = request.query_params.get('output', 'ndjson')
+    if output not in EXPORT_FORMATS:
+        return Response({'error': 'output must be ndjson or graphml'}, status=status.HTTP_400_BAD_REQUEST)
+    topic = Topic.objects.filter(id=topic_id).first()
+    if topic is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    export, content_type = EXPORT_FORMATS[output]
+    content = export(topic)
+    if isinstance(request._request, ASGIRequest):
+        # an ASGI server would otherwise buffer the whole export in memory
+        content = iterate_async(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="topic-{topic.id}.{output}"'
+    response['ETag'] = graph_etag(topic.id, topic.graphVersion)
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def topic_import(request, topic_id):
+    topic = Topic.objects.filter(id=topic_id).first()
+    if topic is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    source = request.query_params.get('input')
+    if source is None:
+        source = 'graphml' if 'xml' in request.content_type else 'ndjson'
+    if source not in EXPORT_FORMATS:
+        return Response({'error': 'input must be ndjson or graphml'}, status=status.HTTP_400_BAD_REQUEST)
+    if request.stream is None:
+        return Response({'error': 'Request body is empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # the body is read straight from the stream, request.data would buffer all of it
+    records = parse_graphml(request.stream) if source == 'graphml' else parse_ndjson(request.stream)
+    try:
+        counts = import_graph(topic, request.user, records)
+    except (TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(counts, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def topic_mutations(request, topic_id):
+    topic = Topic.objects.filter(id=topic_id).first()
+    if topic is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        result = apply_mutations(topic, request.user, request.data.get('operations'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(result)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def topic_clone(request, topic_id):
+    topic = Topic.objects.filter(id=topic_id).first()
+    if topic is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    topic_name = request.data.get('topicName')
+    if topic_name is not None and (not isinstance(topic_name, str) or len(topic_name) > 200):
+        return Response({'error': 'topicName must be a string of at most 200 characters'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    node_ids = request.data.get('nodes')
+    if node_ids is not None:
+        if (not isinstance(node_ids, list) or not node_ids
+                or not all(isinstance(node_id, int) and not isinstance(node_id, bool) for node_id in node_ids)):
+            return Response({'error': 'nodes must be a non-empty list of node ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        node_ids = set(node_ids)
+        if len(node_ids) > MAX_SELECTED_NODES:
+            return Response({'error': f'at most {MAX_SELECTED_NODES} nodes can be selected'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if Node.objects.filter(topic_id=topic_id, id__in=node_ids).count() != len(node_ids):
+            return Response({'error': 'nodes must all belong to this topic'}, status=status.HTTP_400_BAD_REQUEST)
+
+    clone = clone_topic(topic, request.user, topic_name, node_ids)
+    return Response({
+        **TopicSerializer(clone).data,
+        'nodes': clone.node_count,
+        'connections': clone.connection_count,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def topic_snapshots(request, topic_id):
+    topic = Topic.objects.filter(id=topic_id).first()
+    if topic is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        snapshots = GraphSnapshot.objects.filter(topic=topic).defer('data').order_by('-creationDate', '-id')
+        return Response(GraphSnapshotSerializer(snapshots, many=True).data)
+
+    name = request.data.get('name')
+    if not isinstance(name, str) or not name.strip() or len(name) > 100:
+        return Response({'error': 'name must be a non-empty string of at most 100 characters'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if GraphSnapshot.objects.filter(topic=topic, name=name).exists():
+        return Response({'error': f'a snapshot named {name!r} already exists'}, status=status.HTTP_400_BAD_REQUEST)
+    snapshot = take_snapshot(topic, request.user, name)
+    return Response(GraphSnapshotSerializer(snapshot).data, status=status.HTTP_201_CREATED)
+
+
+def get_snapshot(topic_id, snapshot_id):
+    snapshot = GraphSnapshot.objects.filter(topic_id=topic_id, id=snapshot_id).first()
+    if snapshot is None:
+        return None, Response({"error": "Snapshot not found"}, status=status.HTTP_404_NOT_FOUND)
+    return snapshot, None
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def topic_snapshot(request, topic_id, snapshot_id):
+    snapshot, error = get_snapshot(topic_id, snapshot_id)
+    if error:
+        return error
+    if request.method == 'DELETE':
+        snapshot.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(GraphSnapshotSerializer(snapshot).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def topic_snapshot_restore(request, topic_id, snapshot_id):
+    snapshot, error = get_snapshot(topic_id, snapshot_id)
+    if error:
+        return error
+    return Response(restore_snapshot(snapshot, request.user))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def topic_snapshot_diff(request, topic_id):
+    """Changes from snapshot ``from`` to snapshot ``to``, or to the live graph without ``to``."""
+    if get_graph_version(topic_id) is None:
+        return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        ids = [int_param(request, 'from'), int_param(request, 'to', None)]
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    columns = []
+    for snapshot_id in ids:
+        if snapshot_id is None:
+            columns.append(live_columns(topic_id))
+            continue
+        snapshot, error = get_snapshot(topic_id, snapshot_id)
+        if error:
+            return error
+        columns.append(snapshot_columns(snapshot))
+    return Response({'from': ids[0], 'to': ids[1], **diff_graphs(*columns)})
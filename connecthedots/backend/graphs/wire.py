@@ -0,0 +1,171 @@
+"""
+Compact columnar encoding of a topic graph, an opt-in alternative to JSON.
+
+Layout, little-endian, every column aligned to its item size::
+
+    header      magic b'CTDG', format version (u16), id width in bytes (u16),
+                topic (u32), node count (u32), connection count (u32),
+                string count (u32), graph version (u64)
+    int64       node creation_date, connection creationDate (ms since epoch)
+    ids         node id, node created_by_user, connection id,
+                connection firstNodeID/secondNodeID as interleaved pairs,
+                connection createdBy (int32, or int64 for very large ids)
+    float32     node position_x, node position_y
+    int32       node manual_name, qid, description and connection
+                relationName as string table indexes, -1 for null
+    uint32      string byte lengths
+    uint8       connection relationDirection (index into DIRECTIONS)
+    bytes       UTF-8 strings, back to back
+
+Format version 2, used for stored snapshots, keeps positions exact: they
+are float64 and come right after the int64 columns.
+"""
+import struct
+from datetime import datetime
+import numpy as np
+from django.core.cache import cache
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from connections.models import Connection
+
+MAGIC = b'CTDG'
+FORMAT_VERSION = 1
+PRECISE_FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHIIIIQ')
+DIRECTIONS = [choice for choice, _ in Connection.DIRECTION_CHOICES]
+WIRE_CACHE_TIMEOUT = 60 * 10
+
+
+class StringTable:
+    def __init__(self):
+        self.index = {}
+
+    def add(self, value):
+        if value is None:
+            return -1
+        return self.index.setdefault(value, len(self.index))
+
+    def encode(self):
+        encoded = [value.encode() for value in self.index]
+        return np.array([len(value) for value in encoded], dtype='<u4'), b''.join(encoded)
+
+
+def _millis(value):
+    if value is None:
+        return 0
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def encode_graph(snapshot, precise=False):
+    """Encode a ``build_graph_snapshot`` dict into the columnar layout above, version 2 if ``precise``."""
+    nodes = snapshot['nodes']
+    connections = snapshot['connections']
+    strings = StringTable()
+
+    ids = [node['id'] for node in nodes] + [connection['id'] for connection in connections]
+    id_bytes = 4 if max(ids, default=0) < 2 ** 31 else 8
+    id_type = f'<i{id_bytes}'
+
+    node_dates = np.array([_millis(node['creation_date']) for node in nodes], dtype='<i8')
+    connection_dates = np.array([_millis(c['creationDate']) for c in connections], dtype='<i8')
+    node_ids = np.array([node['id'] for node in nodes], dtype=id_type)
+    node_users = np.array([node['created_by_user'] for node in nodes], dtype=id_type)
+    connection_ids = np.array([c['id'] for c in connections], dtype=id_type)
+    endpoints = np.array([(c['firstNodeID'], c['secondNodeID']) for c in connections], dtype=id_type)
+    connection_users = np.array([c['createdBy'] for c in connections], dtype=id_type)
+    position_type = '<f8' if precise else '<f4'
+    xs = np.array([node['position_x'] for node in nodes], dtype=position_type)
+    ys = np.array([node['position_y'] for node in nodes], dtype=position_type)
+    text = np.array(
+        [strings.add(node['manual_name']) for node in nodes]
+        + [strings.add(node['qid']) for node in nodes]
+        + [strings.add(node['description']) for node in nodes]
+        + [strings.add(c['relationName']) for c in connections],
+        dtype='<i4'
+    )
+    directions = np.array([DIRECTIONS.index(c['relationDirection']) for c in connections], dtype='u1')
+    lengths, blob = strings.encode()
+
+    parts = [HEADER.pack(MAGIC, PRECISE_FORMAT_VERSION if precise else FORMAT_VERSION, id_bytes,
+                         snapshot['topic'], len(nodes), len(connections), len(lengths), snapshot['version'])]
+    if precise:
+        columns = (node_dates, connection_dates, xs, ys, node_ids, node_users, connection_ids, endpoints,
+                   connection_users, text, lengths, directions)
+    else:
+        # the header and int64 columns keep everything after them 4-byte aligned
+        columns = (node_dates, connection_dates, node_ids, node_users, connection_ids, endpoints,
+                   connection_users, xs, ys, text, lengths, directions)
+    for column in columns:
+        parts.append(column.tobytes())
+    parts.append(blob)
+    return b''.join(parts)
+
+
+def decode_graph(payload):
+    """
+    Decode a payload into column arrays.
+
+    This is the reference for client decoders: every numeric column is a
+    zero-copy view on ``payload``. Returns a dict of NumPy arrays plus the
+    decoded string list.
+    """
+    magic, version, id_bytes, topic, node_count, connection_count, string_count, graph_version = \
+        HEADER.unpack_from(payload)
+    if magic != MAGIC or version not in (FORMAT_VERSION, PRECISE_FORMAT_VERSION):
+        raise ValueError('not a graph payload of a supported version')
+    offset = HEADER.size
+
+    def take(dtype, count):
+        nonlocal offset
+        column = np.frombuffer(payload, dtype=dtype, count=count, offset=offset)
+        offset += column.nbytes
+        return column
+
+    id_type = f'<i{id_bytes}'
+    result = {'topic': topic, 'version': graph_version}
+    result['node_creation_date'] = take('<i8', node_count)
+    result['connection_creation_date'] = take('<i8', connection_count)
+    if version == PRECISE_FORMAT_VERSION:
+        result['position_x'] = take('<f8', node_count)
+        result['position_y'] = take('<f8', node_count)
+    result['node_id'] = take(id_type, node_count)
+    result['node_created_by_user'] = take(id_type, node_count)
+    result['connection_id'] = take(id_type, connection_count)
+    result['connection_endpoints'] = take(id_type, connection_count * 2).reshape(-1, 2)
+    result['connection_created_by'] = take(id_type, connection_count)
+    if version == FORMAT_VERSION:
+        result['position_x'] = take('<f4', node_count)
+        result['position_y'] = take('<f4', node_count)
+    result['manual_name'] = take('<i4', node_count)
+    result['qid'] = take('<i4', node_count)
+    result['description'] = take('<i4', node_count)
+    result['relation_name'] = take('<i4', connection_count)
+    lengths = take('<u4', string_count)
+    result['relation_direction'] = take('u1', connection_count)
+    strings = []
+    for length in lengths.tolist():
+        strings.append(payload[offset:offset + length].decode())
+        offset += length
+    result['strings'] = strings
+    return result
+
+
+class GraphBinaryRenderer(BaseRenderer):
+    """Renders graph snapshots in the columnar layout, anything else (errors) as JSON."""
+    media_type = 'application/vnd.connecthedots.graph'
+    format = 'graphbin'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'nodes' not in data:
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data)
+        # snapshots are immutable per version, so is their encoding
+        cache_key = f'graph-binary:{data["topic"]}:{data["version"]}'
+        payload = cache.get(cache_key)
+        if payload is None:
+            payload = encode_graph(data)
+            cache.set(cache_key, payload, WIRE_CACHE_TIMEOUT)
+        return payload
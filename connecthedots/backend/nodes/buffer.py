@@ -0,0 +1,127 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from django.db import close_old_connections
+from .utils import apply_positions
+
+logger = logging.getLogger(__name__)
+
+
+class PositionBuffer:
+    """
+    Write-behind buffer for node positions.
+
+    Updates are coalesced per node so only the last position seen within a
+    flush interval is written, with one bulk update per topic. The topic the
+    update was scoped to travels with the position: the same node sent with
+    and without a topic is still one entry, and the newest one wins.
+    """
+
+    def __init__(self, interval=0.3, writer=apply_positions, autostart=True):
+        self.interval = interval
+        self.writer = writer
+        self.autostart = autostart
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.received = 0
+        self.rows_written = 0
+        self.flushes = 0
+        self.failures = 0
+
+    def add(self, positions, topic_id=None):
+        """Queue ``{node_id: (x, y)}``; returns the number of queued updates."""
+        with self._lock:
+            for node_id, position in positions.items():
+                self._pending[node_id] = (topic_id, position)
+            self.received += len(positions)
+        if self.autostart:
+            self._ensure_thread()
+        return len(positions)
+
+    def flush(self):
+        """Write everything pending now; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            by_topic = defaultdict(dict)
+            for node_id, (topic_id, position) in batch.items():
+                by_topic[topic_id][node_id] = position
+
+            written = 0
+            for topic_id, positions in by_topic.items():
+                try:
+                    results = self.writer(positions, topic_id)
+                except Exception:
+                    logger.exception('Flushing %d positions for topic %s failed', len(positions), topic_id)
+                    self.failures += 1
+                    with self._lock:
+                        # keep the failed values unless a newer one arrived meanwhile
+                        for node_id, position in positions.items():
+                            self._pending.setdefault(node_id, (topic_id, position))
+                    continue
+                written += sum(1 for result in results.values() if result == 'updated')
+
+            self.rows_written += written
+            self.flushes += 1
+            return written
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'rows_written': self.rows_written,
+            'pending': self.pending(),
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'flush_interval': self.interval,
+        }
+
+    def stop(self):
+        """Stop the background thread and write what is left (worker shutdown)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2 + 1)
+            self._thread = None
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='position-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_position_buffer():
+    """Process-wide buffer, flushed when the worker exits."""
+    global _buffer
+    if _buffer is None:
+        from django.conf import settings
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = PositionBuffer(interval=settings.POSITION_FLUSH_INTERVAL)
+                atexit.register(_buffer.stop)
+    return _buffer
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nodes", "0002_node_position_x_node_position_y"),
+        ("topics", "0003_topic_graphversion"),
+        ("wikis", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="node",
+            index=models.Index(
+                fields=["topic", "position_x", "position_y"],
+                name="nodes_topic_i_bdd15c_idx",
+            ),
+        ),
+    ]
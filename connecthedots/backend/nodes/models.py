@@ -30,6 +30,8 @@ class Node(models.Model):
         indexes = [
             models.Index(fields=['created_by_user']),
             models.Index(fields=['qid']),
+            # viewport queries: topic equality, then a range on x with y checked in the index
+            models.Index(fields=['topic', 'position_x', 'position_y']),
         ]
 
     def __str__(self):
@@ -1,8 +1,13 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
 from topics.models import Topic
 from wikis.models import Wiki
+from connections.models import Connection
 from .models import Node
+from .buffer import PositionBuffer
 
 User = get_user_model()
 
@@ -49,3 +54,178 @@ class NodeModelTest(TestCase):
     def test_node_creation_date(self):
         self.assertIsNotNone(self.node.creation_date)
 
+
+class UpdatePositionsTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Test Topic', createdBy=self.user)
+        self.other_topic = Topic.objects.create(topicName='Other Topic', createdBy=self.user)
+        self.nodes = [
+            Node.objects.create(manual_name=f'Node {i}', topic=self.topic, created_by_user=self.user)
+            for i in range(3)
+        ]
+        self.foreign = Node.objects.create(manual_name='Foreign', topic=self.other_topic, created_by_user=self.user)
+        self.url = '/api/nodes/update_positions/'
+
+    def test_bulk_update_reports_per_id_results(self):
+        payload = {
+            'topic_id': self.topic.id,
+            'positions': [
+                {'id': str(self.nodes[0].id), 'position_x': 10, 'position_y': 20},
+                {'id': self.nodes[1].id, 'position_x': 0, 'position_y': 0},
+                {'id': self.nodes[2].id, 'position_x': 'abc', 'position_y': 1},
+                {'id': self.foreign.id, 'position_x': 5, 'position_y': 5},
+                {'id': 99999, 'position_x': 1, 'position_y': 1},
+            ]
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = {r['id']: r['status'] for r in response.data['results']}
+        self.assertEqual(results, {
+            self.nodes[0].id: 'updated',
+            self.nodes[1].id: 'unchanged',
+            self.nodes[2].id: 'invalid',
+            self.foreign.id: 'not_found',
+            99999: 'not_found',
+        })
+        self.assertEqual(response.data['updated'], 1)
+        self.nodes[0].refresh_from_db()
+        self.assertEqual((self.nodes[0].position_x, self.nodes[0].position_y), (10, 20))
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.position_x, 0)
+
+    def test_query_count_does_not_grow_with_payload(self):
+        positions = [
+            {'id': node.id, 'position_x': i + 1, 'position_y': i + 1}
+            for i, node in enumerate(self.nodes)
+        ]
+        # select and bulk update, one change log append and one tile pyramid lookup for the whole batch
+        with self.assertNumQueries(10):
+            self.client.post(self.url, {'topic_id': self.topic.id, 'positions': positions}, format='json')
+
+    def test_positions_must_be_a_list(self):
+        response = self.client.post(self.url, {'positions': 'nope'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class PositionBufferTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.topic = Topic.objects.create(topicName='Test Topic', createdBy=self.user)
+        self.node = Node.objects.create(manual_name='Node', topic=self.topic, created_by_user=self.user)
+        self.buffer = PositionBuffer(interval=60, autostart=False)
+
+    def test_updates_are_coalesced(self):
+        for step in range(5):
+            self.buffer.add({self.node.id: (step, step * 2)}, self.topic.id)
+        self.assertEqual(self.buffer.pending(), 1)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.node.refresh_from_db()
+        self.assertEqual((self.node.position_x, self.node.position_y), (4, 8))
+        stats = self.buffer.stats()
+        self.assertEqual(stats['received'], 5)
+        self.assertEqual(stats['rows_written'], 1)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_newest_update_wins_with_or_without_topic(self):
+        self.buffer.add({self.node.id: (1, 1)}, self.topic.id)
+        self.buffer.add({self.node.id: (2, 2)})
+        self.assertEqual(self.buffer.pending(), 1)
+        self.buffer.flush()
+        self.node.refresh_from_db()
+        self.assertEqual((self.node.position_x, self.node.position_y), (2, 2))
+
+    def test_stop_flushes_pending_updates(self):
+        self.buffer.add({self.node.id: (7, 7)}, self.topic.id)
+        self.buffer.stop()
+        self.node.refresh_from_db()
+        self.assertEqual(self.node.position_x, 7)
+
+    @override_settings(POSITION_WRITE_BEHIND=True)
+    def test_view_queues_in_write_behind_mode(self):
+        self.client.force_authenticate(user=self.user)
+        with patch('nodes.views.get_position_buffer', return_value=self.buffer):
+            response = self.client.post(
+                '/api/nodes/update_positions/',
+                {'positions': [{'id': self.node.id, 'position_x': 3, 'position_y': 4}]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.buffer.pending(), 1)
+        self.node.refresh_from_db()
+        self.assertEqual(self.node.position_x, 0)
+
+
+class ViewportTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Test Topic', createdBy=self.user)
+        # a 10 x 10 grid with 100 units between nodes
+        self.grid = {
+            (i, j): Node.objects.create(manual_name=f'{i},{j}', topic=self.topic, created_by_user=self.user,
+                                        position_x=i * 100, position_y=j * 100)
+            for i in range(10) for j in range(10)
+        }
+        self.edge = Connection.objects.create(
+            firstNodeID=self.grid[(1, 1)], secondNodeID=self.grid[(9, 9)],
+            relationName='far', createdBy=self.user, topic=self.topic
+        )
+        Connection.objects.create(
+            firstNodeID=self.grid[(8, 8)], secondNodeID=self.grid[(9, 9)],
+            relationName='offscreen', createdBy=self.user, topic=self.topic
+        )
+
+    def test_bbox_returns_nodes_inside_and_touching_edges(self):
+        response = self.client.get('/api/nodes/', {'topic_id': self.topic.id, 'bbox': '250,250,50,50'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['bbox'], [50, 50, 250, 250])
+        self.assertEqual(len(response.data['nodes']), 4)
+        self.assertEqual([c['id'] for c in response.data['connections']], [self.edge.id])
+        self.assertEqual([n['id'] for n in response.data['outside_nodes']], [self.grid[(9, 9)].id])
+
+    def test_query_count_does_not_depend_on_topic_size(self):
+        with self.assertNumQueries(3):
+            self.client.get('/api/nodes/', {'topic_id': self.topic.id, 'bbox': '0,0,150,150'})
+
+    def test_invalid_bbox(self):
+        for bbox in ('1,2,3', 'a,b,c,d', 'nan,0,1,1'):
+            response = self.client.get('/api/nodes/', {'topic_id': self.topic.id, 'bbox': bbox})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/nodes/', {'bbox': '0,0,1,1'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FastListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topic = Topic.objects.create(topicName='Test Topic', createdBy=self.user)
+        Wiki.objects.create(qID='Q42', label='Douglas Adams', description='writer')
+        Node.objects.create(manual_name='Ünïcode "name"', topic=self.topic, created_by_user=self.user,
+                            qid_id='Q42', position_x=0.1, position_y=-1e-7)
+        Node.objects.create(topic=self.topic, created_by_user=self.user, position_x=1e20, position_y=3)
+
+    def test_output_matches_serializer(self):
+        for params in ({'topic_id': self.topic.id}, {}):
+            fast = self.client.get('/api/nodes/', params)
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                slow = self.client.get('/api/nodes/', params)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, slow.content)
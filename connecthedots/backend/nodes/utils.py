@@ -0,0 +1,147 @@
+import math
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Q
+from connections.models import Connection
+from graphs.models import GraphChange
+from graphs.utils import record_graph_changes
+from graphs.tiles import apply_tile_moves
+from .models import Node
+
+POSITION_FIELDS = ['position_x', 'position_y']
+BULK_BATCH_SIZE = 500
+MAX_VIEWPORT_NODES = 5000
+
+
+def parse_positions(positions):
+    """
+    Validate a list of ``{'id', 'position_x', 'position_y'}`` entries.
+
+    Returns ``(valid, results)`` where ``valid`` maps node id to ``(x, y)``
+    (the last entry wins for repeated ids) and ``results`` maps each entry
+    key to ``'invalid'`` for the entries that could not be parsed.
+    """
+    valid = {}
+    results = {}
+    for pos in positions:
+        if not isinstance(pos, dict):
+            results[str(pos)] = 'invalid'
+            continue
+        try:
+            node_id = int(pos.get('id'))
+        except (TypeError, ValueError):
+            results[str(pos.get('id'))] = 'invalid'
+            continue
+        try:
+            x = float(pos['position_x'])
+            y = float(pos['position_y'])
+        except (TypeError, ValueError, KeyError):
+            x = y = math.nan
+        if not (math.isfinite(x) and math.isfinite(y)):
+            valid.pop(node_id, None)
+            results[node_id] = 'invalid'
+            continue
+        valid[node_id] = (x, y)
+        results[node_id] = None
+    return valid, results
+
+
+def apply_positions(positions, topic_id=None):
+    """
+    Write ``{node_id: (x, y)}`` with one fetch and one bulk update.
+
+    Only rows whose position really changed are written. Returns a dict
+    mapping every requested id to ``'updated'``, ``'unchanged'`` or
+    ``'not_found'``.
+    """
+    results = {node_id: 'not_found' for node_id in positions}
+    if not positions:
+        return results
+
+    nodes = Node.objects.filter(id__in=positions.keys())
+    if topic_id is not None:
+        nodes = nodes.filter(topic_id=topic_id)
+
+    changed = []
+    moves = defaultdict(dict)
+    with transaction.atomic():
+        for node in nodes.only('id', 'topic_id', *POSITION_FIELDS).select_for_update():
+            x, y = positions[node.id]
+            if node.position_x == x and node.position_y == y:
+                results[node.id] = 'unchanged'
+                continue
+            moves[node.topic_id][node.id] = ((node.position_x, node.position_y), (x, y))
+            node.position_x = x
+            node.position_y = y
+            changed.append(node)
+            results[node.id] = 'updated'
+
+        if changed:
+            Node.objects.bulk_update(changed, POSITION_FIELDS, batch_size=BULK_BATCH_SIZE)
+            changes = defaultdict(list)
+            for node in changed:
+                changes[node.topic_id].append((
+                    GraphChange.NODE, GraphChange.UPDATE, node.id,
+                    {'position_x': node.position_x, 'position_y': node.position_y},
+                ))
+            for changed_topic_id, topic_changes in changes.items():
+                version = record_graph_changes(changed_topic_id, topic_changes)
+                if version is not None:
+                    apply_tile_moves(
+                        changed_topic_id, moves[changed_topic_id], version - len(topic_changes), version
+                    )
+    return results
+
+
+def parse_bbox(value):
+    """Parse ``x1,y1,x2,y2`` into ``(min_x, min_y, max_x, max_y)``, raising ValueError."""
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox must be x1,y1,x2,y2')
+    try:
+        x1, y1, x2, y2 = (float(part) for part in parts)
+    except ValueError:
+        raise ValueError('bbox values must be numbers')
+    if not all(math.isfinite(v) for v in (x1, y1, x2, y2)):
+        raise ValueError('bbox values must be finite')
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def load_viewport(topic_id, bbox, limit=MAX_VIEWPORT_NODES):
+    """
+    Nodes of a topic inside ``bbox`` and the connections touching them.
+
+    The range filter runs on the (topic, position_x, position_y) index, so
+    the cost follows what is inside the box rather than the topic size.
+    Returns ``(nodes, truncated, connections, outside)`` where ``outside``
+    holds id and position of connection endpoints beyond the box.
+    """
+    min_x, min_y, max_x, max_y = bbox
+    nodes = list(
+        Node.objects.filter(
+            topic_id=topic_id,
+            position_x__range=(min_x, max_x),
+            position_y__range=(min_y, max_y),
+        ).order_by('id')[:limit + 1]
+    )
+    truncated = len(nodes) > limit
+    nodes = nodes[:limit]
+    node_ids = {node.id for node in nodes}
+    if not node_ids:
+        return nodes, truncated, [], []
+
+    connections = list(
+        Connection.objects.filter(topic_id=topic_id)
+        .filter(Q(firstNodeID_id__in=node_ids) | Q(secondNodeID_id__in=node_ids))
+        .order_by('id')
+    )
+    other_ids = {
+        endpoint
+        for connection in connections
+        for endpoint in (connection.firstNodeID_id, connection.secondNodeID_id)
+        if endpoint not in node_ids
+    }
+    outside = list(
+        Node.objects.filter(id__in=other_ids).order_by('id').values('id', 'position_x', 'position_y')
+    ) if other_ids else []
+    return nodes, truncated, connections, outside
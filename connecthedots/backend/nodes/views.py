@@ -4,22 +4,50 @@ from rest_framework import status
 from .models import Node
 from .serializers import NodeSerializer
 from wikis.models import Wiki
+from wikis.utils import record_wiki_usage
+from wikis.enrichment import enrich_later
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import permission_classes
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from usertopics.utils import record_user_topic_action
 from topics.models import Topic
+from graphs.models import GraphChange
+from graphs.centrality import get_centrality
+from graphs.utils import (record_graph_change, record_graph_changes, record_graph_update, node_delete_changes,
+                          lock_topics)
+from .utils import parse_positions, apply_positions, parse_bbox, load_viewport
+from connections.serializers import ConnectionSerializer
+from .buffer import get_position_buffer
+from django.conf import settings
+from django.db import transaction
+from connecthedots.serialization import FastListMixin, serialize_list
+
+def viewport_data(topic_id, bbox):
+    nodes, truncated, connections, outside = load_viewport(topic_id, bbox)
+    return {
+        'bbox': list(bbox),
+        'truncated': truncated,
+        'nodes': NodeSerializer(nodes, many=True).data,
+        'connections': ConnectionSerializer(connections, many=True).data,
+        'outside_nodes': outside,
+    }
+
 
 @api_view(['GET'])
 def list_nodes(request):
     topic_id = request.query_params.get('topic_id')
+    bbox = request.query_params.get('bbox')
+    if bbox and topic_id:
+        try:
+            return Response(viewport_data(topic_id, parse_bbox(bbox)))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     if topic_id:
         nodes = Node.objects.filter(topic_id=topic_id)
     else:
         nodes = Node.objects.all()
-    serializer = NodeSerializer(nodes, many=True)
-    return Response(serializer.data)
+    return Response(serialize_list(nodes, NodeSerializer))
 
 
 @api_view(['POST'])
@@ -30,6 +58,8 @@ def create_node(request):
     qid = data.get('qid')
     if qid:
         wiki, _ = Wiki.objects.get_or_create(qID=qid, defaults={"label": "", "description": ""})
+        if not wiki.label:
+            enrich_later([qid])
         data['qid'] = wiki.qID  
     else:
         data.pop('qid', None) 
@@ -43,11 +73,16 @@ def create_node(request):
 
     serializer = NodeSerializer(data=data)
     if serializer.is_valid():
-        node = serializer.save(created_by_user=request.user)
+        with transaction.atomic():
+            lock_topics(serializer.validated_data['topic'].id)
+            node = serializer.save(created_by_user=request.user)
+            node_data = NodeSerializer(node).data
+            record_wiki_usage(added=[(node.qid_id, node.topic_id)])
+            record_graph_change(node.topic_id, GraphChange.NODE, GraphChange.INSERT, node.id, node_data)
         # record interaction
         topic = Topic.objects.get(id=topic_id)
         record_user_topic_action(request.user, topic, 'addedNode')
-        return Response(NodeSerializer(node).data, status=201)
+        return Response(node_data, status=201)
     return Response(serializer.errors, status=400)
 
 
@@ -66,13 +101,21 @@ def update_or_delete_node(request, pk):
         qid = data.get('qid')
         if qid:
             wiki, _ = Wiki.objects.get_or_create(qID=qid, defaults={"label": "", "description": ""})
+            if not wiki.label:
+                enrich_later([qid])
             data['qid'] = wiki.qID
         else:
             data.pop('qid', None)
             
+        old_topic_id = node.topic_id
+        old_usage = (node.qid_id, node.topic_id)
         serializer = NodeSerializer(node, data=data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                lock_topics(old_topic_id, serializer.validated_data['topic'].id)
+                serializer.save()
+                record_wiki_usage(added=[(node.qid_id, node.topic_id)], removed=[old_usage])
+                record_graph_update(GraphChange.NODE, node.id, serializer.data, old_topic_id, node.topic_id)
             # record interaction 
             record_user_topic_action(request.user, node.topic, 'addedNode')
             return Response(serializer.data)
@@ -81,10 +124,15 @@ def update_or_delete_node(request, pk):
     elif request.method == 'DELETE':
         # record interaction
         record_user_topic_action(request.user, node.topic, 'addedNode')
-        node.delete()
+        with transaction.atomic():
+            lock_topics(node.topic_id)
+            changes = node_delete_changes(node)
+            node.delete()
+            record_wiki_usage(removed=[(node.qid_id, node.topic_id)])
+            record_graph_changes(node.topic_id, changes)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class NodeViewSet(viewsets.ModelViewSet):
+class NodeViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Node.objects.all()
     serializer_class = NodeSerializer
     permission_classes = [IsAuthenticated]
@@ -96,12 +144,48 @@ class NodeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(topic_id=topic_id)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        bbox = request.query_params.get('bbox')
+        include = request.query_params.get('include', '').split(',')
+        if not bbox and 'centrality' not in include:
+            return super().list(request, *args, **kwargs)
+
+        topic_id = request.query_params.get('topic_id')
+        try:
+            topic_id = int(topic_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'topic_id is required for bbox and centrality'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        centrality = None
+        if 'centrality' in include:
+            centrality = get_centrality(topic_id)
+            if centrality is None:
+                return Response({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if bbox:
+            try:
+                data = viewport_data(topic_id, parse_bbox(bbox))
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            nodes = data['nodes']
+        else:
+            data = nodes = serialize_list(self.get_queryset(), NodeSerializer)
+        if centrality is not None:
+            empty = {'pagerank': None, 'degree': None, 'betweenness': None}
+            for node in nodes:
+                node.update(centrality.get(node['id'], empty))
+        return Response(data)
+
     def create(self, request, *args, **kwargs):
         data = request.data.copy()
         
         qid = data.get('qid')
         if qid:
             wiki, _ = Wiki.objects.get_or_create(qID=qid, defaults={"label": "", "description": ""})
+            if not wiki.label:
+                enrich_later([qid])
             data['qid'] = wiki.qID
         else:
             data.pop('qid', None)
@@ -112,7 +196,11 @@ class NodeViewSet(viewsets.ModelViewSet):
 
         serializer = self.get_serializer(data=data)
         if serializer.is_valid():
-            node = serializer.save(created_by_user=request.user)
+            with transaction.atomic():
+                lock_topics(serializer.validated_data['topic'].id)
+                node = serializer.save(created_by_user=request.user)
+                record_graph_change(node.topic_id, GraphChange.NODE, GraphChange.INSERT, node.id, serializer.data)
+                record_wiki_usage(added=[(node.qid_id, node.topic_id)])
             # record  interaction
             topic_obj = Topic.objects.get(id=topic)
             record_user_topic_action(request.user, topic_obj, 'addedNode')
@@ -126,13 +214,21 @@ class NodeViewSet(viewsets.ModelViewSet):
         qid = data.get('qid')
         if qid:
             wiki, _ = Wiki.objects.get_or_create(qID=qid, defaults={"label": "", "description": ""})
+            if not wiki.label:
+                enrich_later([qid])
             data['qid'] = wiki.qID
         else:
             data.pop('qid', None)
 
+        old_topic_id = instance.topic_id
+        old_usage = (instance.qid_id, instance.topic_id)
         serializer = self.get_serializer(instance, data=data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                lock_topics(old_topic_id, getattr(serializer.validated_data.get('topic'), 'id', None))
+                serializer.save()
+                record_wiki_usage(added=[(instance.qid_id, instance.topic_id)], removed=[old_usage])
+                record_graph_update(GraphChange.NODE, instance.id, serializer.data, old_topic_id, instance.topic_id)
             # record  interaction 
             record_user_topic_action(request.user, instance.topic, 'addedNode')
             return Response(serializer.data)
@@ -142,21 +238,45 @@ class NodeViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         # record  interaction 
         record_user_topic_action(request.user, instance.topic, 'addedNode')
-        self.perform_destroy(instance)
+        with transaction.atomic():
+            lock_topics(instance.topic_id)
+            changes = node_delete_changes(instance)
+            self.perform_destroy(instance)
+            record_wiki_usage(removed=[(instance.qid_id, instance.topic_id)])
+            record_graph_changes(instance.topic_id, changes)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['post'])
     def update_positions(self, request):
+        positions = request.data.get('positions', [])
+        if not isinstance(positions, list):
+            return Response({'error': 'positions must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        topic_id = request.data.get('topic_id')
         try:
-            positions = request.data.get('positions', [])
-            for pos in positions:
-                node = Node.objects.get(id=pos['id'])
-                node.position_x = pos['position_x']
-                node.position_y = pos['position_y']
-                node.save()
-            return Response({'status': 'positions updated'}, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            topic_id = int(topic_id) if topic_id else None
+        except (TypeError, ValueError):
+            return Response({'error': 'topic_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        valid, results = parse_positions(positions)
+        if settings.POSITION_WRITE_BEHIND:
+            queued = get_position_buffer().add(valid, topic_id)
+            return Response({
+                'status': 'positions queued',
+                'queued': queued,
+                'results': [
+                    {'id': node_id, 'status': result or 'queued'} for node_id, result in results.items()
+                ],
+            }, status=status.HTTP_202_ACCEPTED)
+
+        results.update(apply_positions(valid, topic_id))
+        updated = sum(1 for result in results.values() if result == 'updated')
+        return Response({
+            'status': 'positions updated',
+            'updated': updated,
+            'results': [{'id': node_id, 'status': result} for node_id, result in results.items()],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def position_stats(self, request):
+        return Response(get_position_buffer().stats())
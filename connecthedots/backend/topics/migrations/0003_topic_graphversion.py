@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("topics", "0002_topic_description"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topic",
+            name="graphVersion",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
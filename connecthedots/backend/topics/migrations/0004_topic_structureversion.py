@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("topics", "0003_topic_graphversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="topic",
+            name="structureVersion",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -11,6 +11,11 @@ class Topic(models.Model):
     )
     creationDate = models.DateTimeField(auto_now_add=True)
     interactionCount = models.IntegerField(default=0)
+    # increased on every node or connection write, used for graph ETags
+    graphVersion = models.PositiveBigIntegerField(default=0)
+    # graphVersion of the last write that added, removed or rewired nodes or connections;
+    # moves and renames leave it alone, so structural caches survive them
+    structureVersion = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return self.topicName
@@ -1,5 +1,7 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
 from .models import Topic
 
 User = get_user_model()
@@ -30,3 +32,23 @@ class TopicModelTest(TestCase):
     def test_topic_creation_date(self):
         self.assertIsNotNone(self.topic.creationDate)
 
+
+
+class TopicListTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        Topic.objects.create(topicName='Test Topic', description='This is a test topic', createdBy=self.user)
+        Topic.objects.create(topicName='Other', createdBy=self.user, interactionCount=3)
+
+    def test_output_matches_serializer(self):
+        for url in ('/api/topics/', '/api/topics/?search=test'):
+            fast = self.client.get(url)
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                slow = self.client.get(url)
+            self.assertEqual(fast.status_code, status.HTTP_200_OK)
+            self.assertEqual(fast.content, slow.content)
@@ -6,8 +6,9 @@ from .serializers import TopicSerializer
 from django.shortcuts import get_object_or_404
 from usertopics.models import UserTopics
 from usertopics.utils import record_user_topic_action
+from connecthedots.serialization import FastListMixin
 
-class TopicViewSet(viewsets.ModelViewSet):
+class TopicViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = Topic.objects.all()
     serializer_class = TopicSerializer
     permission_classes = [permissions.IsAuthenticated]
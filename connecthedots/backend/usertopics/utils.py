@@ -1,5 +1,7 @@
 from usertopics.models import UserTopics
+from django.db.models import F
 from django.utils import timezone
+from topics.models import Topic
 
 def record_user_topic_action(user, topic, action_type):
     obj, created = UserTopics.objects.get_or_create(user=user, topic=topic)
@@ -15,7 +17,8 @@ def record_user_topic_action(user, topic, action_type):
         updated = True
     
     if updated:
+        # only the counter: a full save would write back a stale graphVersion
+        Topic.objects.filter(id=topic.id).update(interactionCount=F('interactionCount') + 1)
         topic.interactionCount += 1
-        topic.save()
     obj.actionDate = timezone.now()
     obj.save()
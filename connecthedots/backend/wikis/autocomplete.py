@@ -0,0 +1,174 @@
+"""
+Autocomplete over the Wikidata items already stored in the ``wikis`` table.
+
+Each worker keeps an in-memory index of the most used labelled items. Once
+it is older than ``settings.AUTOCOMPLETE_INDEX_TTL`` a background thread
+builds a new one and swaps it in; requests keep using the old index
+meanwhile. Labels are matched by prefix, of the
+whole label or of any word in it, through a sorted key list, and by trigram
+similarity for misspellings. Matches rank by how well they match, then by
+how many nodes use the item across all topics.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+from .models import Wiki, WikiTopic
+from .search import normalize_query
+
+logger = logging.getLogger(__name__)
+
+EXACT, PREFIX, WORD_PREFIX, FUZZY = range(4)
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LabelIndex:
+    def __init__(self, rows):
+        """``rows`` are ``(qID, label, description, node count)`` tuples."""
+        self.items = []
+        self.gram_counts = []
+        self.postings = {}
+        keys = []
+        for qid, label, description, usage in rows:
+            name = normalize_query(label)
+            if not name:
+                continue
+            item_id = len(self.items)
+            self.items.append((qid, label, description, usage, name))
+            # one key per word start, so "adams" finds "douglas adams"
+            start = 0
+            for word in name.split(' '):
+                keys.append((name[start:], item_id))
+                start += len(word) + 1
+            grams = trigrams(name)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(item_id)
+        keys.sort()
+        self.keys = [key for key, _ in keys]
+        self.key_items = [item_id for _, item_id in keys]
+
+    def prefix_matches(self, query):
+        matches = {}
+        position = bisect.bisect_left(self.keys, query)
+        while position < len(self.keys) and self.keys[position].startswith(query):
+            item_id = self.key_items[position]
+            name = self.items[item_id][4]
+            if name == query:
+                tier = EXACT
+            elif self.keys[position] == name:
+                tier = PREFIX
+            else:
+                tier = WORD_PREFIX
+            matches[item_id] = min(tier, matches.get(item_id, tier))
+            position += 1
+        return matches
+
+    def fuzzy_matches(self, query):
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        matches = {}
+        for item_id, count in shared.items():
+            similarity = count / (len(grams) + self.gram_counts[item_id] - count)
+            if similarity >= MIN_SIMILARITY:
+                matches[item_id] = similarity
+        return matches
+
+    def search(self, query, limit):
+        query = normalize_query(query)
+        if not query:
+            return []
+        ranked = [(tier, 0, item_id) for item_id, tier in self.prefix_matches(query).items()]
+        if len(ranked) < limit:
+            found = {item_id for _, _, item_id in ranked}
+            ranked += [
+                (FUZZY, -similarity, item_id)
+                for item_id, similarity in self.fuzzy_matches(query).items() if item_id not in found
+            ]
+        # by match quality, then usage; fuzzy matches by similarity before usage
+        ranked.sort(key=lambda row: (row[0], row[1], -self.items[row[2]][3], self.items[row[2]][4]))
+        return [
+            {'qID': qid, 'label': label, 'description': description}
+            for qid, label, description, _, _ in (self.items[item_id] for _, _, item_id in ranked[:limit])
+        ]
+
+
+def load_index_rows(size):
+    """The ``size`` most used labelled items, topped up with unused ones when there are fewer."""
+    rows = list(
+        WikiTopic.objects.exclude(wiki__label='')
+        .values('wiki_id')
+        .annotate(usage=Sum('nodeCount'))
+        .order_by('-usage', 'wiki_id')
+        .values_list('wiki_id', 'wiki__label', 'wiki__description', 'usage')[:size]
+    )
+    if len(rows) < size:
+        rows += [
+            (qid, label, description, 0)
+            for qid, label, description in Wiki.objects.exclude(label='').filter(topicCounts__isnull=True)
+            .order_by('qID').values_list('qID', 'label', 'description')[:size - len(rows)]
+        ]
+    return rows
+
+
+_index = None
+_index_built = 0
+_index_lock = threading.Lock()
+_rebuilding = False
+
+
+def refresh_label_index():
+    """Build a new index and swap it in; readers see either the old one or the new one."""
+    global _index, _index_built
+    index = LabelIndex(load_index_rows(settings.AUTOCOMPLETE_INDEX_SIZE))
+    _index, _index_built = index, time.monotonic()
+    return index
+
+
+def _rebuild():
+    global _rebuilding
+    try:
+        refresh_label_index()
+    except Exception:
+        logger.exception('Rebuilding the autocomplete index failed')
+    finally:
+        _rebuilding = False
+        close_old_connections()
+
+
+def get_label_index():
+    """The process-wide index; an expired one is still served while its successor is built."""
+    global _rebuilding
+    index = _index
+    if index is None:
+        # nothing to serve yet: one caller builds, the others wait for it
+        with _index_lock:
+            return _index or refresh_label_index()
+    if time.monotonic() - _index_built >= settings.AUTOCOMPLETE_INDEX_TTL:
+        with _index_lock:
+            start, _rebuilding = not _rebuilding, True
+        if start:
+            threading.Thread(target=_rebuild, name='label-index', daemon=True).start()
+    return index
+
+
+def reset_label_index():
+    global _index, _rebuilding
+    with _index_lock:
+        _index = None
+        _rebuilding = False
+
+
+def autocomplete(query, limit=10):
+    return get_label_index().search(query, limit)
@@ -0,0 +1,154 @@
+"""
+Loading ``wikis`` from a Wikidata JSON dump, without a live endpoint.
+
+A dump (``latest-all.json.gz`` or ``.bz2``) is one JSON array with one
+entity per line. Lines are read in chunks and parsed by a pool of worker
+processes; only items are kept, with the label and description of the first
+configured language that has one. Rows are upserted in large batches, and
+after each batch the decompressed byte offset just past its last line is
+saved to a checkpoint file so an interrupted run continues from there. Only
+a few chunks are in flight at a time, so memory stays flat whatever the size
+of the dump.
+"""
+import bz2
+import gzip
+import json
+import multiprocessing
+import os
+from collections import deque
+from .models import Wiki
+
+CHUNK_LINES = 1000
+WRITE_BATCH_SIZE = 1000
+LABEL_LENGTH = Wiki._meta.get_field('label').max_length
+
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_chunks(dump, offset=0, chunk_lines=CHUNK_LINES):
+    """
+    Yield ``(lines, end offset)`` from ``offset`` on.
+
+    Offsets count decompressed bytes. Compressed streams cannot seek, so
+    resuming decompresses up to the offset again, but nothing before it is
+    parsed or written.
+    """
+    if offset:
+        dump.seek(offset)
+    lines = []
+    for line in dump:
+        offset += len(line)
+        lines.append(line)
+        if len(lines) == chunk_lines:
+            yield b''.join(lines), offset
+            lines = []
+    if lines:
+        yield b''.join(lines), offset
+
+
+def _first_value(values, languages):
+    for language in languages:
+        if language in values:
+            return values[language]['value']
+    return ''
+
+
+def parse_chunk(data, languages):
+    """``(qID, label, description)`` of the items in a chunk of dump lines that have a label."""
+    rows = []
+    for line in data.split(b'\n'):
+        line = line.strip().rstrip(b',')
+        if not line or line in (b'[', b']'):
+            continue
+        entity = json.loads(line)
+        if entity.get('type') != 'item':
+            continue
+        label = _first_value(entity.get('labels', {}), languages)
+        if label:
+            rows.append((entity['id'], label[:LABEL_LENGTH],
+                         _first_value(entity.get('descriptions', {}), languages)))
+    return rows
+
+
+def parse_in_order(chunks, languages, workers):
+    """Parsed chunks in dump order, with at most two per worker parsed ahead."""
+    if workers <= 1:
+        for data, end in chunks:
+            yield parse_chunk(data, languages), end
+        return
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for data, end in chunks:
+            pending.append((pool.apply_async(parse_chunk, (data, languages)), end))
+            if len(pending) >= workers * 2:
+                result, end = pending.popleft()
+                yield result.get(), end
+        while pending:
+            result, end = pending.popleft()
+            yield result.get(), end
+
+
+def upsert_wikis(rows):
+    Wiki.objects.bulk_create(
+        [Wiki(qID=qid, label=label, description=description) for qid, label, description in rows],
+        update_conflicts=True,
+        unique_fields=['qID'],
+        update_fields=['label', 'description'],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    # written aside and renamed, a crash never leaves half a checkpoint behind
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def ingest_dump(path, languages, checkpoint_path, workers=1, batch_size=50000, progress=None):
+    """
+    Upsert the items of the dump at ``path`` and return the final checkpoint state.
+
+    Picks up from ``checkpoint_path`` when it exists. ``progress`` is called
+    with the checkpoint state after every batch.
+    """
+    dump_path = os.path.abspath(path)
+    state = read_checkpoint(checkpoint_path)
+    if state is None:
+        state = {'dump': dump_path, 'offset': 0, 'entities': 0, 'done': False}
+    elif state['dump'] != dump_path:
+        raise ValueError(f'{checkpoint_path} belongs to {state["dump"]}')
+    if state['done']:
+        return state
+
+    batch = []
+    with open_dump(path) as dump:
+        for rows, end in parse_in_order(read_chunks(dump, state['offset']), languages, workers):
+            batch.extend(rows)
+            state['offset'] = end
+            if len(batch) >= batch_size:
+                upsert_wikis(batch)
+                state['entities'] += len(batch)
+                batch = []
+                write_checkpoint(checkpoint_path, state)
+                if progress is not None:
+                    progress(state)
+    upsert_wikis(batch)
+    state['entities'] += len(batch)
+    state['done'] = True
+    write_checkpoint(checkpoint_path, state)
+    return state
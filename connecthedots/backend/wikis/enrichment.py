@@ -0,0 +1,180 @@
+"""
+Background resolution of placeholder ``Wiki`` rows.
+
+Nodes can point at a Wikidata item before anything is known about it; the
+item is then stored with an empty label. The enricher collects such qIDs
+and resolves them with ``wbgetentities``, up to 50 per call, retrying failed
+calls with exponential backoff. Labels and descriptions are written back
+with one bulk update per batch. qIDs whose calls keep failing stay
+placeholders and are picked up again by the next sweep
+(``manage.py enrich_wikis``).
+"""
+import atexit
+import logging
+import threading
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from .models import Wiki
+from .search import pooled_session
+
+logger = logging.getLogger(__name__)
+
+MAX_IDS_PER_CALL = 50
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class EnrichmentFailed(Exception):
+    pass
+
+
+def fetch_entities(session, url, qids, language, timeout):
+    """``{qid: (label, description)}`` for the given items; unknown items are left out."""
+    response = session.get(url, params={
+        'action': 'wbgetentities',
+        'ids': '|'.join(qids),
+        'props': 'labels|descriptions',
+        'languages': language,
+        'format': 'json',
+    }, timeout=timeout)
+    if response.status_code in RETRY_STATUSES:
+        raise EnrichmentFailed(f'wbgetentities answered {response.status_code}')
+    response.raise_for_status()
+    data = response.json()
+    if 'error' in data:
+        raise ValueError(data['error'].get('info', 'wbgetentities failed'))
+    details = {}
+    for qid, entity in data.get('entities', {}).items():
+        if 'missing' in entity:
+            continue
+        label = entity.get('labels', {}).get(language, {}).get('value', '')
+        description = entity.get('descriptions', {}).get(language, {}).get('value', '')
+        details[qid] = (label, description)
+    return details
+
+
+class WikiEnricher:
+    def __init__(self, url, language='en', timeout=(2.0, 10.0), interval=1.0, retries=3, backoff=1.0,
+                 pool_size=2, autostart=True):
+        self.url = url
+        self.language = language
+        self.timeout = timeout
+        self.interval = interval
+        self.retries = retries
+        self.backoff = backoff
+        self.autostart = autostart
+        self.session = pooled_session(pool_size)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.calls = 0
+        self.resolved = 0
+        self.failures = 0
+
+    def add(self, qids):
+        """Queue qIDs for resolution; already labelled ones are skipped when the batch runs."""
+        with self._lock:
+            for qid in qids:
+                if qid:
+                    self._pending[qid] = None
+        if self.autostart:
+            self._ensure_thread()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Resolve everything queued now; returns the number of rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                queued, self._pending = list(self._pending), {}
+            if not queued:
+                return 0
+            unresolved = list(Wiki.objects.filter(qID__in=queued, label='').values_list('qID', flat=True))
+            updated = 0
+            for start in range(0, len(unresolved), MAX_IDS_PER_CALL):
+                batch = unresolved[start:start + MAX_IDS_PER_CALL]
+                try:
+                    details = self.fetch(batch)
+                except Exception:
+                    logger.exception('Resolving %d Wikidata items failed', len(batch))
+                    self.failures += 1
+                    continue
+                updated += self.write(details)
+            self.resolved += updated
+            return updated
+
+    def fetch(self, qids):
+        for attempt in range(self.retries + 1):
+            self.calls += 1
+            try:
+                return fetch_entities(self.session, self.url, qids, self.language, self.timeout)
+            except (EnrichmentFailed, requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                # stopping the worker cuts the wait short, the retry still runs once
+                self._stop.wait(self.backoff * 2 ** attempt)
+
+    @staticmethod
+    def write(details):
+        rows = Wiki.objects.in_bulk(list(details))
+        for qid, wiki in rows.items():
+            wiki.label, wiki.description = details[qid]
+        Wiki.objects.bulk_update(rows.values(), ['label', 'description'])
+        return len(rows)
+
+    def stop(self):
+        """Stop the background thread; what is still queued is left for the next sweep."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2 + 1)
+            self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='wiki-enricher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            close_old_connections()
+            self.flush()
+        close_old_connections()
+
+
+_enrichers = {}
+_enrichers_lock = threading.Lock()
+
+
+def get_wiki_enricher():
+    """One enricher per process and endpoint, configured from settings."""
+    url = settings.WIKIDATA_API_URL
+    with _enrichers_lock:
+        if url not in _enrichers:
+            _enrichers[url] = WikiEnricher(
+                url,
+                language=settings.WIKIDATA_LANGUAGE,
+                timeout=(settings.WIKIDATA_CONNECT_TIMEOUT, settings.WIKIDATA_ENRICH_READ_TIMEOUT),
+                interval=settings.WIKI_ENRICHMENT_INTERVAL,
+                retries=settings.WIKI_ENRICHMENT_RETRIES,
+                backoff=settings.WIKI_ENRICHMENT_BACKOFF,
+            )
+            atexit.register(_enrichers[url].stop)
+        return _enrichers[url]
+
+
+def enrich_later(qids):
+    """Queue placeholder qIDs once the surrounding transaction commits, when enrichment is on."""
+    if not settings.WIKI_ENRICHMENT:
+        return
+    qids = [qid for qid in qids if qid]
+    if qids:
+        transaction.on_commit(lambda: get_wiki_enricher().add(qids))
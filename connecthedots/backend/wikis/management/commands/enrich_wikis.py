@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wikis.enrichment import WikiEnricher
+from wikis.models import Wiki
+
+CHUNK_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Fill in labels and descriptions of placeholder Wikidata items from wbgetentities"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='resolve at most this many items')
+
+    def handle(self, *args, **options):
+        enricher = WikiEnricher(
+            settings.WIKIDATA_API_URL,
+            language=settings.WIKIDATA_LANGUAGE,
+            timeout=(settings.WIKIDATA_CONNECT_TIMEOUT, settings.WIKIDATA_ENRICH_READ_TIMEOUT),
+            retries=settings.WIKI_ENRICHMENT_RETRIES,
+            backoff=settings.WIKI_ENRICHMENT_BACKOFF,
+            autostart=False,
+        )
+        qids = Wiki.objects.filter(label='').order_by('qID').values_list('qID', flat=True)
+        if options['limit'] is not None:
+            qids = qids[:options['limit']]
+        qids = list(qids)
+        for start in range(0, len(qids), CHUNK_SIZE):
+            enricher.add(qids[start:start + CHUNK_SIZE])
+            enricher.flush()
+        self.stdout.write(self.style.SUCCESS(
+            f'Resolved {enricher.resolved} of {len(qids)} placeholder items '
+            f'in {enricher.calls} calls, {enricher.failures} batches failed'
+        ))
@@ -0,0 +1,49 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wikis.dump import ingest_dump
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class Command(BaseCommand):
+    help = "Load labels and descriptions of Wikidata items from a JSON dump (.json, .json.gz or .json.bz2)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dump', help='path of the dump file')
+        parser.add_argument('--languages', default=settings.WIKIDATA_LANGUAGE,
+                            help='comma separated languages to keep, in order of preference')
+        # the host's CPU count says nothing about the container's memory limit
+        parser.add_argument('--workers', type=int, default=min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1),
+                            help=f'parser processes (default: CPU count, at most {DEFAULT_MAX_WORKERS})')
+        parser.add_argument('--batch-size', type=int, default=50000, help='items per upsert and checkpoint')
+        parser.add_argument('--checkpoint', help='checkpoint file, by default next to the dump')
+        parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+
+    def handle(self, *args, **options):
+        path = options['dump']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        languages = [language.strip() for language in options['languages'].split(',') if language.strip()]
+        if not languages:
+            raise CommandError('--languages must name at least one language')
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        if options['restart'] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        start = time.perf_counter()
+
+        def progress(state):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{state["entities"]} items, {state["offset"]} bytes read, '
+                              f'{state["entities"] / elapsed:.0f} items/s')
+
+        try:
+            state = ingest_dump(path, languages, checkpoint, workers=options['workers'],
+                                batch_size=options['batch_size'], progress=progress)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {state["entities"]} items from {path} in {time.perf_counter() - start:.1f}s'
+        ))
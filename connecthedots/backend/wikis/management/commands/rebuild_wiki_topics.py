@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from wikis.utils import rebuild_wiki_topics
+
+
+class Command(BaseCommand):
+    help = "Recount which topics use each Wikidata item from the nodes table"
+
+    def handle(self, *args, **options):
+        total = rebuild_wiki_topics()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} item/topic counts'))
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_existing_nodes(apps, schema_editor):
+    Node = apps.get_model("nodes", "Node")
+    WikiTopic = apps.get_model("wikis", "WikiTopic")
+    rows = (
+        Node.objects.filter(qid__isnull=False)
+        .values_list("qid_id", "topic_id")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    WikiTopic.objects.bulk_create(
+        (WikiTopic(wiki_id=qid, topic_id=topic_id, nodeCount=count) for qid, topic_id, count in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("nodes", "0003_node_topic_position_index"),
+        ("topics", "0003_topic_graphversion"),
+        ("wikis", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WikiTopic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nodeCount", models.PositiveIntegerField(default=0)),
+                (
+                    "topic",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="wikiCounts",
+                        to="topics.topic",
+                    ),
+                ),
+                (
+                    "wiki",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="topicCounts",
+                        to="wikis.wiki",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "wiki_topics",
+                "indexes": [
+                    models.Index(
+                        fields=["wiki", "-nodeCount"],
+                        name="wiki_topics_wiki_id_dec711_idx",
+                    ),
+                    models.Index(
+                        fields=["topic", "wiki"], name="wiki_topics_topic_i_2a63fe_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("wiki", "topic"), name="unique_wiki_topic"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(count_existing_nodes, migrations.RunPython.noop),
+    ]
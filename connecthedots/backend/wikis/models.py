@@ -14,3 +14,21 @@ class Wiki(models.Model):
         verbose_name = 'Wiki'
         verbose_name_plural = 'Wikis'
         indexes = [models.Index(fields=['qID'])]  
+
+
+class WikiTopic(models.Model):
+    """How many nodes of a topic point at a Wikidata item, kept in step with node writes."""
+    wiki = models.ForeignKey(Wiki, on_delete=models.CASCADE, related_name='topicCounts')
+    topic = models.ForeignKey('topics.Topic', on_delete=models.CASCADE, related_name='wikiCounts')
+    nodeCount = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'wiki_topics'
+        constraints = [
+            models.UniqueConstraint(fields=['wiki', 'topic'], name='unique_wiki_topic'),
+        ]
+        indexes = [
+            # topics mentioning an item, most nodes first
+            models.Index(fields=['wiki', '-nodeCount']),
+            models.Index(fields=['topic', 'wiki']),
+        ]
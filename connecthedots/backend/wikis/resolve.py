@@ -0,0 +1,124 @@
+"""
+Resolving many qIDs to labels and descriptions at once.
+
+Lookups go through three tiers and each entry says which one answered: the
+cache, then the ``wikis`` table in one query, then ``wbgetentities`` for
+whatever is left, up to 50 ids per call. Upstream answers are upserted
+into ``wikis`` so the next lookup stops at the table. Items Wikidata does
+not know, or knows without a label in the configured language, are cached
+as missing for a while. Upstream calls share one time budget per request
+and a circuit breaker per process; items that could not be asked about are
+queued for background enrichment.
+"""
+import logging
+import threading
+import time
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from .enrichment import (MAX_IDS_PER_CALL, EnrichmentFailed, fetch_entities, get_wiki_enricher,
+                         enrich_later)
+from .models import Wiki
+from .search import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+RESOLVE_CACHE_TIMEOUT = 60 * 60
+MISSING_CACHE_TIMEOUT = 60 * 5
+MISSING = 'missing'
+
+
+def _cache_key(qid):
+    return f'wiki:{qid}'
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_resolve_breaker():
+    """One breaker per process and endpoint, configured like the search one."""
+    url = settings.WIKIDATA_API_URL
+    with _breakers_lock:
+        if url not in _breakers:
+            _breakers[url] = CircuitBreaker(settings.WIKIDATA_BREAKER_FAILURES, settings.WIKIDATA_BREAKER_RESET)
+        return _breakers[url]
+
+
+def _fetch_upstream(qids):
+    enricher = get_wiki_enricher()
+    breaker = get_resolve_breaker()
+    connect_timeout, read_timeout = enricher.timeout
+    deadline = time.monotonic() + settings.WIKIDATA_RESOLVE_BUDGET
+    details, failed = {}, []
+    for start in range(0, len(qids), MAX_IDS_PER_CALL):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not breaker.allow():
+            logger.warning('Skipped resolving %d Wikidata items upstream', len(qids) - start)
+            failed.extend(qids[start:])
+            break
+        batch = qids[start:start + MAX_IDS_PER_CALL]
+        try:
+            details.update(fetch_entities(enricher.session, enricher.url, batch, enricher.language,
+                                          (connect_timeout, min(read_timeout, remaining))))
+        except (EnrichmentFailed, requests.RequestException, ValueError):
+            logger.warning('Resolving %d Wikidata items upstream failed', len(batch), exc_info=True)
+            breaker.record_failure()
+            failed.extend(batch)
+            continue
+        breaker.record_success()
+    return details, failed
+
+
+def resolve_wikis(qids):
+    """
+    ``(entries, missing)`` for ``qids``, deduplicated in request order.
+
+    Entries are ``{qID, label, description, source}`` dicts, ``source`` being
+    ``cache``, ``db`` or ``upstream``; ``missing`` lists the qIDs nobody
+    could resolve.
+    """
+    qids = list(dict.fromkeys(qids))
+    found = {}
+    missing = set()
+
+    cached = cache.get_many([_cache_key(qid) for qid in qids])
+    for qid in qids:
+        value = cached.get(_cache_key(qid))
+        if value == MISSING:
+            missing.add(qid)
+        elif value is not None:
+            found[qid] = {'qID': qid, **value, 'source': 'cache'}
+
+    rest = [qid for qid in qids if qid not in found and qid not in missing]
+    if rest:
+        rows = Wiki.objects.filter(qID__in=rest).exclude(label='').values_list('qID', 'label', 'description')
+        for qid, label, description in rows:
+            found[qid] = {'qID': qid, 'label': label, 'description': description, 'source': 'db'}
+
+    rest = [qid for qid in rest if qid not in found]
+    if rest:
+        details, failed = _fetch_upstream(rest)
+        # an item without a label in our language is no better than an unknown one
+        details = {qid: detail for qid, detail in details.items() if detail[0]}
+        if details:
+            Wiki.objects.bulk_create(
+                [Wiki(qID=qid, label=label, description=description)
+                 for qid, (label, description) in details.items()],
+                update_conflicts=True,
+                unique_fields=['qID'],
+                update_fields=['label', 'description'],
+            )
+        for qid, (label, description) in details.items():
+            found[qid] = {'qID': qid, 'label': label, 'description': description, 'source': 'upstream'}
+        unknown = set(rest) - details.keys() - set(failed)
+        cache.set_many({_cache_key(qid): MISSING for qid in unknown}, MISSING_CACHE_TIMEOUT)
+        missing |= unknown | set(failed)
+        # placeholder rows among the failed ones get another go in the background
+        enrich_later(failed)
+
+    cache.set_many({
+        _cache_key(qid): {'label': entry['label'], 'description': entry['description']}
+        for qid, entry in found.items() if entry['source'] != 'cache' and entry['label']
+    }, RESOLVE_CACHE_TIMEOUT)
+    return [found[qid] for qid in qids if qid in found], [qid for qid in qids if qid in missing]
@@ -0,0 +1,233 @@
+"""
+Wikidata label search with a result cache in front of the SPARQL endpoint.
+
+Every worker process keeps one ``WikidataSearch``: a pooled HTTP session
+with connect and read timeouts, a TTL/LRU cache keyed by the normalized
+query, and an in-flight table so concurrent identical queries share one
+upstream call. A circuit breaker stops calling the endpoint after repeated
+failures or timeouts; while it is open, and whenever a call fails, expired
+cache entries are served instead of an error.
+"""
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+HEADERS = {
+    'Accept': 'application/sparql-results+json',
+    'User-Agent': 'ConnectTheDots/1.0',
+}
+SPARQL_QUERY = """
+SELECT ?item ?itemLabel ?itemDescription WHERE {{
+  ?item rdfs:label ?itemLabel .
+  OPTIONAL {{ ?item schema:description ?itemDescription . }}
+  FILTER(LANG(?itemLabel) = "en")
+  FILTER(CONTAINS(LCASE(?itemLabel), LCASE("{query}")))
+}}
+LIMIT 10
+"""
+
+
+class UpstreamUnavailable(Exception):
+    """Wikidata could not answer and there is no cached result to fall back on."""
+
+
+def normalize_query(query):
+    return ' '.join(query.split()).lower()
+
+
+def parse_results(data):
+    return [
+        {
+            'qID': result['item']['value'].split('/')[-1],
+            'label': result['itemLabel']['value'],
+            'description': result.get('itemDescription', {}).get('value', ''),
+        }
+        for result in data['results']['bindings']
+    ]
+
+
+def pooled_session(pool_size):
+    """A session keeping up to ``pool_size`` connections per host open between calls."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ResultCache:
+    """
+    LRU mapping of query to results, thread safe.
+
+    Entries are fresh for ``ttl`` seconds and kept as stale fallbacks until
+    ``stale_ttl`` seconds after they were stored, or until evicted.
+    """
+
+    def __init__(self, max_size, ttl, stale_ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """``(results, fresh)``, or None when nothing usable is cached."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored, results = entry
+            age = self.clock() - stored
+            if age >= self.stale_ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return results, age < self.ttl
+
+    def set(self, key, results):
+        with self.lock:
+            self.entries[key] = (self.clock(), results)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+class CircuitBreaker:
+    """
+    Closed until ``failure_threshold`` calls in a row fail, then open for
+    ``reset_timeout`` seconds. After that one trial call is let through; it
+    closes the breaker again or reopens it.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running or self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class WikidataSearch:
+    def __init__(self, url, connect_timeout, read_timeout, cache_size, cache_ttl, stale_ttl,
+                 failure_threshold, reset_timeout, pool_size, clock=time.monotonic):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = ResultCache(cache_size, cache_ttl, stale_ttl, clock=clock)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, clock=clock)
+        self.session = pooled_session(pool_size)
+        self.calls = {}
+        self.calls_lock = threading.Lock()
+
+    def search(self, query):
+        """Results for ``query``; raises UpstreamUnavailable when neither Wikidata nor the cache can answer."""
+        key = normalize_query(query)
+        if not key:
+            return []
+        cached = self.cache.get(key)
+        if cached is not None and cached[1]:
+            return cached[0]
+
+        with self.calls_lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+        if leader:
+            try:
+                call.results = self.fetch(key)
+            except UpstreamUnavailable as e:
+                call.error = e
+            finally:
+                with self.calls_lock:
+                    del self.calls[key]
+                call.done.set()
+            error = call.error
+        elif call.done.wait(sum(self.timeout)):
+            error = call.error
+        else:
+            error = UpstreamUnavailable('Wikidata search timed out')
+
+        if error is None:
+            return call.results
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0]
+        raise error
+
+    def fetch(self, key):
+        if not self.breaker.allow():
+            raise UpstreamUnavailable('Wikidata search is temporarily unavailable')
+        sparql = SPARQL_QUERY.format(query=key.replace('\\', '\\\\').replace('"', '\\"'))
+        try:
+            response = self.session.get(self.url, params={'query': sparql}, timeout=self.timeout)
+            response.raise_for_status()
+            results = parse_results(response.json())
+        except (requests.RequestException, ValueError, KeyError) as e:
+            self.breaker.record_failure()
+            raise UpstreamUnavailable(f'Wikidata search failed: {e}')
+        self.breaker.record_success()
+        self.cache.set(key, results)
+        return results
+
+
+_searches = {}
+_searches_lock = threading.Lock()
+
+
+def get_wikidata_search():
+    """One ``WikidataSearch`` per process and endpoint, configured from settings."""
+    url = settings.WIKIDATA_SPARQL_URL
+    with _searches_lock:
+        if url not in _searches:
+            _searches[url] = WikidataSearch(
+                url,
+                connect_timeout=settings.WIKIDATA_CONNECT_TIMEOUT,
+                read_timeout=settings.WIKIDATA_READ_TIMEOUT,
+                cache_size=settings.WIKIDATA_SEARCH_CACHE_SIZE,
+                cache_ttl=settings.WIKIDATA_SEARCH_CACHE_TTL,
+                stale_ttl=settings.WIKIDATA_SEARCH_STALE_TTL,
+                failure_threshold=settings.WIKIDATA_BREAKER_FAILURES,
+                reset_timeout=settings.WIKIDATA_BREAKER_RESET,
+                pool_size=settings.WIKIDATA_POOL_SIZE,
+            )
+        return _searches[url]
@@ -1,3 +1,492 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from topics.models import Topic
+from nodes.models import Node
+from graphs.transfer import import_graph
+from .models import Wiki, WikiTopic
+from .enrichment import MAX_IDS_PER_CALL, WikiEnricher, get_wiki_enricher
+from .dump import read_checkpoint, write_checkpoint
+from .autocomplete import LabelIndex, get_label_index, refresh_label_index, reset_label_index
+from .search import WikidataSearch, UpstreamUnavailable
+from .utils import rebuild_wiki_topics
+from .resolve import get_resolve_breaker
 
-# Create your tests here.
+User = get_user_model()
+
+
+class WikiTopicTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.topics = [Topic.objects.create(topicName=f'Topic {i}', createdBy=self.user) for i in range(3)]
+        Wiki.objects.create(qID='Q42', label='Douglas Adams', description='writer')
+        Wiki.objects.create(qID='Q5', label='human', description='')
+
+    def add_node(self, topic, qid):
+        response = self.client.post('/api/nodes/', {'topic': topic.id, 'qid': qid, 'manual_name': 'n'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def counts(self):
+        return set(WikiTopic.objects.values_list('wiki_id', 'topic_id', 'nodeCount'))
+
+    def test_counts_follow_node_writes(self):
+        first, second = self.topics[0], self.topics[1]
+        node_id = self.add_node(first, 'Q42')
+        self.add_node(first, 'Q42')
+        self.add_node(second, 'Q5')
+        self.assertEqual(self.counts(), {('Q42', first.id, 2), ('Q5', second.id, 1)})
+
+        self.client.patch(f'/api/nodes/{node_id}/', {'qid': 'Q5', 'topic': second.id})
+        self.assertEqual(self.counts(), {('Q42', first.id, 1), ('Q5', second.id, 2)})
+
+        Node.objects.filter(topic=first).update(qid=None)
+        self.assertEqual(rebuild_wiki_topics(), 1)
+        self.assertEqual(self.counts(), {('Q5', second.id, 2)})
+
+        self.client.delete(f'/api/nodes/{node_id}/')
+        self.assertEqual(self.counts(), {('Q5', second.id, 1)})
+
+    def test_import_counts_nodes(self):
+        records = [{'type': 'node', 'id': i, 'qid': 'Q42'} for i in range(3)] + [{'type': 'node', 'id': 9}]
+        import_graph(self.topics[2], self.user, records)
+        self.assertEqual(self.counts(), {('Q42', self.topics[2].id, 3)})
+
+    def test_topics_mentioning_are_paginated(self):
+        for count, topic in enumerate(self.topics, start=1):
+            for _ in range(count):
+                self.add_node(topic, 'Q42')
+        self.add_node(self.topics[0], 'Q5')
+
+        response = self.client.get('/api/wikis/Q42/topics/', {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['topicCount'], response.data['nodeCount']), (3, 6))
+        self.assertEqual([row['topic'] for row in response.data['results']], [self.topics[2].id, self.topics[1].id])
+        self.assertEqual(response.data['next'], 2)
+        response = self.client.get('/api/wikis/Q42/topics/', {'page_size': 2, 'page': 2})
+        self.assertEqual([row['topic'] for row in response.data['results']], [self.topics[0].id])
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/wikis/Q42/topics/', {'exclude_topic': self.topics[2].id})
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get('/api/wikis/Q42/related/')
+        self.assertEqual(response.data['results'], [{'qID': 'Q5', 'label': 'human', 'topicCount': 1, 'nodeCount': 1}])
+        response = self.client.get('/api/wikis/popular/')
+        self.assertEqual([row['qID'] for row in response.data['results']], ['Q42', 'Q5'])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/wikis/Q1/topics/').status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/wikis/Q42/topics/', {'page': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StandInWikidata(ThreadingHTTPServer):
+    """Local HTTP server answering like the Wikidata endpoints; ``respond(params)`` builds the JSON body."""
+    daemon_threads = True
+
+    def __init__(self, respond):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.respond = respond
+        self.delay = 0
+        self.status = 200
+        self.failures = 0
+        self.requests = []
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/sparql'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # clients that gave up on a slow answer close the socket before it is written
+        pass
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        self.server.requests.append(params)
+        time.sleep(self.server.delay)
+        body = json.dumps(self.server.respond(params)).encode()
+        status_code = self.server.status
+        if self.server.failures:
+            self.server.failures -= 1
+            status_code = 503
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def sparql_results(params):
+    term = params['query'].split('LCASE("')[-1].split('"')[0]
+    return {'results': {'bindings': [{
+        'item': {'value': 'http://www.wikidata.org/entity/Q42'},
+        'itemLabel': {'value': term},
+        'itemDescription': {'value': 'writer'},
+    }]}}
+
+
+class WikidataSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.server = StandInWikidata(sparql_results)
+        self.addCleanup(self.server.stop)
+        self.now = 0.0
+
+    def search(self, **options):
+        config = dict(connect_timeout=1, read_timeout=0.2, cache_size=2, cache_ttl=60, stale_ttl=3600,
+                      failure_threshold=2, reset_timeout=30, pool_size=4)
+        config.update(options)
+        return WikidataSearch(self.server.url, clock=lambda: self.now, **config)
+
+    def test_results_are_cached_by_normalized_query(self):
+        search = self.search()
+        expected = [{'qID': 'Q42', 'label': 'douglas adams', 'description': 'writer'}]
+        self.assertEqual(search.search('Douglas  Adams'), expected)
+        self.assertEqual(search.search(' douglas adams\n'), expected)
+        self.assertEqual(len(self.server.requests), 1)
+
+        search.search('a')
+        search.search('b')
+        # the least recently used query was evicted
+        search.search('douglas adams')
+        self.assertEqual(len(self.server.requests), 4)
+
+        self.now = 61
+        search.search('douglas adams')
+        self.assertEqual(len(self.server.requests), 5)
+
+    def test_concurrent_queries_share_one_call(self):
+        search = self.search(read_timeout=2)
+        self.server.delay = 0.3
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(search.search('Adams'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(all(result == results[0] for result in results))
+
+    def test_slow_upstream_serves_stale_results(self):
+        search = self.search()
+        fresh = search.search('adams')
+        self.now = 120
+        self.server.delay = 0.5
+        self.assertEqual(search.search('adams'), fresh)
+        self.assertEqual(search.search('adams'), fresh)
+        self.assertTrue(search.breaker.is_open)
+        with self.assertRaises(UpstreamUnavailable):
+            search.search('never asked')
+
+        # the open breaker answers without calling out
+        calls = len(self.server.requests)
+        self.assertEqual(search.search('adams'), fresh)
+        self.assertEqual(len(self.server.requests), calls)
+
+        # after the reset timeout one trial call goes through and closes it again
+        self.server.delay = 0
+        self.now = 151
+        self.assertEqual(search.search('never asked')[0]['label'], 'never asked')
+        self.assertFalse(search.breaker.is_open)
+
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        self.server = StandInWikidata(sparql_results)
+        self.addCleanup(self.server.stop)
+        reset_label_index()
+        self.addCleanup(reset_label_index)
+        user = User.objects.create_user(username='searcher', password='testpass123')
+        topic = Topic.objects.create(topicName='Books', createdBy=user)
+        rows = [
+            ('Q42', 'Douglas Adams', 3),
+            ('Q1', 'Douglas', 1),
+            ('Q2', 'Adams County', 0),
+            ('Q3', 'John Adams', 5),
+            ('Q4', 'Douglas fir', 0),
+        ]
+        Wiki.objects.bulk_create(Wiki(qID=qid, label=label, description='') for qid, label, _ in rows)
+        Wiki.objects.create(qID='Q9', label='', description='')
+        WikiTopic.objects.bulk_create(
+            WikiTopic(wiki_id=qid, topic=topic, nodeCount=count) for qid, _, count in rows if count
+        )
+
+    def search(self, query):
+        with override_settings(WIKIDATA_SPARQL_URL=self.server.url, AUTOCOMPLETE_MIN_LOCAL_RESULTS=2):
+            response = self.client.get('/api/wikis/search/', {'q': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['qID'] for row in response.json()]
+
+    def test_prefix_matches_rank_by_usage(self):
+        # exact label first, then label prefixes, then word prefixes, by node count within each
+        self.assertEqual(self.search('douglas'), ['Q1', 'Q42', 'Q4'])
+        self.assertEqual(self.search('ADAMS'), ['Q2', 'Q3', 'Q42'])
+        self.assertEqual(self.server.requests, [])
+
+    def test_expired_index_is_served_while_rebuilt(self):
+        index = get_label_index()
+        self.assertEqual([item[0] for item in index.items][:3], ['Q3', 'Q42', 'Q1'])
+        Wiki.objects.create(qID='Q5', label='Douglas Coupland', description='')
+        with override_settings(AUTOCOMPLETE_INDEX_TTL=0), patch('wikis.autocomplete.threading.Thread') as thread:
+            self.assertIs(get_label_index(), index)
+            self.assertIs(get_label_index(), index)
+        thread.assert_called_once()
+        refresh_label_index()
+        self.assertIn('Q5', [item[0] for item in get_label_index().items])
+
+    def test_misspellings_match_by_trigrams(self):
+        index = LabelIndex([('Q42', 'Douglas Adams', '', 3), ('Q3', 'John Adams', '', 5)])
+        self.assertEqual([row['qID'] for row in index.search('duglas adams', 10)], ['Q42'])
+        self.assertEqual([row['qID'] for row in index.search('John Adms', 10)], ['Q3'])
+        self.assertEqual(index.search('zzz', 10), [])
+
+    def test_upstream_fills_in_when_local_results_are_few(self):
+        self.assertEqual(self.search('douglas a'), ['Q42', 'Q1', 'Q4'])
+        self.assertEqual(len(self.server.requests), 0)
+        # one local match, the upstream answer is appended without repeating it
+        self.assertEqual(self.search('john'), ['Q3', 'Q42'])
+        self.assertEqual(self.search('John Adams'), ['Q3', 'Q42'])
+        self.assertEqual(len(self.server.requests), 2)
+
+        self.server.status = 500
+        self.assertEqual(self.search('county adams'), ['Q2'])
+        with override_settings(WIKIDATA_SPARQL_URL=self.server.url):
+            response = self.client.get('/api/wikis/search/', {'q': 'qqqqq'})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def wbgetentities(params):
+    entities = {}
+    for qid in params['ids'].split('|'):
+        if qid == 'Q404':
+            entities[qid] = {'id': qid, 'missing': ''}
+        elif qid == 'Q405':
+            # known to Wikidata, but only labelled in another language
+            entities[qid] = {'labels': {'de': {'language': 'de', 'value': 'Nur deutsch'}}, 'descriptions': {}}
+        else:
+            entities[qid] = {
+                'labels': {'en': {'language': 'en', 'value': f'Label {qid}'}},
+                'descriptions': {'en': {'language': 'en', 'value': f'About {qid}'}},
+            }
+    return {'entities': entities}
+
+
+class EnrichmentTests(APITestCase):
+    def setUp(self):
+        self.server = StandInWikidata(wbgetentities)
+        self.addCleanup(self.server.stop)
+        self.placeholders = [f'Q{i}' for i in range(1, 121)]
+        Wiki.objects.bulk_create(Wiki(qID=qid, label='', description='') for qid in self.placeholders)
+        Wiki.objects.create(qID='Q500', label='Known', description='')
+
+    def enricher(self, **options):
+        return WikiEnricher(self.server.url, backoff=0.01, autostart=False, **options)
+
+    def test_placeholders_are_resolved_in_batches(self):
+        enricher = self.enricher()
+        self.server.failures = 1
+        enricher.add([*self.placeholders, 'Q500'])
+        self.assertEqual(enricher.flush(), 120)
+
+        # three batches, the first one retried once
+        self.assertEqual(enricher.calls, 4)
+        batches = [params['ids'].split('|') for params in self.server.requests]
+        self.assertEqual([len(ids) for ids in batches], [50, 50, 50, 20])
+        self.assertNotIn('Q500', {qid for ids in batches for qid in ids})
+        self.assertEqual(Wiki.objects.get(qID='Q7').label, 'Label Q7')
+        self.assertEqual(Wiki.objects.get(qID='Q7').description, 'About Q7')
+        self.assertEqual(Wiki.objects.get(qID='Q500').label, 'Known')
+
+    def test_failing_batches_stay_placeholders(self):
+        Wiki.objects.create(qID='Q404', label='', description='')
+        enricher = self.enricher(retries=2)
+        self.server.status = 503
+        enricher.add(['Q1', 'Q404'])
+        with self.assertLogs('wikis.enrichment', 'ERROR'):
+            self.assertEqual(enricher.flush(), 0)
+        self.assertEqual((enricher.calls, enricher.failures), (3, 1))
+
+        self.server.status = 200
+        enricher.add(['Q1', 'Q404'])
+        self.assertEqual(enricher.flush(), 1)
+        self.assertEqual(Wiki.objects.get(qID='Q404').label, '')
+
+    def test_new_node_items_are_queued(self):
+        user = User.objects.create_user(username='enricher', password='testpass123')
+        topic = Topic.objects.create(topicName='Books', createdBy=user)
+        self.client.force_authenticate(user=user)
+        with override_settings(WIKI_ENRICHMENT=True, WIKIDATA_API_URL=self.server.url, WIKI_ENRICHMENT_INTERVAL=60):
+            enricher = get_wiki_enricher()
+            self.addCleanup(enricher.stop)
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/nodes/', {'topic': topic.id, 'qid': 'Q9000', 'manual_name': 'n'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(enricher.pending(), 1)
+            self.assertEqual(enricher.flush(), 1)
+        self.assertEqual(Wiki.objects.get(qID='Q9000').label, 'Label Q9000')
+
+    def test_sweep_command(self):
+        with override_settings(WIKIDATA_API_URL=self.server.url):
+            call_command('enrich_wikis', limit=60, stdout=StringIO())
+        self.assertEqual(Wiki.objects.filter(label='').count(), 60)
+
+
+def dump_entity(qid, labels, descriptions=None, kind='item'):
+    return {
+        'type': kind,
+        'id': qid,
+        'labels': {language: {'language': language, 'value': value} for language, value in labels.items()},
+        'descriptions': {
+            language: {'language': language, 'value': value} for language, value in (descriptions or {}).items()
+        },
+        'claims': {'P31': [{'mainsnak': {'datavalue': {'value': {'id': 'Q5'}}}}]},
+    }
+
+
+class DumpIngestTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'latest-all.json.gz')
+        entities = [
+            dump_entity('Q42', {'en': 'Douglas Adams', 'de': 'Douglas Adams'}, {'en': 'English writer'}),
+            dump_entity('Q5', {'de': 'Mensch'}, {'de': 'Lebewesen'}),
+            dump_entity('P31', {'en': 'instance of'}, kind='property'),
+            dump_entity('Q7', {'fr': 'sept'}),
+        ] + [dump_entity(f'Q{i}', {'en': f'Item {i}'}) for i in range(100, 130)]
+        with gzip.open(self.path, 'wt') as f:
+            f.write('[\n' + ',\n'.join(json.dumps(entity) for entity in entities) + '\n]\n')
+        Wiki.objects.create(qID='Q42', label='', description='')
+
+    def ingest(self, *args):
+        call_command('ingest_wikidata_dump', self.path, '--languages', 'en,de', *args, stdout=StringIO())
+
+    def test_items_are_upserted_in_preferred_language(self):
+        self.ingest('--workers', '2', '--batch-size', '10')
+        self.assertEqual(Wiki.objects.count(), 32)
+        wiki = Wiki.objects.get(qID='Q42')
+        self.assertEqual((wiki.label, wiki.description), ('Douglas Adams', 'English writer'))
+        wiki = Wiki.objects.get(qID='Q5')
+        self.assertEqual((wiki.label, wiki.description), ('Mensch', 'Lebewesen'))
+        # properties and items without a label in the kept languages are skipped
+        self.assertFalse(Wiki.objects.filter(qID__in=['P31', 'Q7']).exists())
+        self.assertTrue(read_checkpoint(f'{self.path}.checkpoint')['done'])
+
+    def test_resume_from_checkpoint(self):
+        with gzip.open(self.path, 'rb') as f:
+            lines = f.readlines()
+        # as if a run had stopped after the first 20 lines were written
+        write_checkpoint(f'{self.path}.checkpoint', {
+            'dump': os.path.abspath(self.path), 'offset': sum(map(len, lines[:20])), 'entities': 17, 'done': False,
+        })
+        self.ingest('--workers', '1')
+        self.assertEqual(Wiki.objects.get(qID='Q42').label, '')
+        self.assertEqual(set(Wiki.objects.filter(qID__startswith='Q1').values_list('qID', flat=True)),
+                         {f'Q{i}' for i in range(115, 130)})
+        self.assertEqual(read_checkpoint(f'{self.path}.checkpoint')['entities'], 32)
+
+        self.ingest('--restart')
+        self.assertEqual(Wiki.objects.get(qID='Q42').label, 'Douglas Adams')
+
+
+class ResolveTests(APITestCase):
+    def setUp(self):
+        self.server = StandInWikidata(wbgetentities)
+        self.addCleanup(self.server.stop)
+        self.addCleanup(cache.clear)
+        user = User.objects.create_user(username='resolver', password='testpass123')
+        self.client.force_authenticate(user=user)
+        Wiki.objects.create(qID='Q1', label='Known', description='from the table')
+        Wiki.objects.create(qID='Q2', label='', description='')
+
+    def resolve(self, qids):
+        with override_settings(WIKIDATA_API_URL=self.server.url):
+            return self.client.post('/api/wikis/resolve/', {'qids': qids}, format='json')
+
+    def test_each_tier_answers_once(self):
+        response = self.resolve(['Q1', 'Q2', 'Q3', 'Q1', 'Q404'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['qID'], row['label'], row['source']) for row in response.data['results']],
+            [('Q1', 'Known', 'db'), ('Q2', 'Label Q2', 'upstream'), ('Q3', 'Label Q3', 'upstream')],
+        )
+        self.assertEqual(response.data['missing'], ['Q404'])
+        self.assertEqual([params['ids'] for params in self.server.requests], ['Q2|Q3|Q404'])
+        self.assertEqual(Wiki.objects.get(qID='Q3').description, 'About Q3')
+
+        with self.assertNumQueries(0):
+            response = self.resolve(['Q3', 'Q2', 'Q1', 'Q404'])
+        self.assertEqual([row['source'] for row in response.data['results']], ['cache'] * 3)
+        self.assertEqual(response.data['missing'], ['Q404'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_upstream_failure_leaves_items_missing(self):
+        self.server.status = 503
+        with self.assertLogs('wikis.resolve', 'WARNING'):
+            response = self.resolve(['Q1', 'Q2'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['qID'] for row in response.data['results']], ['Q1'])
+        self.assertEqual(response.data['missing'], ['Q2'])
+
+        # nothing was cached for the failed lookup
+        self.server.status = 200
+        response = self.resolve(['Q2'])
+        self.assertEqual(response.data['results'][0]['source'], 'upstream')
+
+    def test_items_without_a_label_are_missing(self):
+        response = self.resolve(['Q405'])
+        self.assertEqual((response.data['results'], response.data['missing']), ([], ['Q405']))
+        self.assertFalse(Wiki.objects.filter(qID='Q405').exists())
+        self.resolve(['Q405'])
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_breaker_and_time_budget_bound_upstream_calls(self):
+        qids = [f'Q{i}' for i in range(10, 10 + 4 * MAX_IDS_PER_CALL)]
+        self.server.status = 503
+        with self.assertLogs('wikis.resolve', 'WARNING'):
+            response = self.resolve(qids)
+        self.assertEqual(len(response.data['missing']), len(qids))
+        # the breaker opens after the configured number of failed calls in a row
+        self.assertEqual(len(self.server.requests), 3)
+
+        self.server.status = 200
+        self.server.delay = 0.3
+        with override_settings(WIKIDATA_API_URL=self.server.url):
+            get_resolve_breaker().record_success()
+        with override_settings(WIKIDATA_RESOLVE_BUDGET=0.2), self.assertLogs('wikis.resolve', 'WARNING'):
+            response = self.resolve(qids)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertEqual(len(response.data['missing']), len(qids))
+
+    def test_invalid_requests(self):
+        for qids in ('Q1', [1], ['Q1', 'item'], ['Q1'] * 501):
+            self.assertEqual(self.resolve(qids).status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,10 @@
 from django.urls import path
-from .views import search_wikidata
+from .views import search_wikidata, resolve, popular, wiki_topics, related_wikis
 
 urlpatterns = [
     path('search/', search_wikidata),
+    path('resolve/', resolve),
+    path('popular/', popular),
+    path('<str:qid>/topics/', wiki_topics),
+    path('<str:qid>/related/', related_wikis),
 ]
@@ -0,0 +1,109 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+from nodes.models import Node
+from .models import WikiTopic
+
+WRITE_BATCH_SIZE = 1000
+
+
+def record_wiki_usage(added=(), removed=()):
+    """
+    Update the per-topic node counts of Wikidata items.
+
+    ``added`` and ``removed`` are ``(qid, topic id)`` pairs, one per node that
+    started or stopped pointing at ``qid`` in that topic; pairs without a qid
+    are ignored. Counts are changed with one UPDATE per topic and step size.
+    """
+    delta = Counter(pair for pair in added if pair[0])
+    delta.subtract(pair for pair in removed if pair[0])
+    steps = defaultdict(list)
+    for (qid, topic_id), change in delta.items():
+        if change:
+            steps[(topic_id, change)].append(qid)
+    if not steps:
+        return
+
+    with transaction.atomic():
+        new = {(qid, topic_id) for (topic_id, change), qids in steps.items() if change > 0 for qid in qids}
+        if new:
+            WikiTopic.objects.bulk_create(
+                [WikiTopic(wiki_id=qid, topic_id=topic_id) for qid, topic_id in new],
+                batch_size=WRITE_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        for (topic_id, change), qids in steps.items():
+            WikiTopic.objects.filter(topic_id=topic_id, wiki_id__in=qids).update(
+                nodeCount=Greatest(F('nodeCount') + change, 0)
+            )
+            if change < 0:
+                WikiTopic.objects.filter(topic_id=topic_id, wiki_id__in=qids, nodeCount__lte=0).delete()
+
+
+def rebuild_wiki_topics():
+    """Recount every row from the nodes table. Returns the number of rows written."""
+    rows = (
+        Node.objects.filter(qid__isnull=False)
+        .values_list('qid_id', 'topic_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        WikiTopic.objects.all().delete()
+        created = WikiTopic.objects.bulk_create(
+            [WikiTopic(wiki_id=qid, topic_id=topic_id, nodeCount=count) for qid, topic_id, count in rows],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+    return len(created)
+
+
+def recount_topic_wikis(topic_id):
+    """Recount one topic's rows from its nodes, after bulk writes that bypass ``record_wiki_usage``."""
+    rows = (
+        Node.objects.filter(topic_id=topic_id, qid__isnull=False)
+        .values_list('qid_id')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic():
+        WikiTopic.objects.filter(topic_id=topic_id).delete()
+        WikiTopic.objects.bulk_create(
+            [WikiTopic(wiki_id=qid, topic_id=topic_id, nodeCount=count) for qid, count in rows],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+
+def wiki_popularity(qid):
+    """``(topic count, node count)`` of an item across all topics."""
+    totals = WikiTopic.objects.filter(wiki_id=qid).aggregate(topics=Count('id'), nodes=Sum('nodeCount'))
+    return totals['topics'], totals['nodes'] or 0
+
+
+def topics_mentioning(qid, exclude_topic=None):
+    """Topics with nodes pointing at ``qid``, most nodes first."""
+    rows = WikiTopic.objects.filter(wiki_id=qid)
+    if exclude_topic is not None:
+        rows = rows.exclude(topic_id=exclude_topic)
+    return rows.order_by('-nodeCount', 'topic_id').values('topic_id', 'topic__topicName', 'nodeCount')
+
+
+def co_occurring_wikis(qid):
+    """Other items used in the topics that mention ``qid``, by shared topic count."""
+    topic_ids = WikiTopic.objects.filter(wiki_id=qid).values('topic_id')
+    return (
+        WikiTopic.objects.filter(topic_id__in=topic_ids)
+        .exclude(wiki_id=qid)
+        .values('wiki_id', 'wiki__label')
+        .annotate(topics=Count('id'), nodes=Sum('nodeCount'))
+        .order_by('-topics', '-nodes', 'wiki_id')
+    )
+
+
+def popular_wikis():
+    """Items by the number of topics that use them."""
+    return (
+        WikiTopic.objects.values('wiki_id', 'wiki__label')
+        .annotate(topics=Count('id'), nodes=Sum('nodeCount'))
+        .order_by('-topics', '-nodes', 'wiki_id')
+    )
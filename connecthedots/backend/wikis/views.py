@@ -1,47 +1,123 @@
+import re
+from django.conf import settings
 from django.shortcuts import render
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-import requests
+from rest_framework import status
 from .models import Wiki
+from .autocomplete import autocomplete
+from .resolve import resolve_wikis
+from .search import get_wikidata_search, UpstreamUnavailable
+from .utils import wiki_popularity, topics_mentioning, co_occurring_wikis, popular_wikis
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+SEARCH_LIMIT = 10
+MAX_RESOLVE_QIDS = 500
+QID_PATTERN = re.compile(r'Q[1-9][0-9]*')
 
 @api_view(['GET'])
 def search_wikidata(request):
     query = request.GET.get('q', '').strip()
     if not query:
         return Response([])
+    results = autocomplete(query, limit=SEARCH_LIMIT)
+    if len(results) >= settings.AUTOCOMPLETE_MIN_LOCAL_RESULTS:
+        return Response(results)
+    try:
+        upstream = get_wikidata_search().search(query)
+    except UpstreamUnavailable as e:
+        if results:
+            return Response(results)
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    known = {result['qID'] for result in results}
+    results += [result for result in upstream if result['qID'] not in known]
+    return Response(results[:SEARCH_LIMIT])
 
-    escaped_query = query.replace('"', '\\"')
 
-    sparql_query = f"""
-    SELECT ?item ?itemLabel ?itemDescription WHERE {{
-      ?item rdfs:label ?itemLabel .
-      OPTIONAL {{ ?item schema:description ?itemDescription . }}
-      FILTER(LANG(?itemLabel) = "en")
-      FILTER(CONTAINS(LCASE(?itemLabel), LCASE("{escaped_query}")))
-    }}
-    LIMIT 10
-    """
+def paginate(rows, request):
+    """One page of ``rows`` from ``page`` and ``page_size`` query params, plus the next page number."""
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = min(int(request.query_params.get('page_size', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('page and page_size must be integers')
+    if page < 1 or page_size < 1:
+        raise ValueError('page and page_size must be positive')
+    start = (page - 1) * page_size
+    # one extra row tells whether there is a next page
+    results = list(rows[start:start + page_size + 1])
+    return results[:page_size], page + 1 if len(results) > page_size else None
 
-    headers = {
-        'Accept': 'application/sparql-results+json',
-        'User-Agent': 'ConnectTheDots/1.0'
-    }
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def wiki_topics(request, qid):
+    wiki = Wiki.objects.filter(qID=qid).first()
+    if wiki is None:
+        return Response({'error': 'Wiki not found'}, status=status.HTTP_404_NOT_FOUND)
+    exclude_topic = request.query_params.get('exclude_topic')
     try:
-        response = requests.get("https://query.wikidata.org/sparql", params={'query': sparql_query}, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        results = []
-        for result in data['results']['bindings']:
-            qid = result['item']['value'].split('/')[-1]
-            results.append({
-                'qID': qid,
-                'label': result['itemLabel']['value'],
-                'description': result.get('itemDescription', {}).get('value', '')
-            })
+        if exclude_topic is not None:
+            exclude_topic = int(exclude_topic)
+        rows, next_page = paginate(topics_mentioning(qid, exclude_topic), request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    topic_count, node_count = wiki_popularity(qid)
+    return Response({
+        'qID': wiki.qID,
+        'label': wiki.label,
+        'topicCount': topic_count,
+        'nodeCount': node_count,
+        'results': [
+            {'topic': row['topic_id'], 'topicName': row['topic__topicName'], 'nodeCount': row['nodeCount']}
+            for row in rows
+        ],
+        'next': next_page,
+    })
+
+
+def wiki_ranking(rows):
+    return [
+        {'qID': row['wiki_id'], 'label': row['wiki__label'], 'topicCount': row['topics'], 'nodeCount': row['nodes']}
+        for row in rows
+    ]
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def related_wikis(request, qid):
+    if not Wiki.objects.filter(qID=qid).exists():
+        return Response({'error': 'Wiki not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        rows, next_page = paginate(co_occurring_wikis(qid), request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'qID': qid, 'results': wiki_ranking(rows), 'next': next_page})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def popular(request):
+    try:
+        rows, next_page = paginate(popular_wikis(), request)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': wiki_ranking(rows), 'next': next_page})
 
-        return Response(results)
-    except Exception as e:
-        return Response({'error': str(e)}, status=500)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def resolve(request):
+    qids = request.data.get('qids')
+    if not isinstance(qids, list) or not all(isinstance(qid, str) for qid in qids):
+        return Response({'error': 'qids must be a list of strings'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(qids) > MAX_RESOLVE_QIDS:
+        return Response({'error': f'at most {MAX_RESOLVE_QIDS} qids per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    invalid = [qid for qid in qids if not QID_PATTERN.fullmatch(qid)]
+    if invalid:
+        return Response({'error': f'invalid qids: {", ".join(invalid[:10])}'}, status=status.HTTP_400_BAD_REQUEST)
+    results, missing = resolve_wikis(qids)
+    return Response({'results': results, 'missing': missing})